@@ -10,8 +10,13 @@ from werkzeug.exceptions import NotFound
 
 from configs import dify_config
 from constants.languages import languages
+from core.helper.extraction_cache import ExtractionCache
+from core.provider_manager import ProviderManager
+from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.datasource.keyword.keyword_type import KeyWordType
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
 from events.app_event import app_was_created
 from extensions.ext_database import db
@@ -128,6 +133,7 @@ def reset_encrypt_key_pair():
         db.session.query(Provider).filter(Provider.provider_type == "custom", Provider.tenant_id == tenant.id).delete()
         db.session.query(ProviderModel).filter(ProviderModel.tenant_id == tenant.id).delete()
         db.session.commit()
+        ProviderManager.invalidate_configurations_cache(tenant.id)
 
         click.echo(
             click.style(
@@ -414,6 +420,106 @@ def migrate_knowledge_vector_database():
     )
 
 
+@click.command("keyword-store-migrate", help="Migrate keyword indexes to the configured keyword store.")
+def keyword_store_migrate():
+    """
+    Rebuild the keyword indexes of the datasets in the keyword store configured by KEYWORD_STORE.
+    """
+    click.echo(click.style("Starting keyword store migration.", fg="green"))
+    create_count = 0
+    skipped_count = 0
+    total_count = 0
+    keyword_type = dify_config.KEYWORD_STORE
+    keyword_factory = Keyword.get_keyword_factory(keyword_type)
+    page = 1
+    while True:
+        try:
+            datasets = (
+                Dataset.query.filter(Dataset.provider != "external")
+                .order_by(Dataset.created_at.desc())
+                .paginate(page=page, per_page=50)
+            )
+        except NotFound:
+            break
+
+        page += 1
+        for dataset in datasets:
+            total_count = total_count + 1
+            click.echo(
+                f"Processing the {total_count} dataset {dataset.id}. {create_count} created, {skipped_count} skipped."
+            )
+            if (dataset.keyword_store or KeyWordType.JIEBA) == keyword_type:
+                skipped_count = skipped_count + 1
+                continue
+            try:
+                old_keyword = Keyword(dataset)
+                # the dataset keeps using its old index until the new one is complete
+                new_keyword = keyword_factory(dataset)
+                new_keyword.delete()
+
+                dataset_documents = (
+                    db.session.query(DatasetDocument)
+                    .filter(
+                        DatasetDocument.dataset_id == dataset.id,
+                        DatasetDocument.indexing_status == "completed",
+                        DatasetDocument.enabled == True,
+                        DatasetDocument.archived == False,
+                        DatasetDocument.doc_form != IndexType.PARENT_CHILD_INDEX,
+                    )
+                    .all()
+                )
+                segments_count = 0
+                for dataset_document in dataset_documents:
+                    segments = (
+                        db.session.query(DocumentSegment)
+                        .filter(
+                            DocumentSegment.document_id == dataset_document.id,
+                            DocumentSegment.status == "completed",
+                            DocumentSegment.enabled == True,
+                        )
+                        .all()
+                    )
+                    if not segments:
+                        continue
+                    documents = [
+                        Document(
+                            page_content=segment.content,
+                            metadata={
+                                "doc_id": segment.index_node_id,
+                                "doc_hash": segment.index_node_hash,
+                                "document_id": segment.document_id,
+                                "dataset_id": segment.dataset_id,
+                            },
+                        )
+                        for segment in segments
+                    ]
+                    # reuse the keywords of the segments, they are only extracted for segments without keywords
+                    new_keyword.add_texts(documents, keywords_list=[segment.keywords for segment in segments])
+                    segments_count += len(segments)
+
+                dataset.keyword_store = keyword_type
+                db.session.add(dataset)
+                db.session.commit()
+                old_keyword.delete()
+                click.echo(f"Successfully migrated dataset {dataset.id} with {segments_count} segments.")
+                create_count += 1
+            except Exception as e:
+                db.session.rollback()
+                click.echo(
+                    click.style(
+                        "Error creating dataset keyword index: {} {}".format(e.__class__.__name__, str(e)), fg="red"
+                    )
+                )
+                continue
+
+    click.echo(
+        click.style(
+            f"Migration complete. Created {create_count} dataset keyword indexes. Skipped {skipped_count} datasets.",
+            fg="green",
+        )
+    )
+
+
 @click.command("convert-to-agent-apps", help="Convert Agent Assistant to Agent App.")
 def convert_to_agent_apps():
     """
@@ -649,3 +755,21 @@ where sites.id is null limit 1000"""
                 break
 
     click.echo(click.style("Fix for missing app-related sites completed successfully!", fg="green"))
+
+
+@click.command("extraction-cache-stats", help="Show the hit rate and size of the extraction cache.")
+def extraction_cache_stats():
+    """
+    Show the hit rate and size of the extraction cache.
+    """
+    if not ExtractionCache.enabled():
+        click.echo(
+            click.style("Extraction cache is disabled, set EXTRACTION_CACHE_MAX_SIZE_MB to enable it.", fg="red")
+        )
+        return
+
+    stats = ExtractionCache.stats()
+    click.echo(f"Hits: {stats['hits']}")
+    click.echo(f"Misses: {stats['misses']}")
+    click.echo(f"Hit rate: {stats['hit_rate']:.2%}")
+    click.echo(f"Size: {stats['size'] / 1024 / 1024:.1f} MB of {dify_config.EXTRACTION_CACHE_MAX_SIZE_MB} MB")
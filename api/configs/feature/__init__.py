@@ -47,6 +47,17 @@ class SecurityConfig(BaseSettings):
         default=None,
     )
 
+    CREDENTIALS_DECRYPT_CACHE_TTL: NonNegativeInt = Field(
+        description="Time-to-live in seconds of the in-process cache of workspace private keys"
+        " and decrypted credentials, 0 to disable the cache",
+        default=120,
+    )
+
+    CREDENTIALS_DECRYPT_CACHE_MAX_SIZE: PositiveInt = Field(
+        description="Maximum number of decrypted credentials kept in the in-process cache",
+        default=10000,
+    )
+
 
 class AppExecutionConfig(BaseSettings):
     """
@@ -61,6 +72,10 @@ class AppExecutionConfig(BaseSettings):
         description="Maximum number of concurrent active requests per app (0 for unlimited)",
         default=0,
     )
+    APP_STOP_CHECK_INTERVAL: PositiveFloat = Field(
+        description="Minimum interval in seconds between checks of the stop flag of a running app task in Redis",
+        default=1.0,
+    )
 
 
 class CodeExecutionSandboxConfig(BaseSettings):
@@ -314,6 +329,26 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections kept by each pooled SSRF proxy HTTP client",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of idle keep-alive connections kept by each pooled SSRF proxy HTTP client",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection is kept open by the pooled SSRF proxy HTTP clients",
+        default=5.0,
+    )
+
+    SSRF_POOL_HTTP2_ENABLED: bool = Field(
+        description="Enable HTTP/2 for the pooled SSRF proxy HTTP clients, requires the 'h2' package",
+        default=False,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable or disable the X-Forwarded-For Proxy Fix middleware from Werkzeug"
         " to respect X-* headers to redirect clients",
@@ -389,6 +424,23 @@ class ModelLoadBalanceConfig(BaseSettings):
     )
 
 
+class ModelProviderConfig(BaseSettings):
+    """
+    Configuration for model provider configurations
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: NonNegativeInt = Field(
+        description="Maximum age in seconds of the in-process cache of workspace provider configurations,"
+        " bounding how stale hosted quota usage can get. Set to 0 to disable the cache",
+        default=60,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_MAX_SIZE: PositiveInt = Field(
+        description="Maximum number of workspaces whose provider configurations are cached per process",
+        default=1000,
+    )
+
+
 class BillingConfig(BaseSettings):
     """
     Configuration for platform billing features
@@ -452,6 +504,37 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         default=100,
     )
 
+    WORKFLOW_NODE_EXECUTION_STRICT_PERSISTENCE: bool = Field(
+        description="Write every workflow node execution to the database as soon as its state changes,"
+        " instead of writing them in batches in the background",
+        default=False,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Maximum interval in seconds between batched writes of workflow node executions",
+        default=1.0,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of pending workflow node executions that triggers a batched write",
+        default=50,
+    )
+
+    WORKFLOW_THREAD_POOL_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of threads per process running parallel branches and iterations of all workflows",
+        default=100,
+    )
+
+    WORKFLOW_THREAD_POOL_MAX_WORKERS_PER_TENANT: PositiveInt = Field(
+        description="Maximum number of workflow pool threads a single workspace can use at a time",
+        default=50,
+    )
+
+    WORKFLOW_THREAD_POOL_MAX_WORKERS_PER_APP: PositiveInt = Field(
+        description="Maximum number of workflow pool threads a single app can use at a time",
+        default=20,
+    )
+
 
 class AuthConfig(BaseSettings):
     """
@@ -498,6 +581,22 @@ class AuthConfig(BaseSettings):
         default=86400,
     )
 
+    API_TOKEN_CACHE_TTL: NonNegativeInt = Field(
+        description="Time-to-live in seconds of the redis cache of service API tokens, 0 to disable the cache",
+        default=60,
+    )
+
+    API_TOKEN_LAST_USED_BUFFER_ENABLED: bool = Field(
+        description="Whether to buffer the last used time of service API tokens in redis"
+        " and write it to the database in the background, requires celery beat",
+        default=False,
+    )
+
+    API_TOKEN_LAST_USED_FLUSH_INTERVAL: PositiveInt = Field(
+        description="Interval in seconds between writes of the buffered last used time of service API tokens",
+        default=60,
+    )
+
 
 class ModerationConfig(BaseSettings):
     """
@@ -509,6 +608,17 @@ class ModerationConfig(BaseSettings):
         default=300,
     )
 
+    MODERATION_INCREMENTAL_ENABLED: bool = Field(
+        description="Whether to check only the new part of the output, with an overlap of MODERATION_OVERLAP_SIZE"
+        " characters, instead of the whole output each time MODERATION_BUFFER_SIZE characters are generated",
+        default=False,
+    )
+
+    MODERATION_OVERLAP_SIZE: NonNegativeInt = Field(
+        description="Number of already checked characters checked again with the new part of the output",
+        default=50,
+    )
+
 
 class ToolConfig(BaseSettings):
     """
@@ -650,6 +760,27 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    RETRIEVAL_LOG_BUFFER_ENABLED: bool = Field(
+        description="Buffer segment hit counts and dataset queries of retrievals in Redis and write them to the"
+        " database in bulk from a Celery beat task, requires Celery beat",
+        default=False,
+    )
+
+    RETRIEVAL_LOG_FLUSH_INTERVAL: PositiveInt = Field(
+        description="Interval in seconds at which buffered segment hit counts and dataset queries are written",
+        default=60,
+    )
+
+    RETRIEVAL_LOG_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of buffered dataset queries inserted per statement",
+        default=1000,
+    )
+
+    RETRIEVAL_SERVICE_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of threads running the searches of knowledge retrievals",
+        default=20,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -677,6 +808,59 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    EMBEDDING_CACHE_LOOKUP_BATCH_SIZE: PositiveInt = Field(
+        description="Number of text hashes resolved per query when looking up cached document embeddings",
+        default=500,
+    )
+
+    EMBEDDING_CACHE_LOCAL_MAX_SIZE: NonNegativeInt = Field(
+        description="Maximum number of document embeddings kept in the process-local LRU cache, 0 to disable",
+        default=2000,
+    )
+
+    EMBEDDING_CACHE_REDIS_TTL: NonNegativeInt = Field(
+        description="Time in seconds document embeddings are kept in the Redis cache, 0 to disable",
+        default=600,
+    )
+
+    INDEXING_SEGMENT_BATCH_SIZE: PositiveInt = Field(
+        description="Number of document segments inserted per batch and committed together during indexing",
+        default=500,
+    )
+
+    INDEXING_EXTRACT_BATCH_SIZE: PositiveInt = Field(
+        description="Number of extracted pages or rows of a document split, saved and embedded together during"
+        " indexing, only this many are held in memory at a time",
+        default=100,
+    )
+
+    PDF_EXTRACT_PROCESS_POOL_SIZE: NonNegativeInt = Field(
+        description="Number of processes extracting the pages of large PDFs in parallel, 0 to extract in process",
+        default=0,
+    )
+
+    PDF_EXTRACT_PARALLEL_MIN_PAGES: PositiveInt = Field(
+        description="Minimum number of pages of a PDF to extract it with the process pool",
+        default=64,
+    )
+
+    EXTRACTION_CACHE_MAX_SIZE_MB: NonNegativeInt = Field(
+        description="Maximum total size in MB of the text extracted from files and cached in the storage by file"
+        " content hash, the least recently used entries are removed first, 0 to disable",
+        default=0,
+    )
+
+    EXTRACTION_CACHE_MAX_ENTRY_SIZE_MB: PositiveInt = Field(
+        description="Maximum size in MB of the text extracted from a single file to be cached, the text of larger"
+        " files is not kept in memory for the cache",
+        default=16,
+    )
+
+    SEGMENT_CONTENT_CACHE_TTL: NonNegativeInt = Field(
+        description="Time in seconds retrieved segment contents are kept in the Redis cache, 0 to disable",
+        default=0,
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -798,6 +982,7 @@ class FeatureConfig(
     LoggingConfig,
     MailConfig,
     ModelLoadBalanceConfig,
+    ModelProviderConfig,
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
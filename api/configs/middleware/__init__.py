@@ -83,7 +83,9 @@ class VectorStoreConfig(BaseSettings):
 class KeywordStoreConfig(BaseSettings):
     KEYWORD_STORE: str = Field(
         description="Method for keyword extraction and storage."
-        " Default is 'jieba', a Chinese text segmentation library.",
+        " Default is 'jieba', a Chinese text segmentation library."
+        " 'jieba_inverted_index' stores keyword postings in a normalized table instead of a JSON blob."
+        " Applies to new datasets, run 'flask keyword-store-migrate' to rebuild the indexes of existing datasets.",
         default="jieba",
     )
 
@@ -5,6 +5,7 @@ from flask_login import current_user  # type: ignore
 from flask_restful import Resource, fields, marshal_with
 from werkzeug.exceptions import Forbidden
 
+from core.helper.api_token_cache import ApiTokenCache
 from extensions.ext_database import db
 from libs.helper import TimestampField
 from libs.login import login_required
@@ -116,9 +117,13 @@ class BaseApiKeyResource(Resource):
 
         if key is None:
             flask_restful.abort(404, message="API key not found")
+        assert key is not None, "API key not found"
+        # the deleted key cannot be loaded after the commit
+        token, token_type = key.token, key.type
 
         db.session.query(ApiToken).filter(ApiToken.id == api_key_id).delete()
         db.session.commit()
+        ApiTokenCache.delete(token, token_type)
 
         return {"result": "success"}, 204
 
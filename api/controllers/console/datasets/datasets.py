@@ -12,6 +12,7 @@ from controllers.console.app.error import ProviderNotInitializeError
 from controllers.console.datasets.error import DatasetInUseError, DatasetNameDuplicateError, IndexingEstimateError
 from controllers.console.wraps import account_initialization_required, enterprise_license_required, setup_required
 from core.errors.error import LLMBadRequestError, ProviderTokenNotInitError
+from core.helper.api_token_cache import ApiTokenCache
 from core.indexing_runner import IndexingRunner
 from core.model_runtime.entities.model_entities import ModelType
 from core.provider_manager import ProviderManager
@@ -596,9 +597,13 @@ class DatasetApiDeleteApi(Resource):
 
         if key is None:
             flask_restful.abort(404, message="API key not found")
+        assert key is not None, "API key not found"
+        # the deleted key cannot be loaded after the commit
+        token, token_type = key.token, key.type
 
         db.session.query(ApiToken).filter(ApiToken.id == api_key_id).delete()
         db.session.commit()
+        ApiTokenCache.delete(token, token_type)
 
         return {"result": "success"}, 204
 
@@ -1,5 +1,4 @@
 from collections.abc import Callable
-from datetime import UTC, datetime, timedelta
 from enum import Enum
 from functools import wraps
 from typing import Optional
@@ -8,10 +7,11 @@ from flask import current_app, request
 from flask_login import user_logged_in  # type: ignore
 from flask_restful import Resource  # type: ignore
 from pydantic import BaseModel
-from sqlalchemy import select, update
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from werkzeug.exceptions import Forbidden, Unauthorized
 
+from core.helper.api_token_cache import ApiTokenCache
 from extensions.ext_database import db
 from libs.login import _get_user
 from models.account import Account, Tenant, TenantAccountJoin, TenantStatus
@@ -40,9 +40,16 @@ def validate_app_token(view: Optional[Callable] = None, *, fetch_user_arg: Optio
         def decorated_view(*args, **kwargs):
             api_token = validate_and_get_api_token("app")
 
-            app_model = db.session.query(App).filter(App.id == api_token.app_id).first()
-            if not app_model:
+            # the app and the status of its tenant in one query
+            result = (
+                db.session.query(App, Tenant.status)
+                .outerjoin(Tenant, Tenant.id == App.tenant_id)
+                .filter(App.id == api_token.app_id)
+                .first()
+            )
+            if not result:
                 raise Forbidden("The app no longer exists.")
+            app_model, tenant_status = result
 
             if app_model.status != "normal":
                 raise Forbidden("The app's status is abnormal.")
@@ -50,10 +57,9 @@ def validate_app_token(view: Optional[Callable] = None, *, fetch_user_arg: Optio
             if not app_model.enable_api:
                 raise Forbidden("The app's API service has been disabled.")
 
-            tenant = db.session.query(Tenant).filter(Tenant.id == app_model.tenant_id).first()
-            if tenant is None:
+            if tenant_status is None:
                 raise ValueError("Tenant does not exist.")
-            if tenant.status == TenantStatus.ARCHIVE:
+            if tenant_status == TenantStatus.ARCHIVE:
                 raise Forbidden("The workspace's status is archived.")
 
             kwargs["app_model"] = app_model
@@ -190,29 +196,16 @@ def validate_and_get_api_token(scope: str | None = None):
     if auth_scheme != "bearer":
         raise Unauthorized("Authorization scheme must be 'Bearer'")
 
-    current_time = datetime.now(UTC).replace(tzinfo=None)
-    cutoff_time = current_time - timedelta(minutes=1)
-    with Session(db.engine, expire_on_commit=False) as session:
-        update_stmt = (
-            update(ApiToken)
-            .where(
-                ApiToken.token == auth_token,
-                (ApiToken.last_used_at.is_(None) | (ApiToken.last_used_at < cutoff_time)),
-                ApiToken.type == scope,
-            )
-            .values(last_used_at=current_time)
-            .returning(ApiToken)
-        )
-        result = session.execute(update_stmt)
-        api_token = result.scalar_one_or_none()
-
-        if not api_token:
+    api_token = ApiTokenCache.get(auth_token, scope)
+    if not api_token:
+        with Session(db.engine, expire_on_commit=False) as session:
             stmt = select(ApiToken).where(ApiToken.token == auth_token, ApiToken.type == scope)
             api_token = session.scalar(stmt)
             if not api_token:
                 raise Unauthorized("Access token is invalid")
-        else:
-            session.commit()
+        ApiTokenCache.set(api_token)
+
+    ApiTokenCache.record_usage(api_token.id)
 
     return api_token
 
@@ -41,6 +41,8 @@ class AppQueueManager:
         q: queue.Queue[WorkflowQueueMessage | MessageQueueMessage | None] = queue.Queue()
 
         self._q = q
+        self._stopped = False
+        self._last_stop_check_at: float = 0
 
     def listen(self):
         """
@@ -96,7 +98,9 @@ class AppQueueManager:
         :param pub_from:
         :return:
         """
-        self._check_for_sqlalchemy_models(event.model_dump())
+        # dumping and walking every event is expensive for streamed chunks, only do it to catch mistakes in debug mode
+        if dify_config.DEBUG:
+            self._check_for_sqlalchemy_models(event.model_dump())
         self._publish(event, pub_from)
 
     @abstractmethod
@@ -128,12 +132,21 @@ class AppQueueManager:
 
     def _is_stopped(self) -> bool:
         """
-        Check if task is stopped
+        Check if task is stopped, the stop flag in redis is checked at most once per APP_STOP_CHECK_INTERVAL
         :return:
         """
+        if self._stopped:
+            return True
+
+        now = time.monotonic()
+        if now - self._last_stop_check_at < dify_config.APP_STOP_CHECK_INTERVAL:
+            return False
+        self._last_stop_check_at = now
+
         stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
         result = redis_client.get(stopped_cache_key)
         if result is not None:
+            self._stopped = True
             return True
 
         return False
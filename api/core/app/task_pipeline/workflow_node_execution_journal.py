@@ -0,0 +1,120 @@
+import logging
+import threading
+from typing import Any, Optional
+
+from sqlalchemy import Engine
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.workflow import WorkflowNodeExecution
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowNodeExecutionJournal:
+    """
+    Journal of the node executions of a workflow run.
+
+    In strict mode every recorded node execution is written right away. Otherwise the latest state of
+    each node execution is kept in memory and upserted in batches by a background writer, whenever
+    batch_size node executions are pending or flush_interval seconds passed, and on flush() or close().
+    """
+
+    def __init__(self, *, engine: Engine, strict: bool, flush_interval: float, batch_size: int) -> None:
+        self._engine = engine
+        self._strict = strict
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._pending: dict[str, dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        # makes sure an older state of a node execution never overwrites a newer one
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+
+    def record(self, workflow_node_execution: WorkflowNodeExecution) -> None:
+        """
+        Record the current state of a node execution.
+        :param workflow_node_execution: workflow node execution
+        """
+        row = self._to_row(workflow_node_execution)
+        if self._strict or self._closed:
+            with self._write_lock:
+                self._write([row])
+            return
+
+        with self._pending_lock:
+            self._pending[row["id"]] = row
+            pending_count = len(self._pending)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="workflow_node_execution_journal", daemon=True)
+                self._writer.start()
+
+        if pending_count >= self._batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Write all pending node executions in the calling thread.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                rows = list(self._pending.values())
+                self._pending.clear()
+
+            if rows:
+                self._write(rows)
+
+    def close(self) -> None:
+        """
+        Stop the background writer and write all pending node executions.
+        """
+        self._closed = True
+        self._wakeup.set()
+        if self._writer is not None and self._writer is not threading.current_thread():
+            self._writer.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to write workflow node executions, retry at next flush")
+
+    def _write(self, rows: list[dict[str, Any]]) -> None:
+        # node executions written once already may miss no column, but their columns with server defaults
+        # must not be overwritten by None, so rows are upserted in groups of the same columns
+        rows_by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in rows:
+            rows_by_columns.setdefault(tuple(row), []).append(row)
+
+        try:
+            with Session(self._engine) as session:
+                for columns, grouped_rows in rows_by_columns.items():
+                    stmt = insert(WorkflowNodeExecution).values(grouped_rows)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=["id"],
+                        set_={column: stmt.excluded[column] for column in columns if column != "id"},
+                    )
+                    session.execute(stmt)
+                session.commit()
+        except Exception:
+            # keep the rows for the next flush, unless a newer state was recorded meanwhile
+            with self._pending_lock:
+                for row in rows:
+                    self._pending.setdefault(row["id"], row)
+            raise
+
+    @staticmethod
+    def _to_row(workflow_node_execution: WorkflowNodeExecution) -> dict[str, Any]:
+        row = {}
+        for column in WorkflowNodeExecution.__table__.columns:
+            value = getattr(workflow_node_execution, column.key)
+            if value is None and column.server_default is not None:
+                continue
+            row[column.key] = value
+        return row
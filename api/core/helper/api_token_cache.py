@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+from collections.abc import Mapping
+from datetime import UTC, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, column, or_, update, values
+from sqlalchemy.orm import Session
+
+from configs import dify_config
+from core.helper.lru_cache import LRUCache
+from core.helper.redis_hash_buffer import flush_redis_hash
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.model import ApiToken
+from models.types import StringUUID
+
+logger = logging.getLogger(__name__)
+
+# the last used time is written at most once a minute per token
+_LAST_USED_AT_INTERVAL = timedelta(minutes=1)
+_last_used_at_recorded = LRUCache(capacity=10000)
+
+
+class ApiTokenCache:
+    """
+    Cache of the service API tokens in redis, keyed by the hash of the token.
+
+    The last used time of the tokens is written at most once a minute per token and process. When
+    API_TOKEN_LAST_USED_BUFFER_ENABLED is set, it is only added to redis and the
+    update_api_token_last_used_task beat task writes it to the database in bulk.
+    """
+
+    _LAST_USED_AT_KEY = "api_token:last_used_at"
+
+    @classmethod
+    def get(cls, token: str, scope: Optional[str]) -> Optional[ApiToken]:
+        """
+        Get a cached API token.
+
+        :param token: API token
+        :param scope: type of the token
+        :return: API token detached from the database, None if it is not cached
+        """
+        if not dify_config.API_TOKEN_CACHE_TTL:
+            return None
+        try:
+            data = redis_client.get(cls._cache_key(token, scope))
+        except Exception:
+            logger.warning("Failed to get API token from cache", exc_info=True)
+            return None
+        if data is None:
+            return None
+        return ApiToken(token=token, **json.loads(data))
+
+    @classmethod
+    def set(cls, api_token: ApiToken) -> None:
+        """
+        Cache an API token.
+
+        :param api_token: API token
+        :return:
+        """
+        if not dify_config.API_TOKEN_CACHE_TTL:
+            return
+        data = json.dumps(
+            {"id": api_token.id, "app_id": api_token.app_id, "tenant_id": api_token.tenant_id, "type": api_token.type}
+        )
+        try:
+            redis_client.setex(cls._cache_key(api_token.token, api_token.type), dify_config.API_TOKEN_CACHE_TTL, data)
+        except Exception:
+            logger.warning("Failed to add API token to cache", exc_info=True)
+
+    @classmethod
+    def delete(cls, token: str, scope: Optional[str]) -> None:
+        """
+        Remove an API token from the cache, call it after the token was deleted.
+
+        :param token: API token
+        :param scope: type of the token
+        :return:
+        """
+        try:
+            redis_client.delete(cls._cache_key(token, scope))
+        except Exception:
+            logger.warning("Failed to delete API token from cache", exc_info=True)
+
+    @classmethod
+    def record_usage(cls, api_token_id: str) -> None:
+        """
+        Update the last used time of an API token.
+
+        :param api_token_id: API token id
+        :return:
+        """
+        current_time = datetime.now(UTC).replace(tzinfo=None)
+        last_recorded_at = _last_used_at_recorded.get(api_token_id)
+        if last_recorded_at is not None and current_time - last_recorded_at < _LAST_USED_AT_INTERVAL:
+            return
+        _last_used_at_recorded.put(api_token_id, current_time)
+
+        if not dify_config.API_TOKEN_LAST_USED_BUFFER_ENABLED:
+            cls._write_last_used_at({api_token_id: current_time})
+            return
+
+        try:
+            redis_client.hset(cls._LAST_USED_AT_KEY, api_token_id, current_time.isoformat())
+        except Exception:
+            logger.warning("Failed to buffer last used time of API token", exc_info=True)
+
+    @classmethod
+    def flush_usage(cls) -> int:
+        """
+        Write the buffered last used times of the API tokens to the database.
+
+        :return: number of updated API tokens
+        """
+
+        def write(items: Mapping[bytes, bytes]) -> None:
+            cls._write_last_used_at(
+                {
+                    api_token_id.decode(): datetime.fromisoformat(used_at.decode())
+                    for api_token_id, used_at in items.items()
+                }
+            )
+
+        # times recorded meanwhile are newer than the buffered ones, so they are kept if the write fails
+        return flush_redis_hash(cls._LAST_USED_AT_KEY, write, counters=False)
+
+    @staticmethod
+    def _write_last_used_at(last_used_at: Mapping[str, datetime]) -> None:
+        if not last_used_at:
+            return
+        used_at_values = values(
+            column("id", StringUUID),
+            column("last_used_at", DateTime),
+            name="used_at_values",
+        ).data(sorted(last_used_at.items()))
+        with Session(db.engine) as session:
+            session.execute(
+                update(ApiToken)
+                .where(
+                    ApiToken.id == used_at_values.c.id,
+                    or_(ApiToken.last_used_at.is_(None), ApiToken.last_used_at < used_at_values.c.last_used_at),
+                )
+                .values(last_used_at=used_at_values.c.last_used_at)
+            )
+            session.commit()
+
+    @staticmethod
+    def _cache_key(token: str, scope: Optional[str]) -> str:
+        return f"api_token:{scope}:{hashlib.sha256(token.encode()).hexdigest()}"
@@ -4,7 +4,7 @@ from enum import StrEnum
 from threading import Lock
 from typing import Any, Optional
 
-from httpx import Timeout, post
+from httpx import Client, Limits, Timeout
 from pydantic import BaseModel
 from yarl import URL
 
@@ -55,6 +55,26 @@ class CodeExecutor:
 
     supported_dependencies_languages: set[CodeLanguage] = {CodeLanguage.PYTHON3}
 
+    _client: Optional[Client] = None
+    _client_lock = Lock()
+
+    @classmethod
+    def _get_client(cls) -> Client:
+        """
+        Get the shared HTTP client of the code execution service, so that connections to the sandbox are reused
+        """
+        if cls._client is None:
+            with cls._client_lock:
+                if cls._client is None:
+                    cls._client = Client(
+                        limits=Limits(
+                            max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+                            max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+                        )
+                    )
+        return cls._client
+
     @classmethod
     def execute_code(cls, language: CodeLanguage, preload: str, code: str) -> str:
         """
@@ -75,7 +95,7 @@ class CodeExecutor:
         }
 
         try:
-            response = post(
+            response = cls._get_client().post(
                 str(url),
                 json=data,
                 headers=headers,
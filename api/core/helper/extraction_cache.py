@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Mapping
+from typing import Any, Optional
+
+from configs import dify_config
+from core.rag.models.document import Document
+from extensions.ext_redis import redis_client
+from extensions.ext_storage import storage
+
+logger = logging.getLogger(__name__)
+
+# bump when the output of the extractors changes, so that older entries are not used anymore
+_CACHE_VERSION = 1
+
+
+class ExtractionCache:
+    """
+    Cache of the documents extracted from files, stored in the storage and keyed by the hash of the file
+    content and the settings of the extraction.
+
+    The least recently used entries are removed once their total size exceeds EXTRACTION_CACHE_MAX_SIZE_MB,
+    the recency and the size of the entries and the hit and miss counts are tracked in redis.
+    """
+
+    _STORAGE_PREFIX = "extraction_cache"
+    _LRU_KEY = "extraction_cache:lru"
+    _SIZES_KEY = "extraction_cache:sizes"
+    _TOTAL_SIZE_KEY = "extraction_cache:total_size"
+    _HITS_KEY = "extraction_cache:hits"
+    _MISSES_KEY = "extraction_cache:misses"
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return dify_config.EXTRACTION_CACHE_MAX_SIZE_MB > 0
+
+    @staticmethod
+    def get_cache_key(content_hash: str, extractor: str, settings: Mapping[str, Any]) -> str:
+        """
+        Get the cache key of an extraction.
+
+        :param content_hash: hash of the file content
+        :param extractor: name of the extractor
+        :param settings: settings changing the output of the extractor
+        :return: cache key
+        """
+        key = json.dumps(
+            {"version": _CACHE_VERSION, "content_hash": content_hash, "extractor": extractor, "settings": settings},
+            sort_keys=True,
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @classmethod
+    def get(cls, cache_key: str) -> Optional[list[Document]]:
+        """
+        Get the cached documents of an extraction.
+
+        :param cache_key: cache key
+        :return: documents, None if they are not cached
+        """
+        if not cls.enabled():
+            return None
+
+        documents = None
+        try:
+            # redis knows the cached entries, so misses do not need a request to the storage
+            if redis_client.zscore(cls._LRU_KEY, cache_key) is not None:
+                try:
+                    data = storage.load_once(cls._storage_key(cache_key))
+                except FileNotFoundError:
+                    # removed from the storage by someone else, forget the entry
+                    if redis_client.zrem(cls._LRU_KEY, cache_key):
+                        cls._remove(cache_key)
+                else:
+                    documents = [Document(**document) for document in json.loads(data)]
+                    redis_client.zadd(cls._LRU_KEY, {cache_key: time.time()}, xx=True)
+            redis_client.incr(cls._HITS_KEY if documents is not None else cls._MISSES_KEY)
+        except Exception:
+            logger.warning("Failed to get extracted documents from cache", exc_info=True)
+            return None
+
+        logger.debug("Extraction cache %s for key %s", "hit" if documents is not None else "miss", cache_key)
+        return documents
+
+    @classmethod
+    def set(cls, cache_key: str, documents: list[Document]) -> None:
+        """
+        Cache the documents of an extraction and remove the least recently used entries
+        if the cache exceeds its size.
+
+        :param cache_key: cache key
+        :param documents: extracted documents
+        :return:
+        """
+        if not cls.enabled():
+            return
+
+        data = json.dumps([document.model_dump() for document in documents]).encode("utf-8")
+        max_size = dify_config.EXTRACTION_CACHE_MAX_SIZE_MB * 1024 * 1024
+        if len(data) > max_size:
+            return
+
+        try:
+            storage.save(cls._storage_key(cache_key), data)
+            with redis_client.pipeline() as pipe:
+                pipe.zadd(cls._LRU_KEY, {cache_key: time.time()})
+                pipe.hget(cls._SIZES_KEY, cache_key)
+                pipe.hset(cls._SIZES_KEY, cache_key, len(data))
+                _, previous_size, _ = pipe.execute()
+            total_size = redis_client.incrby(cls._TOTAL_SIZE_KEY, len(data) - int(previous_size or 0))
+
+            while total_size > max_size:
+                # zpopmin is atomic, so concurrent evictions never remove the same entry twice
+                evicted = redis_client.zpopmin(cls._LRU_KEY)
+                if not evicted:
+                    break
+                total_size = cls._remove(evicted[0][0])
+        except Exception:
+            logger.warning("Failed to add extracted documents to cache", exc_info=True)
+
+    @classmethod
+    def stats(cls) -> dict[str, float]:
+        """
+        Get the hit and miss counts, the hit rate and the size of the cache.
+
+        :return: cache statistics
+        """
+        hits, misses, size = redis_client.mget([cls._HITS_KEY, cls._MISSES_KEY, cls._TOTAL_SIZE_KEY])
+        hits, misses = int(hits or 0), int(misses or 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "size": int(size or 0),
+        }
+
+    @classmethod
+    def _remove(cls, cache_key: bytes | str) -> int:
+        if isinstance(cache_key, bytes):
+            cache_key = cache_key.decode()
+        with redis_client.pipeline() as pipe:
+            pipe.hget(cls._SIZES_KEY, cache_key)
+            pipe.hdel(cls._SIZES_KEY, cache_key)
+            size, _ = pipe.execute()
+        total_size = int(redis_client.decrby(cls._TOTAL_SIZE_KEY, int(size or 0)))
+        try:
+            storage.delete(cls._storage_key(cache_key))
+        except Exception:
+            logger.warning("Failed to delete cached extracted documents %s", cache_key, exc_info=True)
+        return total_size
+
+    @classmethod
+    def _storage_key(cls, cache_key: str) -> str:
+        return f"{cls._STORAGE_PREFIX}/{cache_key}.json"
@@ -1,3 +1,4 @@
+import threading
 from collections import OrderedDict
 from typing import Any
 
@@ -6,17 +7,32 @@ class LRUCache:
     def __init__(self, capacity: int):
         self.cache: OrderedDict[Any, Any] = OrderedDict()
         self.capacity = capacity
+        self._lock = threading.Lock()
 
     def get(self, key: Any) -> Any:
-        if key not in self.cache:
-            return None
-        else:
-            self.cache.move_to_end(key)  # move the key to the end of the OrderedDict
-            return self.cache[key]
+        with self._lock:
+            if key not in self.cache:
+                return None
+            else:
+                self.cache.move_to_end(key)  # move the key to the end of the OrderedDict
+                return self.cache[key]
 
     def put(self, key: Any, value: Any) -> None:
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        self.cache[key] = value
-        if len(self.cache) > self.capacity:
-            self.cache.popitem(last=False)  # pop the first item
+        with self._lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+            self.cache[key] = value
+            if len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)  # pop the first item
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self.cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.cache.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.cache)
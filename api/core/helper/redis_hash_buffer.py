@@ -0,0 +1,40 @@
+import uuid
+from collections.abc import Callable, Mapping
+
+from extensions.ext_redis import redis_client
+
+
+def flush_redis_hash(key: str, write: Callable[[Mapping[bytes, bytes]], None], *, counters: bool) -> int:
+    """
+    Write the values buffered in a redis hash to the database and remove them from the hash.
+
+    The hash is renamed before it is read, so values added while flushing go to a new hash.
+    If the write fails, the values are put back for the next flush and the error is raised.
+
+    :param key: key of the hash
+    :param write: writes the fields and values of the hash to the database
+    :param counters: whether the values are counters which are added to the values counted meanwhile,
+        otherwise they are only put back for fields without a newer value
+    :return: number of written fields
+    """
+    if not redis_client.exists(key):
+        return 0
+    flushing_key = f"{key}:flushing:{uuid.uuid4().hex}"
+    redis_client.rename(key, flushing_key)
+
+    items = redis_client.hgetall(flushing_key)
+    try:
+        write(items)
+    except Exception:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for field, value in items.items():
+                if counters:
+                    pipe.hincrby(key, field, int(value))
+                else:
+                    pipe.hsetnx(key, field, value)
+            pipe.delete(flushing_key)
+            pipe.execute()
+        raise
+
+    redis_client.delete(flushing_key)
+    return len(items)
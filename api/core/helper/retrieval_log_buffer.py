@@ -0,0 +1,157 @@
+import json
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from datetime import UTC, datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, column, insert, update, values
+
+from configs import dify_config
+from core.helper.redis_hash_buffer import flush_redis_hash
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.dataset import DatasetQuery, DocumentSegment
+from models.types import StringUUID
+
+
+class RetrievalLogBuffer:
+    """
+    Buffer of the segment hit counts and the dataset queries of retrievals.
+
+    When RETRIEVAL_LOG_BUFFER_ENABLED is set, retrievals only add them to redis and the
+    flush_retrieval_log_task beat task writes them to the database in bulk, otherwise they
+    are written right away.
+    """
+
+    _SEGMENT_HITS_KEY = "retrieval_log:segment_hits"
+    _DATASET_QUERIES_KEY = "retrieval_log:dataset_queries"
+
+    @classmethod
+    def add_segment_hits(cls, hits: Sequence[tuple[Optional[str], str]]) -> None:
+        """
+        Count a hit of the given segments.
+
+        :param hits: (dataset_id, index_node_id) of the hit segments, without dataset_id the
+            segments of all datasets with the index node id are counted
+        :return:
+        """
+        if not hits:
+            return
+        if not dify_config.RETRIEVAL_LOG_BUFFER_ENABLED:
+            cls._write_segment_hits(Counter(hits))
+            return
+
+        with redis_client.pipeline(transaction=False) as pipe:
+            for dataset_id, index_node_id in hits:
+                pipe.hincrby(cls._SEGMENT_HITS_KEY, json.dumps([dataset_id, index_node_id]), 1)
+            pipe.execute()
+
+    @classmethod
+    def add_dataset_queries(
+        cls, *, query: str, dataset_ids: Sequence[str], app_id: str, created_by_role: str, created_by: str
+    ) -> None:
+        """
+        Log a query of the given datasets.
+
+        :param query: query
+        :param dataset_ids: dataset ids
+        :param app_id: app id
+        :param created_by_role: role of the user
+        :param created_by: user id
+        :return:
+        """
+        if not dataset_ids:
+            return
+        created_at = datetime.now(UTC).replace(tzinfo=None)
+        rows = [
+            {
+                "dataset_id": dataset_id,
+                "content": query,
+                "source": "app",
+                "source_app_id": app_id,
+                "created_by_role": created_by_role,
+                "created_by": created_by,
+                "created_at": created_at,
+            }
+            for dataset_id in dataset_ids
+        ]
+        if not dify_config.RETRIEVAL_LOG_BUFFER_ENABLED:
+            cls._write_dataset_queries(rows)
+            return
+
+        redis_client.rpush(
+            cls._DATASET_QUERIES_KEY,
+            *[json.dumps({**row, "created_at": created_at.isoformat()}) for row in rows],
+        )
+
+    @classmethod
+    def flush(cls) -> tuple[int, int]:
+        """
+        Write the buffered segment hit counts and dataset queries to the database.
+
+        :return: number of updated segment hit counts and of inserted dataset queries
+        """
+        return cls._flush_segment_hits(), cls._flush_dataset_queries()
+
+    @classmethod
+    def _flush_segment_hits(cls) -> int:
+        def write(items: Mapping[bytes, bytes]) -> None:
+            cls._write_segment_hits({tuple(json.loads(hit)): int(count) for hit, count in items.items()})
+
+        return flush_redis_hash(cls._SEGMENT_HITS_KEY, write, counters=True)
+
+    @classmethod
+    def _flush_dataset_queries(cls) -> int:
+        batch_size = dify_config.RETRIEVAL_LOG_FLUSH_BATCH_SIZE
+        count = 0
+        while True:
+            with redis_client.pipeline() as pipe:
+                pipe.lrange(cls._DATASET_QUERIES_KEY, 0, batch_size - 1)
+                pipe.ltrim(cls._DATASET_QUERIES_KEY, batch_size, -1)
+                items, _ = pipe.execute()
+            if not items:
+                return count
+
+            rows = [json.loads(item) for item in items]
+            for row in rows:
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            try:
+                cls._write_dataset_queries(rows)
+            except Exception:
+                # put the queries back for the next flush
+                redis_client.lpush(cls._DATASET_QUERIES_KEY, *reversed(items))
+                raise
+            count += len(rows)
+
+    @staticmethod
+    def _write_segment_hits(counts: Mapping[tuple[Optional[str], str], int]) -> None:
+        if not counts:
+            return
+        # sorted, so that concurrent writes lock the segments in the same order
+        hits = sorted(hit for hit in counts if hit[0] is not None)
+        if hits:
+            hit_counts = values(
+                column("dataset_id", StringUUID),
+                column("index_node_id", String),
+                column("count", Integer),
+                name="hit_counts",
+            ).data([(*hit, counts[hit]) for hit in hits])
+            db.session.execute(
+                update(DocumentSegment)
+                .where(
+                    DocumentSegment.dataset_id == hit_counts.c.dataset_id,
+                    DocumentSegment.index_node_id == hit_counts.c.index_node_id,
+                )
+                .values(hit_count=DocumentSegment.hit_count + hit_counts.c.count)
+            )
+        for hit, count in counts.items():
+            if hit[0] is None:
+                db.session.query(DocumentSegment).filter(DocumentSegment.index_node_id == hit[1]).update(
+                    {DocumentSegment.hit_count: DocumentSegment.hit_count + count}, synchronize_session=False
+                )
+        db.session.commit()
+
+    @staticmethod
+    def _write_dataset_queries(rows: list[dict]) -> None:
+        db.session.execute(insert(DatasetQuery), rows)
+        db.session.commit()
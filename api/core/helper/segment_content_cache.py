@@ -0,0 +1,88 @@
+import json
+import logging
+from typing import Optional
+
+from configs import dify_config
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentContentCache:
+    """
+    Short-lived cache of segment contents keyed by (dataset_id, index_node_id),
+    used to serve hot segments during retrieval without hitting the database.
+    """
+
+    @staticmethod
+    def _cache_key(dataset_id: str, index_node_id: str) -> str:
+        return f"segment_content:dataset_id:{dataset_id}:index_node_id:{index_node_id}"
+
+    @classmethod
+    def enabled(cls) -> bool:
+        return dify_config.SEGMENT_CONTENT_CACHE_TTL > 0
+
+    @classmethod
+    def get_many(cls, dataset_id: str, index_node_ids: list[str]) -> dict[str, dict]:
+        """
+        Get cached segment contents.
+
+        :param dataset_id: dataset id
+        :param index_node_ids: index node ids
+        :return: mapping of index node id to cached segment content
+        """
+        if not cls.enabled() or not index_node_ids:
+            return {}
+        try:
+            values = redis_client.mget([cls._cache_key(dataset_id, node_id) for node_id in index_node_ids])
+        except Exception:
+            logger.exception("Failed to get segment contents from redis")
+            return {}
+
+        result = {}
+        for node_id, value in zip(index_node_ids, values):
+            if value:
+                try:
+                    result[node_id] = json.loads(value)
+                except json.JSONDecodeError:
+                    continue
+        return result
+
+    @classmethod
+    def set_many(cls, dataset_id: str, contents: dict[str, dict]) -> None:
+        """
+        Cache segment contents.
+
+        :param dataset_id: dataset id
+        :param contents: mapping of index node id to segment content
+        :return:
+        """
+        if not cls.enabled() or not contents:
+            return
+        try:
+            with redis_client.pipeline(transaction=False) as pipe:
+                for node_id, content in contents.items():
+                    pipe.setex(
+                        cls._cache_key(dataset_id, node_id), dify_config.SEGMENT_CONTENT_CACHE_TTL, json.dumps(content)
+                    )
+                pipe.execute()
+        except Exception:
+            logger.exception("Failed to add segment contents to redis")
+
+    @classmethod
+    def delete(cls, dataset_id: str, index_node_ids: list[Optional[str]]) -> None:
+        """
+        Delete cached segment contents.
+
+        :param dataset_id: dataset id
+        :param index_node_ids: index node ids
+        :return:
+        """
+        keys = [cls._cache_key(dataset_id, node_id) for node_id in index_node_ids if node_id]
+        if not cls.enabled() or not keys:
+            return
+        try:
+            redis_client.delete(*keys)
+        except Exception:
+            # the cached contents expire after SEGMENT_CONTENT_CACHE_TTL
+            logger.warning("Failed to delete segment contents from redis", exc_info=True)
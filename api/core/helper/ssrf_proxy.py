@@ -3,7 +3,10 @@ Proxy requests to avoid SSRF
 """
 
 import logging
+import threading
 import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Optional
 
 import httpx
 
@@ -21,6 +24,101 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
+class ClientPoolStats:
+    """Counters describing connection reuse of the pooled HTTP clients."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.requests = 0
+        self.new_connections = 0
+
+    def record_client_created(self) -> None:
+        with self._lock:
+            self.clients_created += 1
+
+    def record_request(self, new_connection: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.new_connections += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            reused = self.requests - self.new_connections
+            return {
+                "clients_created": self.clients_created,
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+client_pool_stats = ClientPoolStats()
+
+
+class _RejectAllCookiePolicy(DefaultCookiePolicy):
+    """Cookie policy which never stores the cookies of responses."""
+
+    def set_ok(self, cookie, request) -> bool:
+        return False
+
+
+_clients: dict[tuple[Optional[str], Optional[str], Optional[str]], httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def _build_client(proxy_key: tuple[Optional[str], Optional[str], Optional[str]]) -> httpx.Client:
+    proxy_all_url, proxy_http_url, proxy_https_url = proxy_key
+    limits = httpx.Limits(
+        max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+    )
+    http2 = dify_config.SSRF_POOL_HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # type: ignore # noqa: F401
+        except ImportError:
+            logging.warning("SSRF_POOL_HTTP2_ENABLED is set but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+
+    # the client is shared by all tenants and apps, so cookies set by a response must not be sent with other requests
+    cookies = CookieJar(policy=_RejectAllCookiePolicy())
+    if proxy_all_url:
+        return httpx.Client(proxy=proxy_all_url, limits=limits, http2=http2, cookies=cookies)
+    elif proxy_http_url and proxy_https_url:
+        proxy_mounts = {
+            "http://": httpx.HTTPTransport(proxy=proxy_http_url, limits=limits, http2=http2),
+            "https://": httpx.HTTPTransport(proxy=proxy_https_url, limits=limits, http2=http2),
+        }
+        return httpx.Client(mounts=proxy_mounts, limits=limits, http2=http2, cookies=cookies)
+    else:
+        return httpx.Client(limits=limits, http2=http2, cookies=cookies)
+
+
+def get_client() -> httpx.Client:
+    """
+    Get the process-wide HTTP client for the current proxy configuration,
+    so that connections are kept alive and reused across requests.
+    """
+    proxy_key = (
+        dify_config.SSRF_PROXY_ALL_URL,
+        dify_config.SSRF_PROXY_HTTP_URL,
+        dify_config.SSRF_PROXY_HTTPS_URL,
+    )
+    client = _clients.get(proxy_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(proxy_key)
+            if client is None:
+                client = _build_client(proxy_key)
+                _clients[proxy_key] = client
+                client_pool_stats.record_client_created()
+    return client
+
+
 def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
@@ -37,21 +135,18 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
 
     retries = 0
     stream = kwargs.pop("stream", False)
+    extensions = kwargs.pop("extensions", None) or {}
+    client = get_client()
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL),
-                }
-                with httpx.Client(mounts=proxy_mounts) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            else:
-                with httpx.Client() as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            connection_events: list[str] = []
+
+            def trace(event_name: str, info: dict, connection_events: list[str] = connection_events) -> None:
+                if event_name == "connection.connect_tcp.started":
+                    connection_events.append(event_name)
+
+            response = client.request(method=method, url=url, extensions={**extensions, "trace": trace}, **kwargs)
+            client_pool_stats.record_request(new_connection=bool(connection_events))
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
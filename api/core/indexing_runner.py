@@ -1,11 +1,14 @@
 import concurrent.futures
+import contextlib
 import datetime
+import itertools
 import json
 import logging
 import re
 import threading
 import time
 import uuid
+from collections.abc import Generator
 from typing import Any, Optional, cast
 
 from flask import current_app
@@ -38,6 +41,7 @@ from libs import helper
 from models.dataset import ChildChunk, Dataset, DatasetProcessRule, DocumentSegment
 from models.dataset import Document as DatasetDocument
 from models.model import UploadFile
+from services.entities.knowledge_entities.knowledge_entities import ParentMode
 from services.feature_service import FeatureService
 
 
@@ -66,23 +70,8 @@ class IndexingRunner:
                     raise ValueError("no process rule found")
                 index_type = dataset_document.doc_form
                 index_processor = IndexProcessorFactory(index_type).init_index_processor()
-                # extract
-                text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
-
-                # transform
-                documents = self._transform(
-                    index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
-                )
-                # save segment
-                self._load_segments(dataset, dataset_document, documents)
-
-                # load
-                self._load(
-                    index_processor=index_processor,
-                    dataset=dataset,
-                    dataset_document=dataset_document,
-                    documents=documents,
-                )
+                # extract, transform, save segment and load
+                self._extract_transform_load(index_processor, dataset, dataset_document, processing_rule.to_dict())
             except DocumentIsPausedError:
                 raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
             except ProviderTokenNotInitError as e:
@@ -130,20 +119,8 @@ class IndexingRunner:
 
             index_type = dataset_document.doc_form
             index_processor = IndexProcessorFactory(index_type).init_index_processor()
-            # extract
-            text_docs = self._extract(index_processor, dataset_document, processing_rule.to_dict())
-
-            # transform
-            documents = self._transform(
-                index_processor, dataset, text_docs, dataset_document.doc_language, processing_rule.to_dict()
-            )
-            # save segment
-            self._load_segments(dataset, dataset_document, documents)
-
-            # load
-            self._load(
-                index_processor=index_processor, dataset=dataset, dataset_document=dataset_document, documents=documents
-            )
+            # extract, transform, save segment and load
+            self._extract_transform_load(index_processor, dataset, dataset_document, processing_rule.to_dict())
         except DocumentIsPausedError:
             raise DocumentIsPausedError("Document paused, document id: {}".format(dataset_document.id))
         except ProviderTokenNotInitError as e:
@@ -327,6 +304,90 @@ class IndexingRunner:
             return IndexingEstimate(total_segments=total_segments * 20, qa_preview=preview_texts, preview=[])
         return IndexingEstimate(total_segments=total_segments, preview=preview_texts)  # type: ignore
 
+    def _extract_transform_load(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        process_rule: dict,
+    ) -> None:
+        """
+        Extract, transform and load the document in batches of pages, so that only one batch is held in memory.
+        The next batch is extracted only when the previous one is loaded.
+        """
+        if not self._can_process_in_batches(dataset_document, process_rule):
+            text_docs = self._extract(index_processor, dataset_document, process_rule)
+            documents = self._transform(
+                index_processor, dataset, text_docs, dataset_document.doc_language, process_rule
+            )
+            self._load_segments(dataset, dataset_document, documents)
+            self._load(
+                index_processor=index_processor, dataset=dataset, dataset_document=dataset_document, documents=documents
+            )
+            return
+
+        word_count = 0
+        tokens = 0
+        indexing_latency = 0.0
+        # closing removes the downloaded file right away if a batch fails
+        with contextlib.closing(self._extract_in_batches(index_processor, dataset_document, process_rule)) as batches:
+            for batch_number, text_docs in enumerate(batches):
+                word_count += sum(len(text_doc.page_content) for text_doc in text_docs)
+                if batch_number == 0:
+                    self._update_document_index_status(
+                        document_id=dataset_document.id, after_indexing_status="splitting"
+                    )
+
+                documents = self._transform(
+                    index_processor, dataset, text_docs, dataset_document.doc_language, process_rule
+                )
+                self._load_segments(dataset, dataset_document, documents)
+
+                indexing_start_at = time.perf_counter()
+                tokens += self._index_documents(index_processor, dataset, dataset_document, documents)
+                indexing_latency += time.perf_counter() - indexing_start_at
+
+        now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        self._update_document_index_status(
+            document_id=dataset_document.id,
+            after_indexing_status="completed",
+            extra_update_params={
+                DatasetDocument.word_count: word_count,
+                DatasetDocument.parsing_completed_at: now,
+                DatasetDocument.tokens: tokens,
+                DatasetDocument.completed_at: now,
+                DatasetDocument.indexing_latency: indexing_latency,
+                DatasetDocument.error: None,
+            },
+        )
+
+    @staticmethod
+    def _can_process_in_batches(dataset_document: DatasetDocument, process_rule: dict) -> bool:
+        # a full-doc parent chunk is made of all pages of the document
+        if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+            rules = process_rule.get("rules") or {}
+            return rules.get("parent_mode") != ParentMode.FULL_DOC
+
+        return True
+
+    def _extract_in_batches(
+        self, index_processor: BaseIndexProcessor, dataset_document: DatasetDocument, process_rule: dict
+    ) -> Generator[list[Document], None, None]:
+        extract_setting = self._get_extract_setting(dataset_document)
+        if not extract_setting:
+            return
+
+        text_docs = index_processor.lazy_extract(extract_setting, process_rule_mode=process_rule["mode"])
+        with contextlib.closing(text_docs):
+            while batch := list(itertools.islice(text_docs, dify_config.INDEXING_EXTRACT_BATCH_SIZE)):
+                # replace doc id to document model id
+                for text_doc in batch:
+                    if text_doc.metadata is not None:
+                        text_doc.metadata["document_id"] = dataset_document.id
+                        text_doc.metadata["dataset_id"] = dataset_document.dataset_id
+
+                yield batch
+
     def _extract(
         self, index_processor: BaseIndexProcessor, dataset_document: DatasetDocument, process_rule: dict
     ) -> list[Document]:
@@ -334,8 +395,37 @@ class IndexingRunner:
         if dataset_document.data_source_type not in {"upload_file", "notion_import", "website_crawl"}:
             return []
 
-        data_source_info = dataset_document.data_source_info_dict
+        extract_setting = self._get_extract_setting(dataset_document)
         text_docs = []
+        if extract_setting:
+            text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
+
+        # update document status to splitting
+        self._update_document_index_status(
+            document_id=dataset_document.id,
+            after_indexing_status="splitting",
+            extra_update_params={
+                DatasetDocument.word_count: sum(len(text_doc.page_content) for text_doc in text_docs),
+                DatasetDocument.parsing_completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+            },
+        )
+
+        # replace doc id to document model id
+        text_docs = cast(list[Document], text_docs)
+        for text_doc in text_docs:
+            if text_doc.metadata is not None:
+                text_doc.metadata["document_id"] = dataset_document.id
+                text_doc.metadata["dataset_id"] = dataset_document.dataset_id
+
+        return text_docs
+
+    @staticmethod
+    def _get_extract_setting(dataset_document: DatasetDocument) -> Optional[ExtractSetting]:
+        if dataset_document.data_source_type not in {"upload_file", "notion_import", "website_crawl"}:
+            return None
+
+        data_source_info = dataset_document.data_source_info_dict
+        extract_setting = None
         if dataset_document.data_source_type == "upload_file":
             if not data_source_info or "upload_file_id" not in data_source_info:
                 raise ValueError("no upload file found")
@@ -348,7 +438,6 @@ class IndexingRunner:
                 extract_setting = ExtractSetting(
                     datasource_type="upload_file", upload_file=file_detail, document_model=dataset_document.doc_form
                 )
-                text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
         elif dataset_document.data_source_type == "notion_import":
             if (
                 not data_source_info
@@ -367,7 +456,6 @@ class IndexingRunner:
                 },
                 document_model=dataset_document.doc_form,
             )
-            text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
         elif dataset_document.data_source_type == "website_crawl":
             if (
                 not data_source_info
@@ -388,25 +476,8 @@ class IndexingRunner:
                 },
                 document_model=dataset_document.doc_form,
             )
-            text_docs = index_processor.extract(extract_setting, process_rule_mode=process_rule["mode"])
-        # update document status to splitting
-        self._update_document_index_status(
-            document_id=dataset_document.id,
-            after_indexing_status="splitting",
-            extra_update_params={
-                DatasetDocument.word_count: sum(len(text_doc.page_content) for text_doc in text_docs),
-                DatasetDocument.parsing_completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-            },
-        )
 
-        # replace doc id to document model id
-        text_docs = cast(list[Document], text_docs)
-        for text_doc in text_docs:
-            if text_doc.metadata is not None:
-                text_doc.metadata["document_id"] = dataset_document.id
-                text_doc.metadata["dataset_id"] = dataset_document.dataset_id
-
-        return text_docs
+        return extract_setting
 
     @staticmethod
     def filter_string(text):
@@ -517,7 +588,32 @@ class IndexingRunner:
         """
         insert index and update document/segment status to completed
         """
+        indexing_start_at = time.perf_counter()
+        tokens = self._index_documents(index_processor, dataset, dataset_document, documents)
+        indexing_end_at = time.perf_counter()
 
+        # update document status to completed
+        self._update_document_index_status(
+            document_id=dataset_document.id,
+            after_indexing_status="completed",
+            extra_update_params={
+                DatasetDocument.tokens: tokens,
+                DatasetDocument.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
+                DatasetDocument.indexing_latency: indexing_end_at - indexing_start_at,
+                DatasetDocument.error: None,
+            },
+        )
+
+    def _index_documents(
+        self,
+        index_processor: BaseIndexProcessor,
+        dataset: Dataset,
+        dataset_document: DatasetDocument,
+        documents: list[Document],
+    ) -> int:
+        """
+        insert index and update segment status to completed, return the number of embedding tokens
+        """
         embedding_model_instance = None
         if dataset.indexing_technique == "high_quality":
             embedding_model_instance = self.model_manager.get_model_instance(
@@ -528,7 +624,6 @@ class IndexingRunner:
             )
 
         # chunk nodes by chunk size
-        indexing_start_at = time.perf_counter()
         tokens = 0
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX:
             # create keyword index
@@ -570,19 +665,8 @@ class IndexingRunner:
                     tokens += future.result()
         if dataset_document.doc_form != IndexType.PARENT_CHILD_INDEX:
             create_keyword_thread.join()
-        indexing_end_at = time.perf_counter()
 
-        # update document status to completed
-        self._update_document_index_status(
-            document_id=dataset_document.id,
-            after_indexing_status="completed",
-            extra_update_params={
-                DatasetDocument.tokens: tokens,
-                DatasetDocument.completed_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-                DatasetDocument.indexing_latency: indexing_end_at - indexing_start_at,
-                DatasetDocument.error: None,
-            },
-        )
+        return tokens
 
     @staticmethod
     def _process_keyword_index(flask_app, dataset_id, document_id, documents):
@@ -673,14 +757,6 @@ class IndexingRunner:
         DatasetDocument.query.filter_by(id=document_id).update(update_params)
         db.session.commit()
 
-    @staticmethod
-    def _update_segments_by_document(dataset_document_id: str, update_params: dict) -> None:
-        """
-        Update the document segment by document id.
-        """
-        DocumentSegment.query.filter_by(document_id=dataset_document_id).update(update_params)
-        db.session.commit()
-
     def _transform(
         self,
         index_processor: BaseIndexProcessor,
@@ -735,15 +811,18 @@ class IndexingRunner:
             },
         )
 
-        # update segment status to indexing
-        self._update_segments_by_document(
-            dataset_document_id=dataset_document.id,
-            update_params={
+        # update segment status to indexing, the segments loaded before are completed already
+        document_ids = [document.metadata["doc_id"] for document in documents if document.metadata is not None]
+        DocumentSegment.query.filter(
+            DocumentSegment.document_id == dataset_document.id,
+            DocumentSegment.index_node_id.in_(document_ids),
+        ).update(
+            {
                 DocumentSegment.status: "indexing",
                 DocumentSegment.indexing_at: datetime.datetime.now(datetime.UTC).replace(tzinfo=None),
-            },
+            }
         )
-        pass
+        db.session.commit()
 
 
 class DocumentIsPausedError(Exception):
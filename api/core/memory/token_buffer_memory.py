@@ -1,8 +1,10 @@
+import bisect
+import logging
 from collections.abc import Sequence
 from typing import Optional
 
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
-from core.file import file_manager
+from core.file import FileUploadConfig, file_manager
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -15,12 +17,18 @@ from core.model_runtime.entities import (
 )
 from core.prompt.utils.extract_thread_messages import extract_thread_messages
 from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from factories import file_factory
 from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.workflow import Workflow, WorkflowRun
+
+logger = logging.getLogger(__name__)
 
 
 class TokenBufferMemory:
+    # message contents never change once answered, so their token counts can be cached for a long time
+    MESSAGE_TOKENS_CACHE_TTL = 86400
+
     def __init__(self, conversation: Conversation, model_instance: ModelInstance) -> None:
         self.conversation = conversation
         self.model_instance = model_instance
@@ -68,23 +76,31 @@ class TokenBufferMemory:
 
         messages = list(reversed(thread_messages))
 
+        # prefetch the files of all messages and the file upload configs they need in a constant number of queries
+        message_files_map = self._get_message_files_map([message.id for message in messages])
+        is_workflow_mode = self.conversation.mode in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}
+        workflow_file_configs: dict[str, Optional[FileUploadConfig]] = {}
+        if is_workflow_mode:
+            workflow_file_configs = self._get_workflow_file_upload_configs(
+                [message.workflow_run_id for message in messages if message.id in message_files_map]
+            )
+        app_file_config: Optional[FileUploadConfig] = None
+        app_file_config_loaded = False
+
         prompt_messages: list[PromptMessage] = []
+        prompt_message_keys: list[str] = []
         for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
+            files = message_files_map.get(message.id)
             if files:
                 file_extra_config = None
-                if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+                if not is_workflow_mode:
+                    if not app_file_config_loaded:
+                        app_file_config = FileUploadConfigManager.convert(self.conversation.model_config)
+                        app_file_config_loaded = True
+                    file_extra_config = app_file_config
                 else:
                     if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
+                        file_extra_config = workflow_file_configs.get(message.workflow_run_id)
 
                 detail = ImagePromptMessageContent.DETAIL.LOW
                 if file_extra_config and app_record:
@@ -114,21 +130,161 @@ class TokenBufferMemory:
                 prompt_messages.append(UserPromptMessage(content=message.query))
 
             prompt_messages.append(AssistantPromptMessage(content=message.answer))
+            prompt_message_keys.append(f"{message.id}:user")
+            prompt_message_keys.append(f"{message.id}:assistant")
 
         if not prompt_messages:
             return []
 
-        # prune the chat message if it exceeds the max token limit
-        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        return self._prune_prompt_messages(prompt_messages, prompt_message_keys, max_token_limit)
 
-        if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+    def _prune_prompt_messages(
+        self, prompt_messages: list[PromptMessage], prompt_message_keys: list[str], max_token_limit: int
+    ) -> list[PromptMessage]:
+        """
+        Remove the oldest prompt messages until the remaining ones fit into the max token limit,
+        keeping at least one message.
+        :param prompt_messages: prompt messages
+        :param prompt_message_keys: cache keys of prompt messages, in the same order
+        :param max_token_limit: max token limit
+        :return: remaining prompt messages
+        """
+        cache_keys = [
+            f"message_tokens:{self.model_instance.provider}:{self.model_instance.model}:{key}"
+            for key in prompt_message_keys
+        ]
+        cached_tokens = self._get_cached_message_tokens(cache_keys)
+
+        total_tokens = None
+        if all(tokens is None for tokens in cached_tokens):
+            # nothing is cached, a history which fits into the limit only needs one count
+            total_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+            if total_tokens <= max_token_limit:
+                return prompt_messages
+
+        message_tokens = self._count_message_tokens(prompt_messages, cache_keys, cached_tokens)
+        if total_tokens is None:
+            # every message counted alone includes the fixed overhead of a prompt, so the sum is never lower
+            if sum(message_tokens) <= max_token_limit:
+                return prompt_messages
+            total_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+            if total_tokens <= max_token_limit:
+                return prompt_messages
+        if len(prompt_messages) == 1:
+            return prompt_messages
+
+        # the fixed overhead of a prompt, e.g. the reply priming, is counted once per message in the message tokens
+        overhead = (sum(message_tokens) - total_tokens) / (len(message_tokens) - 1)
+        adjusted_tokens: list[float] = [tokens - overhead for tokens in message_tokens]
+
+        # find the first message from which the remaining messages fit into the limit, keeping at least one message
+        suffix_tokens = [overhead] * (len(adjusted_tokens) + 1)
+        for i in range(len(adjusted_tokens) - 1, -1, -1):
+            suffix_tokens[i] = suffix_tokens[i + 1] + adjusted_tokens[i]
+        start = bisect.bisect_left([-tokens for tokens in suffix_tokens], -max_token_limit)
+        start = min(start, len(prompt_messages) - 1)
+        prompt_messages = prompt_messages[start:]
+        adjusted_tokens = adjusted_tokens[start:]
+
+        # the estimate is exact for a fixed overhead per prompt, check once more for other tokenizers
+        curr_message_tokens: float = self.model_instance.get_llm_num_tokens(prompt_messages)
+        while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
+            prompt_messages.pop(0)
+            curr_message_tokens -= adjusted_tokens.pop(0)
 
         return prompt_messages
 
+    @staticmethod
+    def _get_message_files_map(message_ids: list[str]) -> dict[str, list[MessageFile]]:
+        """
+        Get the files of all messages in one query.
+        :param message_ids: message ids
+        :return: mapping of message id to its files
+        """
+        message_files_map: dict[str, list[MessageFile]] = {}
+        if not message_ids:
+            return message_files_map
+
+        message_files = db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).all()
+        for message_file in message_files:
+            message_files_map.setdefault(message_file.message_id, []).append(message_file)
+        return message_files_map
+
+    @staticmethod
+    def _get_workflow_file_upload_configs(
+        workflow_run_ids: list[Optional[str]],
+    ) -> dict[str, Optional[FileUploadConfig]]:
+        """
+        Get the file upload configs of the workflows of the given workflow runs,
+        converting the features of each workflow only once.
+        :param workflow_run_ids: workflow run ids
+        :return: mapping of workflow run id to the file upload config of its workflow
+        """
+        run_ids = {run_id for run_id in workflow_run_ids if run_id}
+        if not run_ids:
+            return {}
+
+        workflow_runs = (
+            db.session.query(WorkflowRun.id, WorkflowRun.workflow_id).filter(WorkflowRun.id.in_(run_ids)).all()
+        )
+        workflow_ids = {workflow_run.workflow_id for workflow_run in workflow_runs}
+        workflows = db.session.query(Workflow).filter(Workflow.id.in_(workflow_ids)).all() if workflow_ids else []
+
+        workflow_file_configs = {
+            workflow.id: FileUploadConfigManager.convert(workflow.features_dict, is_vision=False)
+            for workflow in workflows
+        }
+        return {
+            workflow_run.id: workflow_file_configs[workflow_run.workflow_id]
+            for workflow_run in workflow_runs
+            if workflow_run.workflow_id in workflow_file_configs
+        }
+
+    @staticmethod
+    def _get_cached_message_tokens(cache_keys: list[str]) -> list[Optional[int]]:
+        """
+        Get the cached number of tokens of prompt messages.
+        :param cache_keys: cache keys of prompt messages
+        :return: number of tokens of each prompt message, None if it is not cached
+        """
+        try:
+            cached_tokens = redis_client.mget(cache_keys)
+        except Exception:
+            logger.exception("Failed to get message tokens from redis")
+            return [None] * len(cache_keys)
+        return [int(tokens) if tokens is not None else None for tokens in cached_tokens]
+
+    def _count_message_tokens(
+        self, prompt_messages: list[PromptMessage], cache_keys: list[str], cached_tokens: list[Optional[int]]
+    ) -> list[int]:
+        """
+        Count the tokens of each prompt message which are not cached yet, and cache them.
+        :param prompt_messages: prompt messages
+        :param cache_keys: cache keys of prompt messages, in the same order
+        :param cached_tokens: cached number of tokens of prompt messages, in the same order
+        :return: number of tokens of each prompt message
+        """
+        message_tokens = []
+        new_tokens = {}
+        for prompt_message, cache_key, cached in zip(prompt_messages, cache_keys, cached_tokens):
+            if cached is not None:
+                message_tokens.append(cached)
+            else:
+                tokens = self.model_instance.get_llm_num_tokens([prompt_message])
+                message_tokens.append(tokens)
+                new_tokens[cache_key] = tokens
+
+        if new_tokens:
+            try:
+                with redis_client.pipeline(transaction=False) as pipe:
+                    for cache_key, tokens in new_tokens.items():
+                        pipe.setex(cache_key, self.MESSAGE_TOKENS_CACHE_TTL, tokens)
+                    pipe.execute()
+            except Exception:
+                logger.exception("Failed to add message tokens to redis")
+
+        return message_tokens
+
     def get_history_prompt_text(
         self,
         human_prefix: str = "Human",
@@ -213,6 +213,27 @@ class ModelInstance:
             ),
         )
 
+    def get_text_embedding_num_tokens_list(self, texts: list[str]) -> list[int]:
+        """
+        Get number of tokens of each text for text embedding
+
+        :param texts: texts to embed
+        :return:
+        """
+        if not isinstance(self.model_type_instance, TextEmbeddingModel):
+            raise Exception("Model type instance is not TextEmbeddingModel")
+
+        self.model_type_instance = cast(TextEmbeddingModel, self.model_type_instance)
+        return cast(
+            list[int],
+            self._round_robin_invoke(
+                function=self.model_type_instance.get_num_tokens_list,
+                model=self.model,
+                credentials=self.credentials,
+                texts=texts,
+            ),
+        )
+
     def invoke_rerank(
         self,
         query: str,
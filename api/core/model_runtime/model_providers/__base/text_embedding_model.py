@@ -78,6 +78,19 @@ class TextEmbeddingModel(AIModel):
         """
         raise NotImplementedError
 
+    def get_num_tokens_list(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
+        """
+        Get number of tokens for each of the given texts
+
+        Providers that can tokenize a batch of texts in one call should override this method.
+
+        :param model: model name
+        :param credentials: model credentials
+        :param texts: texts to embed
+        :return: number of tokens of each text, in the same order as texts
+        """
+        return [self.get_num_tokens(model, credentials, [text]) for text in texts]
+
     def _get_context_size(self, model: str, credentials: dict) -> int:
         """
         Get context size for given embedding model
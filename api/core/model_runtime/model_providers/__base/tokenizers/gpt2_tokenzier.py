@@ -27,6 +27,17 @@ class GPT2Tokenizer:
         # return cast(int, result)
         return GPT2Tokenizer._get_num_tokens_by_gpt2(text)
 
+    @staticmethod
+    def get_num_tokens_list(texts: list[str]) -> list[int]:
+        """
+        use gpt2 tokenizer to get num tokens of each text, the texts are encoded in one batch
+        """
+        _tokenizer = GPT2Tokenizer.get_encoder()
+        if hasattr(_tokenizer, "encode_batch"):
+            return [len(tokens) for tokens in _tokenizer.encode_batch(texts)]
+
+        return [len(tokens) for tokens in _tokenizer(texts)["input_ids"]]
+
     @staticmethod
     def get_encoder() -> Any:
         global _tokenizer, _lock
@@ -41,7 +52,7 @@ class GPT2Tokenizer:
                 except Exception:
                     from os.path import abspath, dirname, join
 
-                    from transformers import GPT2Tokenizer as TransformerGPT2Tokenizer  # type: ignore
+                    from transformers import GPT2TokenizerFast as TransformerGPT2Tokenizer  # type: ignore
 
                     base_path = abspath(__file__)
                     gpt2_tokenizer_path = join(dirname(base_path), "gpt2")
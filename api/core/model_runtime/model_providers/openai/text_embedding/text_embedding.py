@@ -132,6 +132,25 @@ class OpenAITextEmbeddingModel(_CommonOpenAI, TextEmbeddingModel):
 
         return total_num_tokens
 
+    def get_num_tokens_list(self, model: str, credentials: dict, texts: list[str]) -> list[int]:
+        """
+        Get number of tokens for each of the given texts
+
+        :param model: model name
+        :param credentials: model credentials
+        :param texts: texts to embed
+        :return:
+        """
+        if len(texts) == 0:
+            return []
+
+        try:
+            enc = tiktoken.encoding_for_model(model)
+        except KeyError:
+            enc = tiktoken.get_encoding("cl100k_base")
+
+        return [len(tokenized_text) for tokenized_text in enc.encode_batch(texts)]
+
     def validate_credentials(self, model: str, credentials: dict) -> None:
         """
         Validate model credentials
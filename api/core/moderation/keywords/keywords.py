@@ -1,7 +1,13 @@
+import hashlib
 from collections.abc import Sequence
 from typing import Any
 
+from core.helper.lru_cache import LRUCache
 from core.moderation.base import Moderation, ModerationAction, ModerationInputsResult, ModerationOutputsResult
+from core.moderation.keywords.keywords_matcher import KeywordsMatcher
+
+# compiled keywords matchers by hash of the keywords list
+_keywords_matcher_cache = LRUCache(capacity=1000)
 
 
 class KeywordsModeration(Moderation):
@@ -70,4 +76,14 @@ class KeywordsModeration(Moderation):
         return any(self._check_keywords_in_value(keywords_list, value) for value in inputs.values())
 
     def _check_keywords_in_value(self, keywords_list: Sequence[str], value: Any) -> bool:
-        return any(keyword.lower() in str(value).lower() for keyword in keywords_list)
+        return self._get_keywords_matcher(keywords_list).search(str(value))
+
+    @staticmethod
+    def _get_keywords_matcher(keywords_list: Sequence[str]) -> KeywordsMatcher:
+        cache_key = hashlib.sha256("\n".join(keywords_list).encode()).hexdigest()
+        keywords_matcher = _keywords_matcher_cache.get(cache_key)
+        if keywords_matcher is None:
+            keywords_matcher = KeywordsMatcher(keywords_list)
+            _keywords_matcher_cache.put(cache_key, keywords_matcher)
+
+        return keywords_matcher
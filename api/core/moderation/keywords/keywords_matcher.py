@@ -0,0 +1,66 @@
+from collections import deque
+from collections.abc import Sequence
+
+
+class KeywordsMatcher:
+    """
+    Aho-Corasick automaton of a list of keywords, finds the keywords in a text in a single pass.
+    Keywords are matched case-insensitively.
+    """
+
+    def __init__(self, keywords: Sequence[str]) -> None:
+        # state 0 is the root, a state matches if a keyword ends at it or at one of its suffixes
+        self._transitions: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._matches: list[bool] = [False]
+
+        for keyword in keywords:
+            if keyword:
+                self._add_keyword(keyword.lower())
+        self._build_fail_transitions()
+
+    def search(self, text: str) -> bool:
+        """
+        Check if any of the keywords is in the text.
+        :param text: text
+        :return: True if the text contains a keyword
+        """
+        transitions = self._transitions
+        fail = self._fail
+        matches = self._matches
+
+        state = 0
+        for char in text.lower():
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if matches[state]:
+                return True
+
+        return False
+
+    def _add_keyword(self, keyword: str) -> None:
+        state = 0
+        for char in keyword:
+            next_state = self._transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self._transitions)
+                self._transitions.append({})
+                self._fail.append(0)
+                self._matches.append(False)
+                self._transitions[state][char] = next_state
+            state = next_state
+        self._matches[state] = True
+
+    def _build_fail_transitions(self) -> None:
+        queue = deque(self._transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._transitions[state].items():
+                queue.append(next_state)
+
+                fail_state = self._fail[state]
+                while fail_state and char not in self._transitions[fail_state]:
+                    fail_state = self._fail[fail_state]
+                self._fail[next_state] = self._transitions[fail_state].get(char, 0)
+                self._matches[next_state] = self._matches[next_state] or self._matches[self._fail[next_state]]
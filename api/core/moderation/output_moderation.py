@@ -4,7 +4,7 @@ import time
 from typing import Any, Optional
 
 from flask import Flask, current_app
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 from configs import dify_config
 from core.app.apps.base_app_queue_manager import AppQueueManager, PublishFrom
@@ -20,6 +20,13 @@ class ModerationRule(BaseModel):
     config: dict[str, Any]
 
 
+class OutputModerationMetrics(BaseModel):
+    check_count: int = 0
+    checked_bytes: int = 0
+    total_latency: float = 0
+    max_latency: float = 0
+
+
 class OutputModeration(BaseModel):
     tenant_id: str
     app_id: str
@@ -32,8 +39,15 @@ class OutputModeration(BaseModel):
     buffer: str = ""
     is_final_chunk: bool = False
     final_output: Optional[str] = None
+    metrics: OutputModerationMetrics = Field(default_factory=OutputModerationMetrics)
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    # notified when new tokens arrive and when the moderation is finished
+    _condition: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+    # in incremental mode, the buffer before _window_start is checked already, and _moderated_text is its output
+    _window_start: int = PrivateAttr(default=0)
+    _moderated_text: str = PrivateAttr(default="")
+
     def should_direct_output(self) -> bool:
         return self.final_output is not None
 
@@ -41,25 +55,44 @@ class OutputModeration(BaseModel):
         return self.final_output or ""
 
     def append_new_token(self, token: str) -> None:
-        self.buffer += token
+        with self._condition:
+            self.buffer += token
+            self._condition.notify_all()
 
         if not self.thread:
             self.thread = self.start_thread()
 
     def moderation_completion(self, completion: str, public_event: bool = False) -> str:
-        self.buffer = completion
-        self.is_final_chunk = True
+        with self._condition:
+            checked_text = self.buffer[: self._window_start]
+            window_start = self._window_start
+            moderated_text = self._moderated_text
+            self.buffer = completion
+            self.is_final_chunk = True
+            self._condition.notify_all()
+
+        if self.final_output is not None:
+            # flagged by the worker already
+            final_output = self.final_output
+        else:
+            if not dify_config.MODERATION_INCREMENTAL_ENABLED or not completion.startswith(checked_text):
+                window_start = 0
+                moderated_text = ""
 
-        result = self.moderation(tenant_id=self.tenant_id, app_id=self.app_id, moderation_buffer=completion)
+            result = self.moderation(
+                tenant_id=self.tenant_id, app_id=self.app_id, moderation_buffer=completion[window_start:]
+            )
 
-        if not result or not result.flagged:
-            return completion
+            if not result or not result.flagged:
+                self._log_metrics()
+                return moderated_text + completion[window_start:]
 
-        if result.action == ModerationAction.DIRECT_OUTPUT:
-            final_output = result.preset_response
-        else:
-            final_output = result.text
+            if result.action == ModerationAction.DIRECT_OUTPUT:
+                final_output = result.preset_response
+            else:
+                final_output = moderated_text + result.text
 
+        self._log_metrics()
         if public_event:
             self.queue_manager.publish(QueueMessageReplaceEvent(text=final_output), PublishFrom.TASK_PIPELINE)
 
@@ -81,32 +114,55 @@ class OutputModeration(BaseModel):
 
     def stop_thread(self):
         if self.thread and self.thread.is_alive():
-            self.thread_running = False
+            with self._condition:
+                self.thread_running = False
+                self._condition.notify_all()
 
     def worker(self, flask_app: Flask, buffer_size: int):
+        incremental = dify_config.MODERATION_INCREMENTAL_ENABLED
+        overlap_size = dify_config.MODERATION_OVERLAP_SIZE
         with flask_app.app_context():
             current_length = 0
-            while self.thread_running:
-                moderation_buffer = self.buffer
-                buffer_length = len(moderation_buffer)
-                if not self.is_final_chunk:
-                    chunk_length = buffer_length - current_length
-                    if 0 <= chunk_length < buffer_size:
-                        time.sleep(1)
-                        continue
-
-                current_length = buffer_length
+            while True:
+                with self._condition:
+                    # wait for buffer_size new characters, the rest is checked by moderation_completion
+                    while (
+                        self.thread_running
+                        and not self.is_final_chunk
+                        and len(self.buffer) - current_length < buffer_size
+                    ):
+                        self._condition.wait()
+                    if not self.thread_running or self.is_final_chunk:
+                        break
+
+                    moderation_buffer = self.buffer
+                    window_start = self._window_start if incremental else 0
+
+                current_length = len(moderation_buffer)
 
                 result = self.moderation(
-                    tenant_id=self.tenant_id, app_id=self.app_id, moderation_buffer=moderation_buffer
+                    tenant_id=self.tenant_id, app_id=self.app_id, moderation_buffer=moderation_buffer[window_start:]
                 )
 
+                if incremental and (not result or not result.flagged):
+                    # check the end of this window again with the next one, in case the flagged text spans both
+                    next_window_start = max(window_start, current_length - overlap_size)
+                    with self._condition:
+                        self._moderated_text += moderation_buffer[window_start:next_window_start]
+                        self._window_start = next_window_start
+
                 if not result or not result.flagged:
                     continue
 
                 if result.action == ModerationAction.DIRECT_OUTPUT:
                     final_output = result.preset_response
                     self.final_output = final_output
+                elif incremental:
+                    # the overridden text can not be split, so the next window starts after it
+                    with self._condition:
+                        self._moderated_text += result.text
+                        self._window_start = current_length
+                        final_output = self._moderated_text + self.buffer[current_length:]
                 else:
                     final_output = result.text + self.buffer[len(moderation_buffer) :]
 
@@ -118,6 +174,7 @@ class OutputModeration(BaseModel):
                     break
 
     def moderation(self, tenant_id: str, app_id: str, moderation_buffer: str) -> Optional[ModerationOutputsResult]:
+        start_at = time.perf_counter()
         try:
             moderation_factory = ModerationFactory(
                 name=self.rule.type, app_id=app_id, tenant_id=tenant_id, config=self.rule.config
@@ -127,5 +184,21 @@ class OutputModeration(BaseModel):
             return result
         except Exception as e:
             logger.exception(f"Moderation Output error, app_id: {app_id}")
+        finally:
+            latency = time.perf_counter() - start_at
+            self.metrics.check_count += 1
+            self.metrics.checked_bytes += len(moderation_buffer.encode())
+            self.metrics.total_latency += latency
+            self.metrics.max_latency = max(self.metrics.max_latency, latency)
 
         return None
+
+    def _log_metrics(self) -> None:
+        logger.debug(
+            "Output moderation of app %s: %d checks, %d bytes checked, %.3fs in total, %.3fs at most",
+            self.app_id,
+            self.metrics.check_count,
+            self.metrics.checked_bytes,
+            self.metrics.total_latency,
+            self.metrics.max_latency,
+        )
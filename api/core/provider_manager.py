@@ -1,4 +1,6 @@
 import json
+import logging
+import time
 from collections import defaultdict
 from json import JSONDecodeError
 from typing import Optional, cast
@@ -19,6 +21,7 @@ from core.entities.provider_entities import (
     SystemConfiguration,
 )
 from core.helper import encrypter
+from core.helper.lru_cache import LRUCache
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
 from core.helper.position_helper import is_filtered
 from core.model_runtime.entities.model_entities import ModelType
@@ -44,12 +47,18 @@ from models.provider import (
 )
 from services.feature_service import FeatureService
 
+logger = logging.getLogger(__name__)
+
 
 class ProviderManager:
     """
     ProviderManager is a class that manages the model providers includes Hosting and Customize Model Providers.
     """
 
+    # assembled provider configurations of recently used workspaces, shared by all managers of the process
+    # and validated against a version stamp in redis that is bumped on every configuration change
+    _configurations_cache = LRUCache(dify_config.PROVIDER_CONFIGURATIONS_CACHE_MAX_SIZE)
+
     def __init__(self) -> None:
         self.decoding_rsa_key = None
         self.decoding_cipher_rsa = None
@@ -91,6 +100,79 @@ class ProviderManager:
         :param tenant_id:
         :return:
         """
+        cache_ttl = dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL
+        if cache_ttl <= 0:
+            return self._build_configurations(tenant_id)
+
+        # read the version before building, so a change made meanwhile is never cached under the new version
+        version = self._get_configurations_version(tenant_id)
+        cached = self._configurations_cache.get(tenant_id)
+        if cached is not None and version is not None:
+            cached_version, cached_at, cached_configurations = cached
+            if cached_version == version and time.monotonic() - cached_at < cache_ttl:
+                return self._copy_configurations(cached_configurations)
+
+        provider_configurations = self._build_configurations(tenant_id)
+        if version is not None:
+            self._configurations_cache.put(tenant_id, (version, time.monotonic(), provider_configurations))
+            return self._copy_configurations(provider_configurations)
+
+        return provider_configurations
+
+    @classmethod
+    def invalidate_configurations_cache(cls, tenant_id: str) -> None:
+        """
+        Invalidate the cached provider configurations of a workspace in all processes.
+
+        :param tenant_id: workspace id
+        :return:
+        """
+        cls._configurations_cache.delete(tenant_id)
+        try:
+            redis_client.incr(cls._get_configurations_version_key(tenant_id))
+        except Exception:
+            logger.exception("Failed to bump provider configurations version of tenant %s", tenant_id)
+
+    @staticmethod
+    def _get_configurations_version_key(tenant_id: str) -> str:
+        return f"provider_configurations_version:tenant_id:{tenant_id}"
+
+    @classmethod
+    def _get_configurations_version(cls, tenant_id: str) -> Optional[bytes]:
+        try:
+            version = redis_client.get(cls._get_configurations_version_key(tenant_id))
+        except Exception:
+            logger.exception("Failed to get provider configurations version of tenant %s", tenant_id)
+            return None
+        return version if version is not None else b"0"
+
+    @staticmethod
+    def _copy_configurations(provider_configurations: ProviderConfigurations) -> ProviderConfigurations:
+        """
+        Copy the workspace specific parts of cached provider configurations, as callers may modify
+        the credentials they get. Provider entities are shared by the model provider factory already.
+        """
+        copied_configurations = ProviderConfigurations(tenant_id=provider_configurations.tenant_id)
+        for provider_name, provider_configuration in provider_configurations.configurations.items():
+            copied_configurations[provider_name] = provider_configuration.model_copy(
+                update={
+                    "system_configuration": provider_configuration.system_configuration.model_copy(deep=True),
+                    "custom_configuration": provider_configuration.custom_configuration.model_copy(deep=True),
+                    "model_settings": [
+                        model_setting.model_copy(deep=True) for model_setting in provider_configuration.model_settings
+                    ],
+                }
+            )
+
+        return copied_configurations
+
+    def _build_configurations(self, tenant_id: str) -> ProviderConfigurations:
+        """
+        Build model provider configurations from the database.
+
+        :param tenant_id: workspace id
+        :return:
+        """
         # Get all provider records of the workspace
         provider_name_to_provider_records_dict = self._get_all_providers(tenant_id)
 
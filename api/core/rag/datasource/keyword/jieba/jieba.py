@@ -91,28 +91,7 @@ class Jieba(BaseKeyword):
 
         sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table or {}, query, k)
 
-        documents = []
-        for chunk_index in sorted_chunk_indices:
-            segment = (
-                db.session.query(DocumentSegment)
-                .filter(DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id == chunk_index)
-                .first()
-            )
-
-            if segment:
-                documents.append(
-                    Document(
-                        page_content=segment.content,
-                        metadata={
-                            "doc_id": chunk_index,
-                            "doc_hash": segment.index_node_hash,
-                            "document_id": segment.document_id,
-                            "dataset_id": segment.dataset_id,
-                        },
-                    )
-                )
-
-        return documents
+        return self._get_documents_by_index_node_ids(sorted_chunk_indices)
 
     def delete(self) -> None:
         lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
@@ -0,0 +1,150 @@
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from core.rag.datasource.keyword.jieba.jieba import KeywordTableConfig
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.keyword.keyword_base import BaseKeyword
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import Dataset, DatasetKeywordPosting, DocumentSegment
+
+
+class JiebaInvertedIndex(BaseKeyword):
+    """
+    Jieba keyword index backed by a normalized posting table.
+
+    Each (keyword, index node) pair is stored as its own row, so writes only touch
+    the postings of the affected nodes and searches only read the postings of the
+    query keywords, instead of loading and rewriting the whole dataset keyword table.
+    """
+
+    def __init__(self, dataset: Dataset):
+        super().__init__(dataset)
+        self._config = KeywordTableConfig()
+
+    def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
+        self.add_texts(texts, **kwargs)
+        return self
+
+    def add_texts(self, texts: list[Document], **kwargs):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords_list = kwargs.get("keywords_list")
+        node_keywords: dict[str, list[str]] = {}
+        for i, text in enumerate(texts):
+            keywords = keywords_list[i] if keywords_list else None
+            if not keywords:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            if text.metadata is not None:
+                node_keywords[text.metadata["doc_id"]] = list(keywords)
+
+        self._update_segments_keywords(node_keywords)
+        self._add_postings(node_keywords)
+
+    def text_exists(self, id: str) -> bool:
+        posting = (
+            db.session.query(DatasetKeywordPosting.id)
+            .filter(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id == id)
+            .first()
+        )
+        return posting is not None
+
+    def delete_by_ids(self, ids: list[str]) -> None:
+        if not ids:
+            return
+        db.session.query(DatasetKeywordPosting).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def search(self, query: str, **kwargs: Any) -> list[Document]:
+        k = kwargs.get("top_k", 4)
+
+        sorted_chunk_indices = self._retrieve_ids_by_query(query, k)
+        if not sorted_chunk_indices:
+            return []
+
+        return self._get_documents_by_index_node_ids(sorted_chunk_indices)
+
+    def delete(self) -> None:
+        db.session.query(DatasetKeywordPosting).filter(DatasetKeywordPosting.dataset_id == self.dataset.id).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+
+    def create_segment_keywords(self, node_id: str, keywords: list[str]):
+        self._update_segments_keywords({node_id: keywords})
+        self._add_postings({node_id: keywords})
+
+    def multi_create_segment_keywords(self, pre_segment_data_list: list):
+        keyword_table_handler = JiebaKeywordTableHandler()
+        node_keywords: dict[str, list[str]] = {}
+        for pre_segment_data in pre_segment_data_list:
+            segment = pre_segment_data["segment"]
+            if pre_segment_data["keywords"]:
+                segment.keywords = pre_segment_data["keywords"]
+            else:
+                keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
+                segment.keywords = list(keywords)
+            node_keywords[segment.index_node_id] = segment.keywords
+        self._add_postings(node_keywords)
+
+    def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
+        self._add_postings({node_id: keywords})
+
+    def _retrieve_ids_by_query(self, query: str, k: int = 4) -> list[str]:
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords = list(keyword_table_handler.extract_keywords(query))
+        if not keywords:
+            return []
+
+        # go through text chunks in order of most matching keywords
+        match_count = func.count(DatasetKeywordPosting.keyword)
+        rows = (
+            db.session.query(DatasetKeywordPosting.index_node_id, match_count)
+            .filter(
+                DatasetKeywordPosting.dataset_id == self.dataset.id,
+                DatasetKeywordPosting.keyword.in_(keywords),
+            )
+            .group_by(DatasetKeywordPosting.index_node_id)
+            .order_by(match_count.desc(), DatasetKeywordPosting.index_node_id)
+            .limit(k)
+            .all()
+        )
+        return [row.index_node_id for row in rows]
+
+    def _add_postings(self, node_keywords: dict[str, list[str]]):
+        postings = [
+            {"dataset_id": self.dataset.id, "keyword": keyword, "index_node_id": node_id}
+            for node_id, keywords in node_keywords.items()
+            for keyword in set(keywords)
+        ]
+        if not postings:
+            return
+        for i in range(0, len(postings), 1000):
+            stmt = (
+                insert(DatasetKeywordPosting)
+                .values(postings[i : i + 1000])
+                .on_conflict_do_nothing(index_elements=["dataset_id", "keyword", "index_node_id"])
+            )
+            db.session.execute(stmt)
+        db.session.commit()
+
+    def _update_segments_keywords(self, node_keywords: dict[str, list[str]]):
+        if not node_keywords:
+            return
+        document_segments = (
+            db.session.query(DocumentSegment)
+            .filter(
+                DocumentSegment.dataset_id == self.dataset.id,
+                DocumentSegment.index_node_id.in_(list(node_keywords.keys())),
+            )
+            .all()
+        )
+        for document_segment in document_segments:
+            document_segment.keywords = node_keywords[document_segment.index_node_id]
+            db.session.add(document_segment)
+        db.session.commit()
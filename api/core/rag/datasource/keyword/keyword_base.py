@@ -3,8 +3,10 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import Any
 
+from core.helper.segment_content_cache import SegmentContentCache
 from core.rag.models.document import Document
-from models.dataset import Dataset
+from extensions.ext_database import db
+from models.dataset import Dataset, DocumentSegment
 
 
 class BaseKeyword(ABC):
@@ -48,3 +50,45 @@ class BaseKeyword(ABC):
 
     def _get_uuids(self, texts: list[Document]) -> list[str]:
         return [text.metadata["doc_id"] for text in texts if text.metadata]
+
+    def _get_documents_by_index_node_ids(self, index_node_ids: list[str]) -> list[Document]:
+        """
+        Load the segments of the given index nodes in one query, keeping the order of the ids.
+        """
+        contents = SegmentContentCache.get_many(self.dataset.id, index_node_ids)
+        missing_ids = [node_id for node_id in index_node_ids if node_id not in contents]
+        if missing_ids:
+            segments = (
+                db.session.query(DocumentSegment)
+                .filter(DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id.in_(missing_ids))
+                .all()
+            )
+            loaded_contents = {
+                segment.index_node_id: {
+                    "content": segment.content,
+                    "doc_hash": segment.index_node_hash,
+                    "document_id": segment.document_id,
+                    "dataset_id": segment.dataset_id,
+                }
+                for segment in segments
+            }
+            SegmentContentCache.set_many(self.dataset.id, loaded_contents)
+            contents.update(loaded_contents)
+
+        documents = []
+        for chunk_index in index_node_ids:
+            content = contents.get(chunk_index)
+            if content:
+                documents.append(
+                    Document(
+                        page_content=content["content"],
+                        metadata={
+                            "doc_id": chunk_index,
+                            "doc_hash": content["doc_hash"],
+                            "document_id": content["document_id"],
+                            "dataset_id": content["dataset_id"],
+                        },
+                    )
+                )
+
+        return documents
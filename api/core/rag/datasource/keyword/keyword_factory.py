@@ -1,6 +1,5 @@
 from typing import Any
 
-from configs import dify_config
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
 from core.rag.datasource.keyword.keyword_type import KeyWordType
 from core.rag.models.document import Document
@@ -13,7 +12,8 @@ class Keyword:
         self._keyword_processor = self._init_keyword()
 
     def _init_keyword(self) -> BaseKeyword:
-        keyword_type = dify_config.KEYWORD_STORE
+        # the keyword index stays in the store which built it, until it is migrated with keyword-store-migrate
+        keyword_type = self._dataset.keyword_store or KeyWordType.JIEBA
         keyword_factory = self.get_keyword_factory(keyword_type)
         return keyword_factory(self._dataset)
 
@@ -24,6 +24,10 @@ class Keyword:
                 from core.rag.datasource.keyword.jieba.jieba import Jieba
 
                 return Jieba
+            case KeyWordType.JIEBA_INVERTED_INDEX:
+                from core.rag.datasource.keyword.jieba.jieba_inverted_index import JiebaInvertedIndex
+
+                return JiebaInvertedIndex
             case _:
                 raise ValueError(f"Keyword store {keyword_type} is not supported.")
 
@@ -1,12 +1,20 @@
+import logging
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional
 
 from flask import Flask, current_app
+from sqlalchemy import tuple_
 
+from configs import dify_config
+from core.model_manager import ModelManager
+from core.model_runtime.entities.model_entities import ModelType
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
 from core.rag.datasource.vdb.vector_factory import Vector
+from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.embedding.retrieval import RetrievalSegments
+from core.rag.entities.retrieval_entities import DatasetRetrievalSetting
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
@@ -24,6 +32,23 @@ default_retrieval_model = {
     "score_threshold_enabled": False,
 }
 
+logger = logging.getLogger(__name__)
+
+
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_executor_lock = threading.Lock()
+
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    global _retrieval_executor
+
+    with _retrieval_executor_lock:
+        if _retrieval_executor is None:
+            _retrieval_executor = ThreadPoolExecutor(
+                max_workers=dify_config.RETRIEVAL_SERVICE_MAX_WORKERS, thread_name_prefix="retrieval"
+            )
+        return _retrieval_executor
+
 
 class RetrievalService:
     @classmethod
@@ -40,87 +65,131 @@ class RetrievalService:
     ):
         if not query:
             return []
-        dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
-        if not dataset:
+        datasets = cls.get_available_datasets([dataset_id])
+        if not datasets:
             return []
 
-        if not dataset or dataset.available_document_count == 0 or dataset.available_segment_count == 0:
-            return []
-        all_documents: list[Document] = []
-        threads: list[threading.Thread] = []
-        exceptions: list[str] = []
-        # retrieval_model source with keyword
-        if retrieval_method == "keyword_search":
-            keyword_thread = threading.Thread(
-                target=RetrievalService.keyword_search,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "top_k": top_k,
-                    "all_documents": all_documents,
-                    "exceptions": exceptions,
-                },
+        setting = DatasetRetrievalSetting(
+            dataset=datasets[0],
+            retrieval_method=retrieval_method,
+            top_k=top_k,
+            score_threshold=score_threshold,
+            reranking_model=reranking_model,
+            reranking_mode=reranking_mode,
+            weights=weights,
+        )
+        return cls.retrieve_datasets(query, [setting])[0]
+
+    @classmethod
+    def get_available_datasets(cls, dataset_ids: list[str]) -> list[Dataset]:
+        """
+        Load the datasets with available documents and segments in one query.
+        """
+        available_document_datasets = (
+            db.session.query(DatasetDocument.dataset_id)
+            .filter(
+                DatasetDocument.dataset_id.in_(dataset_ids),
+                DatasetDocument.indexing_status == "completed",
+                DatasetDocument.enabled == True,
+                DatasetDocument.archived == False,
             )
-            threads.append(keyword_thread)
-            keyword_thread.start()
-        # retrieval_model source with semantic
-        if RetrievalMethod.is_support_semantic_search(retrieval_method):
-            embedding_thread = threading.Thread(
-                target=RetrievalService.embedding_search,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "top_k": top_k,
-                    "score_threshold": score_threshold,
-                    "reranking_model": reranking_model,
-                    "all_documents": all_documents,
-                    "retrieval_method": retrieval_method,
-                    "exceptions": exceptions,
-                },
+            .distinct()
+        )
+        available_segment_datasets = (
+            db.session.query(DocumentSegment.dataset_id)
+            .filter(
+                DocumentSegment.dataset_id.in_(dataset_ids),
+                DocumentSegment.status == "completed",
+                DocumentSegment.enabled == True,
             )
-            threads.append(embedding_thread)
-            embedding_thread.start()
-
-        # retrieval source with full text
-        if RetrievalMethod.is_support_fulltext_search(retrieval_method):
-            full_text_index_thread = threading.Thread(
-                target=RetrievalService.full_text_index_search,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "retrieval_method": retrieval_method,
-                    "score_threshold": score_threshold,
-                    "top_k": top_k,
-                    "reranking_model": reranking_model,
-                    "all_documents": all_documents,
-                    "exceptions": exceptions,
-                },
+            .distinct()
+        )
+        return (
+            db.session.query(Dataset)
+            .filter(
+                Dataset.id.in_(dataset_ids),
+                Dataset.id.in_(available_document_datasets),
+                Dataset.id.in_(available_segment_datasets),
             )
-            threads.append(full_text_index_thread)
-            full_text_index_thread.start()
+            .all()
+        )
 
-        for thread in threads:
-            thread.join()
+    @classmethod
+    def retrieve_datasets(
+        cls, query: str, settings: list[DatasetRetrievalSetting], ignore_errors: bool = False
+    ) -> list[list[Document]]:
+        """
+        Retrieve documents from several datasets at once, each with its own retrieval settings.
 
-        if exceptions:
-            exception_message = ";\n".join(exceptions)
-            raise ValueError(exception_message)
+        The query is embedded once per embedding model, and the searches of all datasets run in a bounded
+        executor shared by all retrievals.
+        :param query: query
+        :param settings: retrieval settings of the datasets
+        :param ignore_errors: return no documents for datasets which failed instead of raising
+        :return: documents of each dataset
+        """
+        if not query or not settings:
+            return [[] for _ in settings]
+        flask_app = current_app._get_current_object()  # type: ignore
+        executor = get_retrieval_executor()
 
-        if retrieval_method == RetrievalMethod.HYBRID_SEARCH.value:
-            data_post_processor = DataPostProcessor(
-                str(dataset.tenant_id), reranking_mode, reranking_model, weights, False
-            )
-            all_documents = data_post_processor.invoke(
-                query=query,
-                documents=all_documents,
-                score_threshold=score_threshold,
-                top_n=top_k,
-            )
+        # searches without query embedding start right away
+        search_futures: list[list[Future[list[Document]]]] = [[] for _ in settings]
+        for futures, setting in zip(search_futures, settings):
+            if setting.retrieval_method == "keyword_search":
+                futures.append(executor.submit(cls.keyword_search, flask_app, setting.dataset, query, setting.top_k))
+            if RetrievalMethod.is_support_fulltext_search(setting.retrieval_method):
+                futures.append(executor.submit(cls.full_text_index_search, flask_app, setting, query))
 
-        return all_documents
+        embedding_futures: dict[tuple[str, str, str], Future[list[float]]] = {}
+        for setting in settings:
+            if RetrievalMethod.is_support_semantic_search(setting.retrieval_method):
+                key = cls._get_embedding_model_key(setting.dataset)
+                if key not in embedding_futures:
+                    embedding_futures[key] = executor.submit(cls.embed_query, flask_app, setting.dataset, query)
+
+        errors: list[list[str]] = [[] for _ in settings]
+        for futures, dataset_errors, setting in zip(search_futures, errors, settings):
+            if RetrievalMethod.is_support_semantic_search(setting.retrieval_method):
+                embedding_future = embedding_futures[cls._get_embedding_model_key(setting.dataset)]
+                # searches never wait for other tasks of the executor, so they cannot block each other
+                try:
+                    query_vector = embedding_future.result()
+                except Exception as e:
+                    dataset_errors.append(str(e))
+                    continue
+                futures.append(executor.submit(cls.embedding_search, flask_app, setting, query, query_vector))
+
+        results: list[list[Document]] = []
+        for futures, dataset_errors in zip(search_futures, errors):
+            documents = []
+            for future in futures:
+                try:
+                    documents.extend(future.result())
+                except Exception as e:
+                    dataset_errors.append(str(e))
+            results.append(documents)
+
+        post_process_futures: dict[int, Future[list[Document]]] = {}
+        for i, (setting, dataset_errors) in enumerate(zip(settings, errors)):
+            if setting.retrieval_method == RetrievalMethod.HYBRID_SEARCH.value and not dataset_errors:
+                post_process_futures[i] = executor.submit(cls._post_process, flask_app, setting, query, results[i])
+        for i, future in post_process_futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                errors[i].append(str(e))
+
+        for i, dataset_errors in enumerate(errors):
+            if not dataset_errors:
+                continue
+            exception_message = ";\n".join(dataset_errors)
+            if not ignore_errors:
+                raise ValueError(exception_message)
+            logger.warning("Failed to retrieve from dataset %s: %s", settings[i].dataset.id, exception_message)
+            results[i] = []
+
+        return results
 
     @classmethod
     def external_retrieve(cls, dataset_id: str, query: str, external_retrieval_model: Optional[dict] = None):
@@ -133,120 +202,107 @@ class RetrievalService:
         return all_documents
 
     @classmethod
-    def keyword_search(
-        cls, flask_app: Flask, dataset_id: str, query: str, top_k: int, all_documents: list, exceptions: list
-    ):
+    def embed_query(cls, flask_app: Flask, dataset: Dataset, query: str) -> list[float]:
         with flask_app.app_context():
-            try:
-                dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
-                if not dataset:
-                    raise ValueError("dataset not found")
+            embedding_model = ModelManager().get_model_instance(
+                tenant_id=dataset.tenant_id,
+                provider=dataset.embedding_model_provider,
+                model_type=ModelType.TEXT_EMBEDDING,
+                model=dataset.embedding_model,
+            )
+            return CacheEmbedding(embedding_model).embed_query(cls.escape_query_for_search(query))
 
-                keyword = Keyword(dataset=dataset)
+    @classmethod
+    def keyword_search(cls, flask_app: Flask, dataset: Dataset, query: str, top_k: int) -> list[Document]:
+        with flask_app.app_context():
+            # the dataset was loaded by another thread, attach it to the session of this one
+            dataset = db.session.merge(dataset, load=False)
+            keyword = Keyword(dataset=dataset)
 
-                documents = keyword.search(cls.escape_query_for_search(query), top_k=top_k)
-                all_documents.extend(documents)
-            except Exception as e:
-                exceptions.append(str(e))
+            return keyword.search(cls.escape_query_for_search(query), top_k=top_k)
 
     @classmethod
     def embedding_search(
-        cls,
-        flask_app: Flask,
-        dataset_id: str,
-        query: str,
-        top_k: int,
-        score_threshold: Optional[float],
-        reranking_model: Optional[dict],
-        all_documents: list,
-        retrieval_method: str,
-        exceptions: list,
-    ):
+        cls, flask_app: Flask, setting: DatasetRetrievalSetting, query: str, query_vector: list[float]
+    ) -> list[Document]:
         with flask_app.app_context():
-            try:
-                dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
-                if not dataset:
-                    raise ValueError("dataset not found")
-
-                vector = Vector(dataset=dataset)
-
-                documents = vector.search_by_vector(
-                    cls.escape_query_for_search(query),
-                    search_type="similarity_score_threshold",
-                    top_k=top_k,
-                    score_threshold=score_threshold,
-                    filter={"group_id": [dataset.id]},
-                )
+            dataset = db.session.merge(setting.dataset, load=False)
+            vector = Vector(dataset=dataset)
 
-                if documents:
-                    if (
-                        reranking_model
-                        and reranking_model.get("reranking_model_name")
-                        and reranking_model.get("reranking_provider_name")
-                        and retrieval_method == RetrievalMethod.SEMANTIC_SEARCH.value
-                    ):
-                        data_post_processor = DataPostProcessor(
-                            str(dataset.tenant_id), RerankMode.RERANKING_MODEL.value, reranking_model, None, False
-                        )
-                        all_documents.extend(
-                            data_post_processor.invoke(
-                                query=query,
-                                documents=documents,
-                                score_threshold=score_threshold,
-                                top_n=len(documents),
-                            )
-                        )
-                    else:
-                        all_documents.extend(documents)
-            except Exception as e:
-                exceptions.append(str(e))
+            documents = vector.search_by_vector(
+                cls.escape_query_for_search(query),
+                query_vector=query_vector,
+                search_type="similarity_score_threshold",
+                top_k=setting.top_k,
+                score_threshold=setting.score_threshold,
+                filter={"group_id": [dataset.id]},
+            )
+
+            reranking_model = setting.reranking_model
+            if (
+                documents
+                and reranking_model
+                and reranking_model.get("reranking_model_name")
+                and reranking_model.get("reranking_provider_name")
+                and setting.retrieval_method == RetrievalMethod.SEMANTIC_SEARCH.value
+            ):
+                data_post_processor = DataPostProcessor(
+                    str(dataset.tenant_id), RerankMode.RERANKING_MODEL.value, reranking_model, None, False
+                )
+                return data_post_processor.invoke(
+                    query=query,
+                    documents=documents,
+                    score_threshold=setting.score_threshold,
+                    top_n=len(documents),
+                )
+            return documents
 
     @classmethod
-    def full_text_index_search(
-        cls,
-        flask_app: Flask,
-        dataset_id: str,
-        query: str,
-        top_k: int,
-        score_threshold: Optional[float],
-        reranking_model: Optional[dict],
-        all_documents: list,
-        retrieval_method: str,
-        exceptions: list,
-    ):
+    def full_text_index_search(cls, flask_app: Flask, setting: DatasetRetrievalSetting, query: str) -> list[Document]:
         with flask_app.app_context():
-            try:
-                dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
-                if not dataset:
-                    raise ValueError("dataset not found")
+            dataset = db.session.merge(setting.dataset, load=False)
+            vector_processor = Vector(
+                dataset=dataset,
+            )
 
-                vector_processor = Vector(
-                    dataset=dataset,
+            documents = vector_processor.search_by_full_text(cls.escape_query_for_search(query), top_k=setting.top_k)
+            reranking_model = setting.reranking_model
+            if (
+                documents
+                and reranking_model
+                and reranking_model.get("reranking_model_name")
+                and reranking_model.get("reranking_provider_name")
+                and setting.retrieval_method == RetrievalMethod.FULL_TEXT_SEARCH.value
+            ):
+                data_post_processor = DataPostProcessor(
+                    str(dataset.tenant_id), RerankMode.RERANKING_MODEL.value, reranking_model, None, False
                 )
+                return data_post_processor.invoke(
+                    query=query,
+                    documents=documents,
+                    score_threshold=setting.score_threshold,
+                    top_n=len(documents),
+                )
+            return documents
 
-                documents = vector_processor.search_by_full_text(cls.escape_query_for_search(query), top_k=top_k)
-                if documents:
-                    if (
-                        reranking_model
-                        and reranking_model.get("reranking_model_name")
-                        and reranking_model.get("reranking_provider_name")
-                        and retrieval_method == RetrievalMethod.FULL_TEXT_SEARCH.value
-                    ):
-                        data_post_processor = DataPostProcessor(
-                            str(dataset.tenant_id), RerankMode.RERANKING_MODEL.value, reranking_model, None, False
-                        )
-                        all_documents.extend(
-                            data_post_processor.invoke(
-                                query=query,
-                                documents=documents,
-                                score_threshold=score_threshold,
-                                top_n=len(documents),
-                            )
-                        )
-                    else:
-                        all_documents.extend(documents)
-            except Exception as e:
-                exceptions.append(str(e))
+    @classmethod
+    def _post_process(
+        cls, flask_app: Flask, setting: DatasetRetrievalSetting, query: str, documents: list[Document]
+    ) -> list[Document]:
+        with flask_app.app_context():
+            data_post_processor = DataPostProcessor(
+                str(setting.dataset.tenant_id), setting.reranking_mode, setting.reranking_model, setting.weights, False
+            )
+            return data_post_processor.invoke(
+                query=query,
+                documents=documents,
+                score_threshold=setting.score_threshold,
+                top_n=setting.top_k,
+            )
+
+    @staticmethod
+    def _get_embedding_model_key(dataset: Dataset) -> tuple[str, str, str]:
+        return dataset.tenant_id, dataset.embedding_model_provider, dataset.embedding_model
 
     @staticmethod
     def escape_query_for_search(query: str) -> str:
@@ -254,86 +310,95 @@ class RetrievalService:
 
     @staticmethod
     def format_retrieval_documents(documents: list[Document]) -> list[RetrievalSegments]:
+        """
+        Load the segments of the retrieved documents, with one query for the dataset documents and one
+        for each index type, whatever the number of retrieved documents.
+        Segments keep the order of the retrieved documents, child chunks are grouped under their parent
+        segment, which gets the max score of its child chunks.
+        """
+        document_ids = {document.metadata.get("document_id") for document in documents}
+        document_ids.discard(None)
+        if not document_ids:
+            return []
+        dataset_documents = {
+            dataset_document.id: dataset_document
+            for dataset_document in db.session.query(DatasetDocument).filter(DatasetDocument.id.in_(document_ids)).all()
+        }
+
+        # (dataset_id, index_node_id) of the retrieved segments and child chunks
+        segment_keys: list[tuple[str, str]] = []
+        child_chunk_keys: list[tuple[str, str]] = []
+        for document in documents:
+            dataset_document = dataset_documents.get(document.metadata.get("document_id"))
+            index_node_id = document.metadata.get("doc_id")
+            if not dataset_document or not index_node_id:
+                continue
+            key = (dataset_document.dataset_id, index_node_id)
+            if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                child_chunk_keys.append(key)
+            else:
+                segment_keys.append(key)
+
+        segments = {}
+        if segment_keys:
+            segments = {
+                (segment.dataset_id, segment.index_node_id): segment
+                for segment in db.session.query(DocumentSegment)
+                .filter(
+                    tuple_(DocumentSegment.dataset_id, DocumentSegment.index_node_id).in_(segment_keys),
+                    DocumentSegment.enabled == True,
+                    DocumentSegment.status == "completed",
+                )
+                .all()
+            }
+        child_chunks = {}
+        if child_chunk_keys:
+            child_chunks = {
+                (segment.dataset_id, child_chunk.index_node_id): (child_chunk, segment)
+                for child_chunk, segment in db.session.query(ChildChunk, DocumentSegment)
+                .join(DocumentSegment, ChildChunk.segment_id == DocumentSegment.id)
+                .filter(
+                    tuple_(DocumentSegment.dataset_id, ChildChunk.index_node_id).in_(child_chunk_keys),
+                    DocumentSegment.enabled == True,
+                    DocumentSegment.status == "completed",
+                )
+                .all()
+            }
+
         records = []
-        include_segment_ids = []
-        segment_child_map = {}
+        segment_child_map: dict[str, dict] = {}
         for document in documents:
-            document_id = document.metadata.get("document_id")
-            dataset_document = db.session.query(DatasetDocument).filter(DatasetDocument.id == document_id).first()
-            if dataset_document:
-                if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
-                    child_index_node_id = document.metadata.get("doc_id")
-                    result = (
-                        db.session.query(ChildChunk, DocumentSegment)
-                        .join(DocumentSegment, ChildChunk.segment_id == DocumentSegment.id)
-                        .filter(
-                            ChildChunk.index_node_id == child_index_node_id,
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                        )
-                        .first()
-                    )
-                    if result:
-                        child_chunk, segment = result
-                        if not segment:
-                            continue
-                        if segment.id not in include_segment_ids:
-                            include_segment_ids.append(segment.id)
-                            child_chunk_detail = {
-                                "id": child_chunk.id,
-                                "content": child_chunk.content,
-                                "position": child_chunk.position,
-                                "score": document.metadata.get("score", 0.0),
-                            }
-                            map_detail = {
-                                "max_score": document.metadata.get("score", 0.0),
-                                "child_chunks": [child_chunk_detail],
-                            }
-                            segment_child_map[segment.id] = map_detail
-                            record = {
-                                "segment": segment,
-                            }
-                            records.append(record)
-                        else:
-                            child_chunk_detail = {
-                                "id": child_chunk.id,
-                                "content": child_chunk.content,
-                                "position": child_chunk.position,
-                                "score": document.metadata.get("score", 0.0),
-                            }
-                            segment_child_map[segment.id]["child_chunks"].append(child_chunk_detail)
-                            segment_child_map[segment.id]["max_score"] = max(
-                                segment_child_map[segment.id]["max_score"], document.metadata.get("score", 0.0)
-                            )
-                    else:
-                        continue
+            dataset_document = dataset_documents.get(document.metadata.get("document_id"))
+            index_node_id = document.metadata.get("doc_id")
+            if not dataset_document or not index_node_id:
+                continue
+            key = (dataset_document.dataset_id, index_node_id)
+            score = document.metadata.get("score", None)
+            if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                if key not in child_chunks:
+                    continue
+                child_chunk, segment = child_chunks[key]
+                score = score or 0.0
+                child_chunk_detail = {
+                    "id": child_chunk.id,
+                    "content": child_chunk.content,
+                    "position": child_chunk.position,
+                    "score": score,
+                }
+                if segment.id not in segment_child_map:
+                    segment_child_map[segment.id] = {"max_score": score, "child_chunks": [child_chunk_detail]}
+                    records.append({"segment": segment})
                 else:
-                    index_node_id = document.metadata["doc_id"]
-
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.index_node_id == index_node_id,
-                        )
-                        .first()
-                    )
-
-                    if not segment:
-                        continue
-                    include_segment_ids.append(segment.id)
-                    record = {
-                        "segment": segment,
-                        "score": document.metadata.get("score", None),
-                    }
-
-                    records.append(record)
-            for record in records:
-                if record["segment"].id in segment_child_map:
-                    record["child_chunks"] = segment_child_map[record["segment"].id].get("child_chunks", None)
-                    record["score"] = segment_child_map[record["segment"].id]["max_score"]
+                    segment_child_map[segment.id]["child_chunks"].append(child_chunk_detail)
+                    segment_child_map[segment.id]["max_score"] = max(segment_child_map[segment.id]["max_score"], score)
+            else:
+                if key not in segments:
+                    continue
+                records.append({"segment": segments[key], "score": score})
+
+        for record in records:
+            if record["segment"].id in segment_child_map:
+                record["child_chunks"] = segment_child_map[record["segment"].id].get("child_chunks", None)
+                record["score"] = segment_child_map[record["segment"].id]["max_score"]
 
         return [RetrievalSegments(**record) for record in records]
@@ -172,8 +172,9 @@ class Vector:
     def delete_by_metadata_field(self, key: str, value: str) -> None:
         self._vector_processor.delete_by_metadata_field(key, value)
 
-    def search_by_vector(self, query: str, **kwargs: Any) -> list[Document]:
-        query_vector = self._embeddings.embed_query(query)
+    def search_by_vector(self, query: str, query_vector: Optional[list[float]] = None, **kwargs: Any) -> list[Document]:
+        if query_vector is None:
+            query_vector = self._embeddings.embed_query(query)
         return self._vector_processor.search_by_vector(query_vector, **kwargs)
 
     def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
@@ -1,11 +1,13 @@
+import uuid
 from collections.abc import Sequence
-from typing import Any, Optional
+from typing import Any, Optional, cast
 
 from sqlalchemy import func
 
+from configs import dify_config
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
-from core.rag.models.document import Document
+from core.rag.models.document import ChildDocument, Document
 from extensions.ext_database import db
 from models.dataset import ChildChunk, Dataset, DocumentSegment
 
@@ -61,6 +63,20 @@ class DatasetDocumentStore:
         return output
 
     def add_documents(self, docs: Sequence[Document], allow_update: bool = True, save_child: bool = False) -> None:
+        for doc in docs:
+            if not isinstance(doc, Document):
+                raise ValueError("doc must be a Document")
+
+            if doc.metadata is None:
+                raise ValueError("doc.metadata must be a dict")
+
+        if not docs:
+            return
+
+        # a doc_id given more than once is written once, with the content of the last doc at the position
+        # of the first one, as if the later docs updated the segment of the first one
+        docs = list({cast(dict, doc.metadata)["doc_id"]: doc for doc in docs}.values())
+
         max_position = (
             db.session.query(func.max(DocumentSegment.position))
             .filter(DocumentSegment.document_id == self._document_id)
@@ -69,7 +85,15 @@ class DatasetDocumentStore:
 
         if max_position is None:
             max_position = 0
-        embedding_model = None
+
+        # prefetch the existing segments of all docs in one query
+        existing_segments = self.get_document_segments([doc.metadata["doc_id"] for doc in docs])  # type: ignore
+        if not allow_update and existing_segments:
+            doc_id = next(iter(existing_segments))
+            raise ValueError(f"doc_id {doc_id} already exists. Set allow_update to True to overwrite.")
+
+        # calc embedding use tokens of all docs in one call
+        tokens_list = [0] * len(docs)
         if self._dataset.indexing_technique == "high_quality":
             model_manager = ModelManager()
             embedding_model = model_manager.get_model_instance(
@@ -78,100 +102,81 @@ class DatasetDocumentStore:
                 model_type=ModelType.TEXT_EMBEDDING,
                 model=self._dataset.embedding_model,
             )
-
-        for doc in docs:
-            if not isinstance(doc, Document):
-                raise ValueError("doc must be a Document")
-
-            if doc.metadata is None:
-                raise ValueError("doc.metadata must be a dict")
-
-            segment_document = self.get_document_segment(doc_id=doc.metadata["doc_id"])
-
-            # NOTE: doc could already exist in the store, but we overwrite it
-            if not allow_update and segment_document:
-                raise ValueError(
-                    f"doc_id {doc.metadata['doc_id']} already exists. Set allow_update to True to overwrite."
-                )
-
-            # calc embedding use tokens
-            if embedding_model:
-                tokens = embedding_model.get_text_embedding_num_tokens(texts=[doc.page_content])
-            else:
-                tokens = 0
-
-            if not segment_document:
-                max_position += 1
-
-                segment_document = DocumentSegment(
-                    tenant_id=self._dataset.tenant_id,
-                    dataset_id=self._dataset.id,
-                    document_id=self._document_id,
-                    index_node_id=doc.metadata["doc_id"],
-                    index_node_hash=doc.metadata["doc_hash"],
-                    position=max_position,
-                    content=doc.page_content,
-                    word_count=len(doc.page_content),
-                    tokens=tokens,
-                    enabled=False,
-                    created_by=self._user_id,
-                )
-                if doc.metadata.get("answer"):
-                    segment_document.answer = doc.metadata.pop("answer", "")
-
-                db.session.add(segment_document)
-                db.session.flush()
-                if save_child:
-                    if doc.children:
-                        for postion, child in enumerate(doc.children, start=1):
-                            child_segment = ChildChunk(
-                                tenant_id=self._dataset.tenant_id,
-                                dataset_id=self._dataset.id,
-                                document_id=self._document_id,
-                                segment_id=segment_document.id,
-                                position=postion,
-                                index_node_id=child.metadata.get("doc_id"),
-                                index_node_hash=child.metadata.get("doc_hash"),
-                                content=child.page_content,
-                                word_count=len(child.page_content),
-                                type="automatic",
-                                created_by=self._user_id,
-                            )
-                            db.session.add(child_segment)
-            else:
-                segment_document.content = doc.page_content
-                if doc.metadata.get("answer"):
-                    segment_document.answer = doc.metadata.pop("answer", "")
-                segment_document.index_node_hash = doc.metadata.get("doc_hash")
-                segment_document.word_count = len(doc.page_content)
-                segment_document.tokens = tokens
-                if save_child and doc.children:
-                    # delete the existing child chunks
-                    db.session.query(ChildChunk).filter(
-                        ChildChunk.tenant_id == self._dataset.tenant_id,
-                        ChildChunk.dataset_id == self._dataset.id,
-                        ChildChunk.document_id == self._document_id,
-                        ChildChunk.segment_id == segment_document.id,
-                    ).delete()
-                    # add new child chunks
-                    for position, child in enumerate(doc.children, start=1):
-                        child_segment = ChildChunk(
-                            tenant_id=self._dataset.tenant_id,
-                            dataset_id=self._dataset.id,
-                            document_id=self._document_id,
-                            segment_id=segment_document.id,
-                            position=position,
-                            index_node_id=child.metadata.get("doc_id"),
-                            index_node_hash=child.metadata.get("doc_hash"),
-                            content=child.page_content,
-                            word_count=len(child.page_content),
-                            type="automatic",
-                            created_by=self._user_id,
-                        )
-                        db.session.add(child_segment)
-
+            tokens_list = embedding_model.get_text_embedding_num_tokens_list(texts=[doc.page_content for doc in docs])
+
+        batch_size = dify_config.INDEXING_SEGMENT_BATCH_SIZE
+        for i in range(0, len(docs), batch_size):
+            segment_mappings: list[dict[str, Any]] = []
+            child_chunk_mappings: list[dict[str, Any]] = []
+            for doc, tokens in zip(docs[i : i + batch_size], tokens_list[i : i + batch_size]):
+                metadata = cast(dict, doc.metadata)
+                segment_document = existing_segments.get(metadata["doc_id"])
+
+                if not segment_document:
+                    max_position += 1
+
+                    segment_id = str(uuid.uuid4())
+                    segment_mappings.append(
+                        {
+                            "id": segment_id,
+                            "tenant_id": self._dataset.tenant_id,
+                            "dataset_id": self._dataset.id,
+                            "document_id": self._document_id,
+                            "index_node_id": metadata["doc_id"],
+                            "index_node_hash": metadata["doc_hash"],
+                            "position": max_position,
+                            "content": doc.page_content,
+                            "word_count": len(doc.page_content),
+                            "tokens": tokens,
+                            "enabled": False,
+                            "created_by": self._user_id,
+                            "answer": metadata.pop("answer", "") if metadata.get("answer") else None,
+                        }
+                    )
+                    if save_child and doc.children:
+                        child_chunk_mappings.extend(self._child_chunk_mappings(segment_id, doc.children))
+                else:
+                    segment_document.content = doc.page_content
+                    if metadata.get("answer"):
+                        segment_document.answer = metadata.pop("answer", "")
+                    segment_document.index_node_hash = metadata.get("doc_hash")
+                    segment_document.word_count = len(doc.page_content)
+                    segment_document.tokens = tokens
+                    if save_child and doc.children:
+                        # delete the existing child chunks
+                        db.session.query(ChildChunk).filter(
+                            ChildChunk.tenant_id == self._dataset.tenant_id,
+                            ChildChunk.dataset_id == self._dataset.id,
+                            ChildChunk.document_id == self._document_id,
+                            ChildChunk.segment_id == segment_document.id,
+                        ).delete()
+                        # add new child chunks
+                        child_chunk_mappings.extend(self._child_chunk_mappings(segment_document.id, doc.children))
+
+            if segment_mappings:
+                db.session.bulk_insert_mappings(DocumentSegment, segment_mappings)
+            if child_chunk_mappings:
+                db.session.bulk_insert_mappings(ChildChunk, child_chunk_mappings)
             db.session.commit()
 
+    def _child_chunk_mappings(self, segment_id: str, children: list[ChildDocument]) -> list[dict[str, Any]]:
+        return [
+            {
+                "tenant_id": self._dataset.tenant_id,
+                "dataset_id": self._dataset.id,
+                "document_id": self._document_id,
+                "segment_id": segment_id,
+                "position": position,
+                "index_node_id": child.metadata.get("doc_id") if child.metadata else None,
+                "index_node_hash": child.metadata.get("doc_hash") if child.metadata else None,
+                "content": child.page_content,
+                "word_count": len(child.page_content),
+                "type": "automatic",
+                "created_by": self._user_id,
+            }
+            for position, child in enumerate(children, start=1)
+        ]
+
     def document_exists(self, doc_id: str) -> bool:
         """Check if document exists."""
         result = self.get_document_segment(doc_id)
@@ -235,3 +240,12 @@ class DatasetDocumentStore:
         )
 
         return document_segment
+
+    def get_document_segments(self, doc_ids: list[str]) -> dict[str, DocumentSegment]:
+        document_segments = (
+            db.session.query(DocumentSegment)
+            .filter(DocumentSegment.dataset_id == self._dataset.id, DocumentSegment.index_node_id.in_(doc_ids))
+            .all()
+        )
+
+        return {document_segment.index_node_id: document_segment for document_segment in document_segments}
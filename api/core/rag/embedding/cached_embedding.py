@@ -1,12 +1,16 @@
 import base64
 import logging
+import threading
+import time
 from typing import Any, Optional, cast
 
 import numpy as np
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
+from core.helper.lru_cache import LRUCache
 from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
@@ -19,6 +23,58 @@ from models.dataset import Embedding
 logger = logging.getLogger(__name__)
 
 
+class EmbeddingCacheStats:
+    """Process-wide counters describing document embedding cache effectiveness."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.lookup_latency = 0.0
+        self.embedding_latency = 0.0
+
+    def record(
+        self,
+        local_hits: int = 0,
+        redis_hits: int = 0,
+        db_hits: int = 0,
+        misses: int = 0,
+        lookup_latency: float = 0.0,
+        embedding_latency: float = 0.0,
+    ) -> None:
+        with self._lock:
+            self.local_hits += local_hits
+            self.redis_hits += redis_hits
+            self.db_hits += db_hits
+            self.misses += misses
+            self.lookup_latency += lookup_latency
+            self.embedding_latency += embedding_latency
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.local_hits + self.redis_hits + self.db_hits + self.misses
+            hits = total - self.misses
+            return {
+                "local_hits": self.local_hits,
+                "redis_hits": self.redis_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "lookup_latency": self.lookup_latency,
+                "embedding_latency": self.embedding_latency,
+            }
+
+
+embedding_cache_stats = EmbeddingCacheStats()
+
+_local_document_embedding_cache = LRUCache(capacity=dify_config.EMBEDDING_CACHE_LOCAL_MAX_SIZE)
+
+
 class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
         self._model_instance = model_instance
@@ -28,23 +84,23 @@ class CacheEmbedding(Embeddings):
         """Embed search docs in batches of 10."""
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
+        hashes = [helper.generate_text_hash(text) for text in texts]
+
+        start_at = time.perf_counter()
+        cached_embeddings = self._get_cached_document_embeddings(set(hashes))
+        lookup_latency = time.perf_counter() - start_at
+
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        for i, hash in enumerate(hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
                 embedding_queue_indices.append(i)
+
+        start_at = time.perf_counter()
         if embedding_queue_indices:
             embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
-            embedding_queue_embeddings = []
+            embedding_queue_embeddings: list[Optional[list[float]]] = []
             try:
                 model_type_instance = cast(TextEmbeddingModel, self._model_instance.model_type_instance)
                 model_schema = model_type_instance.get_model_schema(
@@ -70,36 +126,151 @@ class CacheEmbedding(Embeddings):
                             if np.isnan(normalized_embedding).any():
                                 # for issue #11827  float values are not json compliant
                                 logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
+                                embedding_queue_embeddings.append(None)
                                 continue
                             embedding_queue_embeddings.append(normalized_embedding)
-                        except IntegrityError:
-                            db.session.rollback()
                         except Exception as e:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                            embedding_queue_embeddings.append(None)
+
+                new_embeddings: dict[str, list[float]] = {}
+                for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
+                    if n_embedding is None:
+                        continue
+                    text_embeddings[i] = n_embedding
+                    new_embeddings.setdefault(hashes[i], n_embedding)
+                self._save_document_embeddings(new_embeddings)
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
                 raise ex
 
+        embedding_cache_stats.record(
+            # counted per unique text, like the hits
+            misses=len({hashes[i] for i in embedding_queue_indices}),
+            lookup_latency=lookup_latency,
+            embedding_latency=time.perf_counter() - start_at,
+        )
+        logger.debug("Document embedding cache stats: %s", embedding_cache_stats.to_dict())
+
         return text_embeddings
 
+    def _document_embedding_cache_key(self, hash: str) -> str:
+        return f"document_embedding_{self._model_instance.provider}_{self._model_instance.model}_{hash}"
+
+    def _get_cached_document_embeddings(self, hashes: set[str]) -> dict[str, list[float]]:
+        """
+        Resolve cached document embeddings for the given text hashes,
+        looking up the local LRU, then Redis, then the database in batches.
+        """
+        result: dict[str, list[float]] = {}
+        pending = []
+        for hash in hashes:
+            cached = _local_document_embedding_cache.get(self._document_embedding_cache_key(hash))
+            if cached is not None:
+                result[hash] = cached.tolist()
+            else:
+                pending.append(hash)
+        local_hits = len(result)
+
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        redis_hits = 0
+        if pending and dify_config.EMBEDDING_CACHE_REDIS_TTL:
+            missing = []
+            for i in range(0, len(pending), batch_size):
+                batch_hashes = pending[i : i + batch_size]
+                try:
+                    values = redis_client.mget([self._document_embedding_cache_key(hash) for hash in batch_hashes])
+                except Exception:
+                    logger.exception("Failed to get document embeddings from redis")
+                    values = [None] * len(batch_hashes)
+                for hash, value in zip(batch_hashes, values):
+                    if value:
+                        vector = np.frombuffer(base64.b64decode(value), dtype="float")
+                        self._put_local_embedding(hash, vector)
+                        result[hash] = vector.tolist()
+                        redis_hits += 1
+                    else:
+                        missing.append(hash)
+            pending = missing
+
+        db_embeddings: dict[str, list[float]] = {}
+        for i in range(0, len(pending), batch_size):
+            batch_hashes = pending[i : i + batch_size]
+            embeddings = (
+                db.session.query(Embedding)
+                .filter(
+                    Embedding.model_name == self._model_instance.model,
+                    Embedding.provider_name == self._model_instance.provider,
+                    Embedding.hash.in_(batch_hashes),
+                )
+                .all()
+            )
+            for embedding in embeddings:
+                db_embeddings[embedding.hash] = embedding.get_embedding()
+        if db_embeddings:
+            self._cache_document_embeddings(db_embeddings)
+            result.update(db_embeddings)
+
+        embedding_cache_stats.record(local_hits=local_hits, redis_hits=redis_hits, db_hits=len(db_embeddings))
+        return result
+
+    def _save_document_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        """Bulk upsert newly computed document embeddings and populate the cache tiers."""
+        if not embeddings:
+            return
+        items = list(embeddings.items())
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        try:
+            for i in range(0, len(items), batch_size):
+                values = []
+                for hash, vector in items[i : i + batch_size]:
+                    embedding_cache = Embedding(
+                        model_name=self._model_instance.model,
+                        hash=hash,
+                        provider_name=self._model_instance.provider,
+                    )
+                    embedding_cache.set_embedding(vector)
+                    values.append(
+                        {
+                            "model_name": embedding_cache.model_name,
+                            "hash": embedding_cache.hash,
+                            "provider_name": embedding_cache.provider_name,
+                            "embedding": embedding_cache.embedding,
+                        }
+                    )
+                stmt = (
+                    insert(Embedding)
+                    .values(values)
+                    .on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+                )
+                db.session.execute(stmt)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        self._cache_document_embeddings(embeddings)
+
+    def _cache_document_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        vectors = {hash: np.array(embedding, dtype="float") for hash, embedding in embeddings.items()}
+        for hash, vector in vectors.items():
+            self._put_local_embedding(hash, vector)
+
+        ttl = dify_config.EMBEDDING_CACHE_REDIS_TTL
+        if not ttl:
+            return
+        try:
+            with redis_client.pipeline(transaction=False) as pipe:
+                for hash, vector in vectors.items():
+                    encoded_str = base64.b64encode(vector.tobytes()).decode("utf-8")
+                    pipe.setex(self._document_embedding_cache_key(hash), ttl, encoded_str)
+                pipe.execute()
+        except Exception:
+            logger.exception("Failed to add document embeddings to redis")
+
+    def _put_local_embedding(self, hash: str, vector: np.ndarray) -> None:
+        if dify_config.EMBEDDING_CACHE_LOCAL_MAX_SIZE:
+            _local_document_embedding_cache.put(self._document_embedding_cache_key(hash), vector)
+
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
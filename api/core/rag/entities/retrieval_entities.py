@@ -0,0 +1,21 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from models.dataset import Dataset
+
+
+class DatasetRetrievalSetting(BaseModel):
+    """
+    Model class for the retrieval settings of a dataset.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    dataset: Dataset
+    retrieval_method: str
+    top_k: int
+    score_threshold: Optional[float] = 0.0
+    reranking_model: Optional[dict] = None
+    reranking_mode: str = "reranking_model"
+    weights: Optional[dict] = None
@@ -1,11 +1,14 @@
+import hashlib
 import re
 import tempfile
+from collections.abc import Generator
 from pathlib import Path
 from typing import Optional, Union
 from urllib.parse import unquote
 
 from configs import dify_config
 from core.helper import ssrf_proxy
+from core.helper.extraction_cache import ExtractionCache
 from core.rag.extractor.csv_extractor import CSVExtractor
 from core.rag.extractor.entity.datasource_type import DatasourceType
 from core.rag.extractor.entity.extract_setting import ExtractSetting
@@ -35,6 +38,8 @@ USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124"
     " Safari/537.36"
 )
+# the extraction of these files has side effects, which must happen for every document
+_UNCACHEABLE_FILE_EXTENSIONS = frozenset({".docx"})
 
 
 class ExtractProcessor:
@@ -90,17 +95,46 @@ class ExtractProcessor:
     def extract(
         cls, extract_setting: ExtractSetting, is_automatic: bool = False, file_path: Optional[str] = None
     ) -> list[Document]:
+        return list(cls.lazy_extract(extract_setting, is_automatic, file_path))
+
+    @classmethod
+    def lazy_extract(
+        cls, extract_setting: ExtractSetting, is_automatic: bool = False, file_path: Optional[str] = None
+    ) -> Generator[Document, None, None]:
+        """
+        Extract the documents one by one, so that large files can be processed in parts.
+        The downloaded file is removed once the iterator is exhausted or closed.
+        """
         if extract_setting.datasource_type == DatasourceType.FILE.value:
             with tempfile.TemporaryDirectory() as temp_dir:
+                cache_key = None
                 if not file_path:
                     assert extract_setting.upload_file is not None, "upload_file is required"
                     upload_file: UploadFile = extract_setting.upload_file
                     suffix = Path(upload_file.key).suffix
+                    if upload_file.hash and cls._is_extraction_cacheable(suffix.lower()):
+                        # look up the cache before downloading the file
+                        cache_key = cls._get_extraction_cache_key(
+                            upload_file.hash, suffix.lower(), is_automatic, upload_file.tenant_id
+                        )
+                        cached_documents = ExtractionCache.get(cache_key)
+                        if cached_documents is not None:
+                            yield from cached_documents
+                            return
                     # FIXME mypy: Cannot determine type of 'tempfile._get_candidate_names' better not use it here
                     file_path = f"{temp_dir}/{next(tempfile._get_candidate_names())}{suffix}"  # type: ignore
                     storage.download(upload_file.key, file_path)
                 input_file = Path(file_path)
                 file_extension = input_file.suffix.lower()
+                if cache_key is None and cls._is_extraction_cacheable(file_extension):
+                    tenant_id = extract_setting.upload_file.tenant_id if extract_setting.upload_file else None
+                    cache_key = cls._get_extraction_cache_key(
+                        hashlib.sha3_256(input_file.read_bytes()).hexdigest(), file_extension, is_automatic, tenant_id
+                    )
+                    cached_documents = ExtractionCache.get(cache_key)
+                    if cached_documents is not None:
+                        yield from cached_documents
+                        return
                 etl_type = dify_config.ETL_TYPE
                 extractor: Optional[BaseExtractor] = None
                 if etl_type == "Unstructured":
@@ -158,7 +192,10 @@ class ExtractProcessor:
                     else:
                         # txt
                         extractor = TextExtractor(file_path, autodetect_encoding=True)
-                return extractor.extract()
+                if cache_key is None:
+                    yield from extractor.lazy_extract()
+                else:
+                    yield from cls._lazy_extract_and_cache(extractor, cache_key)
         elif extract_setting.datasource_type == DatasourceType.NOTION.value:
             assert extract_setting.notion_info is not None, "notion_info is required"
             extractor = NotionExtractor(
@@ -168,7 +205,7 @@ class ExtractProcessor:
                 document_model=extract_setting.notion_info.document,
                 tenant_id=extract_setting.notion_info.tenant_id,
             )
-            return extractor.extract()
+            yield from extractor.lazy_extract()
         elif extract_setting.datasource_type == DatasourceType.WEBSITE.value:
             assert extract_setting.website_info is not None, "website_info is required"
             if extract_setting.website_info.provider == "firecrawl":
@@ -179,7 +216,7 @@ class ExtractProcessor:
                     mode=extract_setting.website_info.mode,
                     only_main_content=extract_setting.website_info.only_main_content,
                 )
-                return extractor.extract()
+                yield from extractor.lazy_extract()
             elif extract_setting.website_info.provider == "jinareader":
                 extractor = JinaReaderWebExtractor(
                     url=extract_setting.website_info.url,
@@ -188,8 +225,47 @@ class ExtractProcessor:
                     mode=extract_setting.website_info.mode,
                     only_main_content=extract_setting.website_info.only_main_content,
                 )
-                return extractor.extract()
+                yield from extractor.lazy_extract()
             else:
                 raise ValueError(f"Unsupported website provider: {extract_setting.website_info.provider}")
         else:
             raise ValueError(f"Unsupported datasource type: {extract_setting.datasource_type}")
+
+    @staticmethod
+    def _is_extraction_cacheable(file_extension: str) -> bool:
+        # the text extracted from .docx files links images which are saved as upload files during the extraction,
+        # they are deleted with the document, so other documents must not reuse the text
+        return file_extension not in _UNCACHEABLE_FILE_EXTENSIONS and ExtractionCache.enabled()
+
+    @staticmethod
+    def _get_extraction_cache_key(
+        content_hash: str, file_extension: str, is_automatic: bool, tenant_id: Optional[str]
+    ) -> str:
+        settings = {
+            "file_extension": file_extension,
+            "etl_type": dify_config.ETL_TYPE,
+            "is_automatic": is_automatic,
+            # extracted images are saved as upload files of the tenant and linked in the text
+            "tenant_id": tenant_id,
+        }
+        if dify_config.ETL_TYPE == "Unstructured":
+            settings["unstructured_api_url"] = dify_config.UNSTRUCTURED_API_URL
+        return ExtractionCache.get_cache_key(content_hash, "extract_processor", settings)
+
+    @staticmethod
+    def _lazy_extract_and_cache(extractor: BaseExtractor, cache_key: str) -> Generator[Document, None, None]:
+        # the documents of large files are not kept in memory, they are not cached
+        max_size = dify_config.EXTRACTION_CACHE_MAX_ENTRY_SIZE_MB * 1024 * 1024
+        documents: Optional[list[Document]] = []
+        size = 0
+        for document in extractor.lazy_extract():
+            if documents is not None:
+                size += len(document.page_content)
+                if size > max_size:
+                    documents = None
+                else:
+                    # the yielded documents may be changed by the caller
+                    documents.append(document.model_copy(deep=True))
+            yield document
+        if documents is not None:
+            ExtractionCache.set(cache_key, documents)
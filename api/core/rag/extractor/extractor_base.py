@@ -1,6 +1,9 @@
 """Abstract interface for document loader implementations."""
 
 from abc import ABC, abstractmethod
+from collections.abc import Generator
+
+from core.rag.models.document import Document
 
 
 class BaseExtractor(ABC):
@@ -9,3 +12,7 @@ class BaseExtractor(ABC):
     @abstractmethod
     def extract(self):
         raise NotImplementedError
+
+    def lazy_extract(self) -> Generator[Document, None, None]:
+        """Extract the documents one by one, extractors that can read a file in parts should override this."""
+        yield from self.extract()
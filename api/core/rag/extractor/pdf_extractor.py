@@ -1,10 +1,11 @@
 """Abstract interface for document loader implementations."""
 
-from collections.abc import Iterator
+from collections.abc import Generator, Iterator
 from typing import Optional, cast
 
 from core.rag.extractor.blob.blob import Blob
 from core.rag.extractor.extractor_base import BaseExtractor
+from core.rag.extractor.pdf_page_pool import extract_pdf_page_texts
 from core.rag.models.document import Document
 from extensions.ext_storage import storage
 
@@ -43,6 +44,13 @@ class PdfExtractor(BaseExtractor):
 
         return documents
 
+    def lazy_extract(self) -> Generator[Document, None, None]:
+        if self._file_cache_key:
+            # the plaintext cache is written from all pages at once
+            yield from self.extract()
+        else:
+            yield from self.load()
+
     def load(
         self,
     ) -> Iterator[Document]:
@@ -52,17 +60,7 @@ class PdfExtractor(BaseExtractor):
 
     def parse(self, blob: Blob) -> Iterator[Document]:
         """Lazily parse the blob."""
-        import pypdfium2  # type: ignore
-
-        with blob.as_bytes_io() as file_path:
-            pdf_reader = pypdfium2.PdfDocument(file_path, autoclose=True)
-            try:
-                for page_number, page in enumerate(pdf_reader):
-                    text_page = page.get_textpage()
-                    content = text_page.get_text_range()
-                    text_page.close()
-                    page.close()
-                    metadata = {"source": blob.source, "page": page_number}
-                    yield Document(page_content=content, metadata=metadata)
-            finally:
-                pdf_reader.close()
+        pdf = str(blob.path) if blob.path else blob.as_bytes()
+        for page_number, content in enumerate(extract_pdf_page_texts(pdf)):
+            metadata = {"source": blob.source, "page": page_number}
+            yield Document(page_content=content, metadata=metadata)
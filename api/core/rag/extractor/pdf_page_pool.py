@@ -0,0 +1,160 @@
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import pypdfium2  # type: ignore
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def extract_pdf_page_texts(pdf: str | bytes) -> Iterator[str]:
+    """
+    Extract the text of each page of a PDF, in page order.
+
+    Large PDFs are split into page ranges which are extracted in parallel by a pool of
+    PDF_EXTRACT_PROCESS_POOL_SIZE processes, smaller ones and all PDFs when the pool is
+    disabled or not available are extracted in the calling process.
+    :param pdf: path or content of the PDF
+    :return: text of each page
+    """
+    pdf_document = pypdfium2.PdfDocument(pdf, autoclose=True)
+    try:
+        page_count = len(pdf_document)
+        pool = None
+        if page_count >= dify_config.PDF_EXTRACT_PARALLEL_MIN_PAGES:
+            pool = _get_pool()
+        if pool is None:
+            yield from _iter_page_texts(pdf_document, 0, page_count)
+            return
+    finally:
+        pdf_document.close()
+
+    if isinstance(pdf, str):
+        yield from _extract_in_pool(pool, pdf, page_count)
+        return
+
+    # the workers open the PDF by path, so the content is written once instead of sent to every worker
+    fd, file_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        yield from _extract_in_pool(pool, file_path, page_count)
+    finally:
+        os.remove(file_path)
+
+
+def _extract_in_pool(pool: ProcessPoolExecutor, file_path: str, page_count: int) -> Iterator[str]:
+    # a few page ranges per worker keeps all workers busy when some pages take longer than others
+    pages_per_task = math.ceil(page_count / (dify_config.PDF_EXTRACT_PROCESS_POOL_SIZE * 4))
+    page_ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    # only a window of page ranges is in flight, so a slow consumer does not hold the text of the whole PDF
+    max_in_flight = dify_config.PDF_EXTRACT_PROCESS_POOL_SIZE * 2
+    pending_ranges = iter(page_ranges)
+    futures: deque[Future[list[str]]] = deque()
+    pool_available = True
+    try:
+        for start, stop in itertools.islice(pending_ranges, max_in_flight):
+            futures.append(pool.submit(_extract_page_range, file_path, start, stop))
+    except (BrokenProcessPool, RuntimeError) as e:
+        _on_pool_error(pool, e)
+        pool_available = False
+
+    next_page = 0
+    try:
+        # results are collected in submission order, so pages are yielded in order as soon as they are ready
+        while futures:
+            try:
+                page_texts = futures.popleft().result()
+            except (BrokenProcessPool, CancelledError, RuntimeError) as e:
+                _on_pool_error(pool, e)
+                break
+            next_range = next(pending_ranges, None)
+            if next_range is not None and pool_available:
+                try:
+                    futures.append(pool.submit(_extract_page_range, file_path, *next_range))
+                except (BrokenProcessPool, RuntimeError) as e:
+                    _on_pool_error(pool, e)
+                    pool_available = False
+            yield from page_texts
+            next_page += len(page_texts)
+    finally:
+        for future in futures:
+            future.cancel()
+
+    if next_page < page_count:
+        # the pool broke or was shut down by another extraction, the remaining pages are extracted in process
+        pdf_document = pypdfium2.PdfDocument(file_path, autoclose=True)
+        try:
+            yield from _iter_page_texts(pdf_document, next_page, page_count)
+        finally:
+            pdf_document.close()
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> list[str]:
+    pdf_document = pypdfium2.PdfDocument(file_path, autoclose=True)
+    try:
+        return list(_iter_page_texts(pdf_document, start, stop))
+    finally:
+        pdf_document.close()
+
+
+def _iter_page_texts(pdf_document: pypdfium2.PdfDocument, start: int, stop: int) -> Iterator[str]:
+    for page_number in range(start, stop):
+        page = pdf_document[page_number]
+        text_page = page.get_textpage()
+        content = text_page.get_text_range()
+        text_page.close()
+        page.close()
+        yield content
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+
+    # daemonic processes like prefork celery workers are not allowed to start processes
+    if dify_config.PDF_EXTRACT_PROCESS_POOL_SIZE == 0 or multiprocessing.current_process().daemon:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # workers are spawned rather than forked, forking a process running threads is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=dify_config.PDF_EXTRACT_PROCESS_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, ValueError):
+                logger.warning("Failed to start PDF extraction process pool, extract in process", exc_info=True)
+                return None
+        return _pool
+
+
+def _on_pool_error(pool: ProcessPoolExecutor, error: BaseException) -> None:
+    logger.warning("PDF extraction process pool is not available, extract in process", exc_info=error)
+    if isinstance(error, BrokenProcessPool):
+        _reset_pool(pool)
+
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    # the futures of other extractions are not cancelled, they fail over to extraction in process themselves
+    pool.shutdown(wait=False)
@@ -1,11 +1,13 @@
 """Abstract interface for document loader implementations."""
 
 from abc import ABC, abstractmethod
+from collections.abc import Generator
 from typing import Optional
 
 from configs import dify_config
 from core.model_manager import ModelInstance
 from core.rag.extractor.entity.extract_setting import ExtractSetting
+from core.rag.extractor.extract_processor import ExtractProcessor
 from core.rag.models.document import Document
 from core.rag.splitter.fixed_text_splitter import (
     EnhanceRecursiveCharacterTextSplitter,
@@ -22,6 +24,14 @@ class BaseIndexProcessor(ABC):
     def extract(self, extract_setting: ExtractSetting, **kwargs) -> list[Document]:
         raise NotImplementedError
 
+    def lazy_extract(self, extract_setting: ExtractSetting, **kwargs) -> Generator[Document, None, None]:
+        yield from ExtractProcessor.lazy_extract(
+            extract_setting=extract_setting,
+            is_automatic=(
+                kwargs.get("process_rule_mode") == "automatic" or kwargs.get("process_rule_mode") == "hierarchical"
+            ),
+        )
+
     @abstractmethod
     def transform(self, documents: list[Document], **kwargs) -> list[Document]:
         raise NotImplementedError
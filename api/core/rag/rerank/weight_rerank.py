@@ -1,9 +1,9 @@
-import math
-from collections import Counter
 from typing import Optional
 
 import numpy as np
+from sqlalchemy import tuple_
 
+from core.helper.lru_cache import LRUCache
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
@@ -11,6 +11,11 @@ from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.models.document import Document
 from core.rag.rerank.entity.weight import VectorSetting, Weights
 from core.rag.rerank.rerank_base import BaseRerankRunner
+from extensions.ext_database import db
+from models.dataset import DocumentSegment
+
+# keywords extracted from the documents without stored keywords, by document hash
+_document_keywords_cache = LRUCache(capacity=10000)
 
 
 class WeightRerankRunner(BaseRerankRunner):
@@ -44,16 +49,18 @@ class WeightRerankRunner(BaseRerankRunner):
                 unique_documents.append(document)
 
         documents = unique_documents
+        if not documents:
+            return []
 
         query_scores = self._calculate_keyword_score(query, documents)
         query_vector_scores = self._calculate_cosine(self.tenant_id, query, documents, self.weights.vector_setting)
+        scores = (
+            self.weights.vector_setting.vector_weight * query_vector_scores
+            + self.weights.keyword_setting.keyword_weight * query_scores
+        )
 
         rerank_documents = []
-        for document, query_score, query_vector_score in zip(documents, query_scores, query_vector_scores):
-            score = (
-                self.weights.vector_setting.vector_weight * query_vector_score
-                + self.weights.keyword_setting.keyword_weight * query_score
-            )
+        for document, score in zip(documents, scores.tolist()):
             if score_threshold and score < score_threshold:
                 continue
             if document.metadata is not None:
@@ -63,9 +70,9 @@ class WeightRerankRunner(BaseRerankRunner):
         rerank_documents.sort(key=lambda x: x.metadata["score"] if x.metadata else 0, reverse=True)
         return rerank_documents[:top_n] if top_n else rerank_documents
 
-    def _calculate_keyword_score(self, query: str, documents: list[Document]) -> list[float]:
+    def _calculate_keyword_score(self, query: str, documents: list[Document]) -> np.ndarray:
         """
-        Calculate BM25 scores
+        Calculate TF-IDF cosine scores
         :param query: search query
         :param documents: documents for reranking
 
@@ -73,76 +80,84 @@ class WeightRerankRunner(BaseRerankRunner):
         """
         keyword_table_handler = JiebaKeywordTableHandler()
         query_keywords = keyword_table_handler.extract_keywords(query, None)
+        documents_keywords = self._get_documents_keywords(keyword_table_handler, documents)
+
+        # the keywords of the documents as a sparse term matrix of (row, column) pairs,
+        # the keywords are sets, so every term frequency is 1
+        vocabulary: dict[str, int] = {}
+        rows = []
+        columns = []
+        for row, document_keywords in enumerate(documents_keywords):
+            for keyword in document_keywords:
+                rows.append(row)
+                columns.append(vocabulary.setdefault(keyword, len(vocabulary)))
+        term_rows = np.array(rows, dtype=np.intp)
+        term_columns = np.array(columns, dtype=np.intp)
+
+        # IDF of the keywords of all documents
+        total_documents = len(documents)
+        document_frequencies = np.bincount(term_columns, minlength=len(vocabulary))
+        keyword_idf = np.log((1 + total_documents) / (1 + document_frequencies)) + 1
+
+        # TF-IDF of the query, keywords which are in no document have no weight
+        query_tfidf = np.zeros(len(vocabulary))
+        for keyword in query_keywords:
+            if keyword in vocabulary:
+                query_tfidf[vocabulary[keyword]] = keyword_idf[vocabulary[keyword]]
+
+        term_idf = keyword_idf[term_columns]
+        dot_products = np.bincount(term_rows, weights=term_idf * query_tfidf[term_columns], minlength=total_documents)
+        document_norms = np.sqrt(np.bincount(term_rows, weights=term_idf**2, minlength=total_documents))
+        denominators = np.linalg.norm(query_tfidf) * document_norms
+
+        return np.divide(dot_products, denominators, out=np.zeros(total_documents), where=denominators != 0)
+
+    def _get_documents_keywords(
+        self, keyword_table_handler: JiebaKeywordTableHandler, documents: list[Document]
+    ) -> list[set[str]]:
+        """
+        Get the keywords of the documents, the keywords stored on the segments are used if there are any,
+        the keywords of other documents are extracted once per document hash
+        :param keyword_table_handler: keyword table handler
+        :param documents: documents for reranking
+
+        :return:
+        """
+        segment_keys = {
+            (document.metadata["dataset_id"], document.metadata["doc_id"])
+            for document in documents
+            if document.provider == "dify" and document.metadata and document.metadata.get("dataset_id")
+        }
+        segments_keywords = {}
+        if segment_keys:
+            segments_keywords = {
+                (dataset_id, index_node_id): set(keywords)
+                for dataset_id, index_node_id, keywords in db.session.query(
+                    DocumentSegment.dataset_id, DocumentSegment.index_node_id, DocumentSegment.keywords
+                ).filter(tuple_(DocumentSegment.dataset_id, DocumentSegment.index_node_id).in_(segment_keys))
+                if keywords
+            }
+
         documents_keywords = []
         for document in documents:
-            # get the document keywords
-            document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
+            metadata = document.metadata or {}
+            document_keywords = segments_keywords.get((metadata.get("dataset_id"), metadata.get("doc_id")))
+            if document_keywords is None:
+                doc_hash = metadata.get("doc_hash")
+                document_keywords = _document_keywords_cache.get(doc_hash) if doc_hash else None
+                if document_keywords is None:
+                    document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
+                    if doc_hash:
+                        _document_keywords_cache.put(doc_hash, document_keywords)
             if document.metadata is not None:
                 document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
+            documents_keywords.append(document_keywords)
 
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
-
-        # for idx, similarity in enumerate(similarities):
-        #     print(f"Document {idx + 1} similarity: {similarity}")
-
-        return similarities
+        return documents_keywords
 
     def _calculate_cosine(
         self, tenant_id: str, query: str, documents: list[Document], vector_setting: VectorSetting
-    ) -> list[float]:
+    ) -> np.ndarray:
         """
         Calculate Cosine scores
         :param query: search query
@@ -150,7 +165,17 @@ class WeightRerankRunner(BaseRerankRunner):
 
         :return:
         """
-        query_vector_scores = []
+        # documents from the vector search already have the cosine score
+        query_vector_scores = np.array(
+            [
+                document.metadata["score"] if document.metadata and "score" in document.metadata else np.nan
+                for document in documents
+            ],
+            dtype=float,
+        )
+        missing = np.flatnonzero(np.isnan(query_vector_scores))
+        if not len(missing):
+            return query_vector_scores
 
         model_manager = ModelManager()
 
@@ -161,25 +186,11 @@ class WeightRerankRunner(BaseRerankRunner):
             model=vector_setting.embedding_model_name,
         )
         cache_embedding = CacheEmbedding(embedding_model)
-        query_vector = cache_embedding.embed_query(query)
-        for document in documents:
-            # calculate cosine similarity
-            if document.metadata and "score" in document.metadata:
-                query_vector_scores.append(document.metadata["score"])
-            else:
-                # transform to NumPy
-                vec1 = np.array(query_vector)
-                vec2 = np.array(document.vector)
-
-                # calculate dot product
-                dot_product = np.dot(vec1, vec2)
-
-                # calculate norm
-                norm_vec1 = np.linalg.norm(vec1)
-                norm_vec2 = np.linalg.norm(vec2)
-
-                # calculate cosine similarity
-                cosine_sim = dot_product / (norm_vec1 * norm_vec2)
-                query_vector_scores.append(cosine_sim)
+        query_vector = np.array(cache_embedding.embed_query(query))
+        document_vectors = np.array([documents[i].vector for i in missing], dtype=float)
 
+        # calculate the cosine similarities of all documents at once
+        query_vector_scores[missing] = (document_vectors @ query_vector) / (
+            np.linalg.norm(document_vectors, axis=1) * np.linalg.norm(query_vector)
+        )
         return query_vector_scores
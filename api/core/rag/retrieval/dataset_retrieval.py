@@ -1,5 +1,5 @@
+import logging
 import math
-import threading
 from collections import Counter
 from typing import Any, Optional, cast
 
@@ -9,6 +9,7 @@ from core.app.app_config.entities import DatasetEntity, DatasetRetrieveConfigEnt
 from core.app.entities.app_invoke_entities import InvokeFrom, ModelConfigWithCredentialsEntity
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
 from core.entities.agent_entities import PlanningStrategy
+from core.helper.retrieval_log_buffer import RetrievalLogBuffer
 from core.memory.token_buffer_memory import TokenBufferMemory
 from core.model_manager import ModelInstance, ModelManager
 from core.model_runtime.entities.message_entities import PromptMessageTool
@@ -19,8 +20,9 @@ from core.ops.ops_trace_manager import TraceQueueManager, TraceTask
 from core.ops.utils import measure_time
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
-from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.datasource.retrieval_service import RetrievalService, get_retrieval_executor
 from core.rag.entities.context_entities import DocumentContext
+from core.rag.entities.retrieval_entities import DatasetRetrievalSetting
 from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
@@ -30,7 +32,7 @@ from core.tools.tool.dataset_retriever.dataset_multi_retriever_tool import Datas
 from core.tools.tool.dataset_retriever.dataset_retriever_base_tool import DatasetRetrieverBaseTool
 from core.tools.tool.dataset_retriever.dataset_retriever_tool import DatasetRetrieverTool
 from extensions.ext_database import db
-from models.dataset import Dataset, DatasetQuery, DocumentSegment
+from models.dataset import Dataset
 from models.dataset import Document as DatasetDocument
 from services.external_knowledge_service import ExternalDatasetService
 
@@ -42,6 +44,8 @@ default_retrieval_model: dict[str, Any] = {
     "score_threshold_enabled": False,
 }
 
+logger = logging.getLogger(__name__)
+
 
 class DatasetRetrieval:
     def __init__(self, application_generate_entity=None):
@@ -352,8 +356,6 @@ class DatasetRetrieval:
     ):
         if not available_datasets:
             return []
-        threads = []
-        all_documents: list[Document] = []
         dataset_ids = [dataset.id for dataset in available_datasets]
         index_type_check = all(
             item.indexing_technique == available_datasets[0].indexing_technique for item in available_datasets
@@ -386,22 +388,8 @@ class DatasetRetrieval:
                     ].embedding_model_provider
                     weights["vector_setting"]["embedding_model_name"] = available_datasets[0].embedding_model
 
-        for dataset in available_datasets:
-            index_type = dataset.indexing_technique
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset.id,
-                    "query": query,
-                    "top_k": top_k,
-                    "all_documents": all_documents,
-                },
-            )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+        index_type = available_datasets[-1].indexing_technique
+        all_documents = self._retrieve_datasets(available_datasets, query, top_k)
 
         with measure_time() as timer:
             if reranking_enable:
@@ -429,20 +417,14 @@ class DatasetRetrieval:
     ) -> None:
         """Handle retrieval end."""
         dify_documents = [document for document in documents if document.provider == "dify"]
-        for document in dify_documents:
-            if document.metadata is not None:
-                query = db.session.query(DocumentSegment).filter(
-                    DocumentSegment.index_node_id == document.metadata["doc_id"]
-                )
-
-                # if 'dataset_id' in document.metadata:
-                if "dataset_id" in document.metadata:
-                    query = query.filter(DocumentSegment.dataset_id == document.metadata["dataset_id"])
-
-                # add hit count to document segment
-                query.update({DocumentSegment.hit_count: DocumentSegment.hit_count + 1}, synchronize_session=False)
-
-                db.session.commit()
+        # add hit count to document segments
+        RetrievalLogBuffer.add_segment_hits(
+            [
+                (document.metadata.get("dataset_id"), document.metadata["doc_id"])
+                for document in dify_documents
+                if document.metadata is not None
+            ]
+        )
 
         # get tracing instance
         trace_manager: Optional[TraceQueueManager] = (
@@ -461,65 +443,39 @@ class DatasetRetrieval:
         """
         if not query:
             return
-        dataset_queries = []
-        for dataset_id in dataset_ids:
-            dataset_query = DatasetQuery(
-                dataset_id=dataset_id,
-                content=query,
-                source="app",
-                source_app_id=app_id,
-                created_by_role=user_from,
-                created_by=user_id,
-            )
-            dataset_queries.append(dataset_query)
-        if dataset_queries:
-            db.session.add_all(dataset_queries)
-        db.session.commit()
-
-    def _retriever(self, flask_app: Flask, dataset_id: str, query: str, top_k: int, all_documents: list):
-        with flask_app.app_context():
-            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+        RetrievalLogBuffer.add_dataset_queries(
+            query=query, dataset_ids=dataset_ids, app_id=app_id, created_by_role=user_from, created_by=user_id
+        )
 
-            if not dataset:
-                return []
-
-            if dataset.provider == "external":
-                external_documents = ExternalDatasetService.fetch_external_knowledge_retrieval(
-                    tenant_id=dataset.tenant_id,
-                    dataset_id=dataset_id,
-                    query=query,
-                    external_retrieval_parameters=dataset.retrieval_model,
-                )
-                for external_document in external_documents:
-                    document = Document(
-                        page_content=external_document.get("content"),
-                        metadata=external_document.get("metadata"),
-                        provider="external",
-                    )
-                    if document.metadata is not None:
-                        document.metadata["score"] = external_document.get("score")
-                        document.metadata["title"] = external_document.get("title")
-                        document.metadata["dataset_id"] = dataset_id
-                        document.metadata["dataset_name"] = dataset.name
-                    all_documents.append(document)
-            else:
+    def _retrieve_datasets(self, datasets: list[Dataset], query: str, top_k: int) -> list[Document]:
+        """
+        Retrieve documents from the datasets, the searches of all datasets run concurrently
+        in the shared retrieval executor.
+        """
+        flask_app = current_app._get_current_object()  # type: ignore
+        external_futures = [
+            get_retrieval_executor().submit(self._external_retriever, flask_app, dataset, query)
+            for dataset in datasets
+            if dataset.provider == "external"
+        ]
+
+        settings = []
+        internal_dataset_ids = [dataset.id for dataset in datasets if dataset.provider != "external"]
+        if internal_dataset_ids:
+            for dataset in RetrievalService.get_available_datasets(internal_dataset_ids):
                 # get retrieval model , if the model is not setting , using default
                 retrieval_model = dataset.retrieval_model or default_retrieval_model
 
                 if dataset.indexing_technique == "economy":
                     # use keyword table query
-                    documents = RetrievalService.retrieve(
-                        retrieval_method="keyword_search", dataset_id=dataset.id, query=query, top_k=top_k
+                    settings.append(
+                        DatasetRetrievalSetting(dataset=dataset, retrieval_method="keyword_search", top_k=top_k)
                     )
-                    if documents:
-                        all_documents.extend(documents)
-                else:
-                    if top_k > 0:
-                        # retrieval source
-                        documents = RetrievalService.retrieve(
+                elif top_k > 0:
+                    settings.append(
+                        DatasetRetrievalSetting(
+                            dataset=dataset,
                             retrieval_method=retrieval_model["search_method"],
-                            dataset_id=dataset.id,
-                            query=query,
                             top_k=retrieval_model.get("top_k") or 2,
                             score_threshold=retrieval_model.get("score_threshold", 0.0)
                             if retrieval_model["score_threshold_enabled"]
@@ -530,8 +486,40 @@ class DatasetRetrieval:
                             reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
                             weights=retrieval_model.get("weights", None),
                         )
+                    )
+
+        all_documents: list[Document] = []
+        for documents in RetrievalService.retrieve_datasets(query, settings, ignore_errors=True):
+            all_documents.extend(documents)
+        for future in external_futures:
+            try:
+                all_documents.extend(future.result())
+            except Exception:
+                logger.exception("Failed to retrieve from external knowledge")
+        return all_documents
 
-                        all_documents.extend(documents)
+    def _external_retriever(self, flask_app: Flask, dataset: Dataset, query: str) -> list[Document]:
+        with flask_app.app_context():
+            external_documents = ExternalDatasetService.fetch_external_knowledge_retrieval(
+                tenant_id=dataset.tenant_id,
+                dataset_id=dataset.id,
+                query=query,
+                external_retrieval_parameters=dataset.retrieval_model,
+            )
+            documents = []
+            for external_document in external_documents:
+                document = Document(
+                    page_content=external_document.get("content"),
+                    metadata=external_document.get("metadata"),
+                    provider="external",
+                )
+                if document.metadata is not None:
+                    document.metadata["score"] = external_document.get("score")
+                    document.metadata["title"] = external_document.get("title")
+                    document.metadata["dataset_id"] = dataset.id
+                    document.metadata["dataset_name"] = dataset.name
+                documents.append(document)
+            return documents
 
     def to_dataset_retriever_tool(
         self,
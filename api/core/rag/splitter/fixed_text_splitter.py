@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import logging
+from collections.abc import Callable
 from typing import Any, Optional
 
 from core.model_manager import ModelInstance
@@ -16,12 +18,69 @@ from core.rag.splitter.text_splitter import (
     Union,
 )
 
+logger = logging.getLogger(__name__)
+
+# texts tokenized differently by the common tokenizers, used to check if a model counts tokens like gpt2
+_GPT2_PROBE_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "    def __init__(self):\n        return None  # 1234567890",
+    "Dify 是一个开源的 LLM 应用开发平台。",
+    "naïve café, São Paulo → Zürich!",
+]
+
+
+class TokenCounter:
+    """
+    Counts the tokens of texts in batches and remembers the counts of the texts it already counted.
+    """
+
+    def __init__(self, count_texts: Callable[[list[str]], list[int]], max_size: int = 10000):
+        self._count_texts = count_texts
+        self._max_size = max_size
+        self._counts: dict[str, int] = {}
+
+    def __call__(self, text: str) -> int:
+        return self.count_list([text])[0]
+
+    def count_list(self, texts: list[str]) -> list[int]:
+        """
+        Count the tokens of each text, with one call to the tokenizer for the texts not counted yet.
+        :param texts: texts
+        :return: number of tokens of each text
+        """
+        missing_texts = list(dict.fromkeys(text for text in texts if text and text not in self._counts))
+        if missing_texts:
+            if len(self._counts) + len(missing_texts) > self._max_size:
+                self._counts.clear()
+                missing_texts = list(dict.fromkeys(text for text in texts if text))
+            self._counts.update(zip(missing_texts, self._count_texts(missing_texts)))
+
+        return [self._counts[text] if text else 0 for text in texts]
+
+
+def _counts_like_gpt2(embedding_model_instance: ModelInstance) -> bool:
+    try:
+        return embedding_model_instance.get_text_embedding_num_tokens_list(
+            texts=_GPT2_PROBE_TEXTS
+        ) == GPT2Tokenizer.get_num_tokens_list(_GPT2_PROBE_TEXTS)
+    except Exception:
+        logger.warning(
+            "Failed to compare the token counts of %s with gpt2", embedding_model_instance.model, exc_info=True
+        )
+        return False
+
 
 class EnhanceRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
     """
     This class is used to implement from_gpt2_encoder, to prevent using of tiktoken
     """
 
+    def _get_lengths(self, texts: list[str]) -> list[int]:
+        if isinstance(self._length_function, TokenCounter):
+            return self._length_function.count_list(texts)
+
+        return super()._get_lengths(texts)
+
     @classmethod
     def from_encoder(
         cls: type[TS],
@@ -30,14 +89,13 @@ class EnhanceRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
         disallowed_special: Union[Literal["all"], Collection[str]] = "all",  # noqa: UP037
         **kwargs: Any,
     ):
-        def _token_encoder(text: str) -> int:
-            if not text:
-                return 0
-
-            if embedding_model_instance:
-                return embedding_model_instance.get_text_embedding_num_tokens(texts=[text])
-            else:
-                return GPT2Tokenizer.get_num_tokens(text)
+        # models counting tokens like gpt2 are counted with the local tokenizer, without invoking the model
+        if embedding_model_instance and not _counts_like_gpt2(embedding_model_instance):
+            _token_encoder = TokenCounter(
+                lambda texts: embedding_model_instance.get_text_embedding_num_tokens_list(texts=texts)
+            )
+        else:
+            _token_encoder = TokenCounter(GPT2Tokenizer.get_num_tokens_list)
 
         if issubclass(cls, TokenTextSplitter):
             extra_kwargs = {
@@ -65,8 +123,8 @@ class FixedRecursiveCharacterTextSplitter(EnhanceRecursiveCharacterTextSplitter)
             chunks = [text]
 
         final_chunks = []
-        for chunk in chunks:
-            if self._length_function(chunk) > self._chunk_size:
+        for chunk, chunk_length in zip(chunks, self._get_lengths(chunks)):
+            if chunk_length > self._chunk_size:
                 final_chunks.extend(self.recursive_split_text(chunk))
             else:
                 final_chunks.append(chunk)
@@ -93,8 +151,7 @@ class FixedRecursiveCharacterTextSplitter(EnhanceRecursiveCharacterTextSplitter)
         # Now go merging things, recursively splitting longer texts.
         _good_splits = []
         _good_splits_lengths = []  # cache the lengths of the splits
-        for s in splits:
-            s_len = self._length_function(s)
+        for s, s_len in zip(splits, self._get_lengths(splits)):
             if s_len < self._chunk_size:
                 _good_splits.append(s)
                 _good_splits_lengths.append(s_len)
@@ -95,6 +95,10 @@ class TextSplitter(BaseDocumentTransformer, ABC):
             metadatas.append(doc.metadata or {})
         return self.create_documents(texts, metadatas=metadatas)
 
+    def _get_lengths(self, texts: list[str]) -> list[int]:
+        """Measure the lengths of the given texts."""
+        return [self._length_function(text) for text in texts]
+
     def _join_docs(self, docs: list[str], separator: str) -> Optional[str]:
         text = separator.join(docs)
         text = text.strip()
@@ -110,6 +114,7 @@ class TextSplitter(BaseDocumentTransformer, ABC):
 
         docs = []
         current_doc: list[str] = []
+        current_doc_lengths: list[int] = []
         total = 0
         index = 0
         for d in splits:
@@ -129,9 +134,11 @@ class TextSplitter(BaseDocumentTransformer, ABC):
                     while total > self._chunk_overlap or (
                         total + _len + (separator_len if len(current_doc) > 0 else 0) > self._chunk_size and total > 0
                     ):
-                        total -= self._length_function(current_doc[0]) + (separator_len if len(current_doc) > 1 else 0)
+                        total -= current_doc_lengths[0] + (separator_len if len(current_doc) > 1 else 0)
                         current_doc = current_doc[1:]
+                        current_doc_lengths = current_doc_lengths[1:]
             current_doc.append(d)
+            current_doc_lengths.append(_len)
             total += _len + (separator_len if len(current_doc) > 1 else 0)
             index += 1
         doc = self._join_docs(current_doc, separator)
@@ -223,9 +230,7 @@ class CharacterTextSplitter(TextSplitter):
         # First we naively split the large input into a bunch of smaller ones.
         splits = _split_text_with_regex(text, self._separator, self._keep_separator)
         _separator = "" if self._keep_separator else self._separator
-        _good_splits_lengths = []  # cache the lengths of the splits
-        for split in splits:
-            _good_splits_lengths.append(self._length_function(split))
+        _good_splits_lengths = self._get_lengths(splits)  # cache the lengths of the splits
         return self._merge_splits(splits, _separator, _good_splits_lengths)
 
 
@@ -479,8 +484,7 @@ class RecursiveCharacterTextSplitter(TextSplitter):
         _good_splits_lengths = []  # cache the lengths of the splits
         _separator = "" if self._keep_separator else separator
 
-        for s in splits:
-            s_len = self._length_function(s)
+        for s, s_len in zip(splits, self._get_lengths(splits)):
             if s_len < self._chunk_size:
                 _good_splits.append(s)
                 _good_splits_lengths.append(s_len)
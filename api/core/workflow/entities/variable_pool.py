@@ -1,13 +1,14 @@
 import re
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
-from typing import Any, Union
+from functools import lru_cache
+from typing import Any, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from core.file import File, FileAttribute, file_manager
 from core.variables import Segment, SegmentGroup, Variable
-from core.variables.segments import FileSegment
+from core.variables.segments import FileSegment, StringSegment
 from factories import variable_factory
 
 from ..constants import CONVERSATION_VARIABLE_NODE_ID, ENVIRONMENT_VARIABLE_NODE_ID, SYSTEM_VARIABLE_NODE_ID
@@ -18,6 +19,21 @@ VariableValue = Union[str, int, float, dict, list, File]
 
 VARIABLE_PATTERN = re.compile(r"\{\{#([a-zA-Z0-9_]{1,50}(?:\.[a-zA-Z_][a-zA-Z0-9_]{0,29}){1,10})#\}\}")
 
+FILE_ATTRIBUTES = frozenset(item.value for item in FileAttribute)
+
+
+@lru_cache(maxsize=4096)
+def _compile_template(template: str, /) -> tuple[tuple[StringSegment, tuple[str, ...] | None], ...]:
+    """
+    Split a template into its parts, once per template text.
+    Each part is the part as literal segment and, if the part may be a variable, its selector.
+    """
+    return tuple(
+        (StringSegment(value=part), tuple(part.split(".")) if "." in part else None)
+        for part in VARIABLE_PATTERN.split(template)
+        if part
+    )
+
 
 class VariablePool(BaseModel):
     # Variable dictionary is a dictionary for looking up variables by their selector.
@@ -43,6 +59,10 @@ class VariablePool(BaseModel):
         description="Conversation variables.",
         default_factory=list,
     )
+    # A child pool shares the variables of its parent and only keeps its own changes, see create_child.
+    _parent: Optional["VariablePool"] = PrivateAttr(default=None)
+    _removed_node_ids: set[str] = PrivateAttr(default_factory=set)
+    _removed_keys: set[tuple[str, int]] = PrivateAttr(default_factory=set)
 
     def __init__(
         self,
@@ -75,6 +95,27 @@ class VariablePool(BaseModel):
         for var in self.conversation_variables:
             self.add((CONVERSATION_VARIABLE_NODE_ID, var.name), var)
 
+    def create_child(self) -> "VariablePool":
+        """
+        Creates a child variable pool, e.g. for a parallel iteration.
+
+        The child sees the variables of this pool without copying them, segments are immutable and
+        shared by reference. Variables added to or removed from the child only change the child,
+        results of the child have to be passed back explicitly.
+
+        Returns:
+            VariablePool: The child variable pool.
+        """
+        child = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=self.environment_variables,
+            conversation_variables=self.conversation_variables,
+        )
+        child._parent = self
+        return child
+
     def add(self, selector: Sequence[str], value: Any, /) -> None:
         """
         Adds a variable to the variable pool.
@@ -95,8 +136,6 @@ class VariablePool(BaseModel):
         if len(selector) < 2:
             raise ValueError("Invalid selector")
 
-        if isinstance(value, Variable):
-            variable = value
         if isinstance(value, Segment):
             variable = variable_factory.segment_to_variable(segment=value, selector=selector)
         else:
@@ -123,12 +162,12 @@ class VariablePool(BaseModel):
             return None
 
         hash_key = hash(tuple(selector[1:]))
-        value = self.variable_dictionary[selector[0]].get(hash_key)
+        value = self._get_variable(selector[0], hash_key)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
             # Python support `attr in FileAttribute` after 3.12
-            if attr not in {item.value for item in FileAttribute}:
+            if attr not in FILE_ATTRIBUTES:
                 return None
             value = self.get(selector)
             if not isinstance(value, FileSegment):
@@ -153,18 +192,32 @@ class VariablePool(BaseModel):
             return
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            if self._parent is not None:
+                self._removed_node_ids.add(selector[0])
             return
         hash_key = hash(tuple(selector[1:]))
         self.variable_dictionary[selector[0]].pop(hash_key, None)
+        if self._parent is not None:
+            self._removed_keys.add((selector[0], hash_key))
+
+    def _get_variable(self, node_id: str, hash_key: int) -> Segment | None:
+        pool: Optional[VariablePool] = self
+        while pool is not None:
+            variables = pool.variable_dictionary.get(node_id)
+            if variables and hash_key in variables:
+                return variables[hash_key]
+            if node_id in pool._removed_node_ids or (node_id, hash_key) in pool._removed_keys:
+                return None
+            pool = pool._parent
+        return None
 
     def convert_template(self, template: str, /):
-        parts = VARIABLE_PATTERN.split(template)
         segments = []
-        for part in filter(lambda x: x, parts):
-            if "." in part and (variable := self.get(part.split("."))):
+        for literal, selector in _compile_template(template):
+            if selector and (variable := self.get(selector)):
                 segments.append(variable)
             else:
-                segments.append(variable_factory.build_segment(part))
+                segments.append(literal)
         return SegmentGroup(value=segments)
 
     def get_file(self, selector: Sequence[str], /) -> FileSegment | None:
@@ -0,0 +1,205 @@
+import logging
+import threading
+from collections import OrderedDict, defaultdict, deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowTaskGroup(Protocol):
+    """
+    Parallel tasks of one workflow run (or of one parallel iteration) sharing a concurrency limit.
+    The counters are maintained by the workflow thread pool, under its lock.
+    """
+
+    tenant_id: str
+    app_id: str
+    max_workers: int
+    max_submit_count: int
+    submit_count: int
+    running_count: int
+
+
+@dataclass
+class _WorkflowTask:
+    group: WorkflowTaskGroup
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    future: Future = field(default_factory=Future)
+
+
+class WorkflowThreadPool:
+    """
+    Process-wide executor of the parallel branches and parallel iterations of all workflow runs.
+
+    At most max_workers tasks run at a time, and a single tenant or app can only take its quota of them.
+    Tasks that can not start right away are queued per tenant and dispatched round-robin across tenants.
+    A task submitted from a worker of the pool (a nested parallel branch or iteration) that can not start
+    right away runs in the submitting worker instead of waiting, so workers waiting for their nested
+    tasks can never use up the pool. Submitters outside of the pool are blocked while their group
+    already has max_submit_count tasks queued or running.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_tenant: int, max_workers_per_app: int) -> None:
+        self.max_workers = max_workers
+        self.max_workers_per_tenant = max_workers_per_tenant
+        self.max_workers_per_app = max_workers_per_app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow_thread_pool")
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._running_count = 0
+        self._tenant_running_counts: dict[str, int] = defaultdict(int)
+        self._app_running_counts: dict[str, int] = defaultdict(int)
+        self._tenant_queues: OrderedDict[str, deque[_WorkflowTask]] = OrderedDict()
+        self._queued_count = 0
+        self._max_queued_count = 0
+        self._inline_run_count = 0
+
+    def submit(self, group: WorkflowTaskGroup, fn: Callable[..., Any], /, *args, **kwargs) -> Future:
+        task = _WorkflowTask(group=group, fn=fn, args=args, kwargs=kwargs)
+        with self._condition:
+            while True:
+                if self._can_start(group):
+                    group.submit_count += 1
+                    self._start(task)
+                    return task.future
+
+                if self._is_worker_thread():
+                    self._inline_run_count += 1
+                    break
+
+                if group.submit_count < group.max_submit_count:
+                    group.submit_count += 1
+                    self._tenant_queues.setdefault(group.tenant_id, deque()).append(task)
+                    self._queued_count += 1
+                    self._max_queued_count = max(self._max_queued_count, self._queued_count)
+                    return task.future
+
+                # back-pressure, wait for the tasks of the group to finish
+                self._condition.wait()
+
+        self._execute(task)
+        return task.future
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Get a snapshot of the running and queued tasks of the pool.
+        """
+        with self._condition:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running_count,
+                "queued": self._queued_count,
+                "max_queued": self._max_queued_count,
+                "inline_runs": self._inline_run_count,
+                "tenants": {
+                    tenant_id: {
+                        "running": self._tenant_running_counts.get(tenant_id, 0),
+                        "queued": len(self._tenant_queues.get(tenant_id, ())),
+                    }
+                    for tenant_id in set(self._tenant_running_counts) | set(self._tenant_queues)
+                },
+            }
+
+    def _is_worker_thread(self) -> bool:
+        return getattr(self._local, "is_worker", False)
+
+    def _can_start(self, group: WorkflowTaskGroup) -> bool:
+        return (
+            self._running_count < self.max_workers
+            and group.running_count < group.max_workers
+            and self._tenant_running_counts[group.tenant_id] < self.max_workers_per_tenant
+            and self._app_running_counts[group.app_id] < self.max_workers_per_app
+        )
+
+    def _start(self, task: _WorkflowTask) -> None:
+        group = task.group
+        group.running_count += 1
+        self._running_count += 1
+        self._tenant_running_counts[group.tenant_id] += 1
+        self._app_running_counts[group.app_id] += 1
+        self._executor.submit(self._run, task)
+
+    def _run(self, task: _WorkflowTask) -> None:
+        self._local.is_worker = True
+        try:
+            self._execute(task)
+        finally:
+            with self._condition:
+                self._release(task.group)
+                self._dispatch()
+                self._condition.notify_all()
+
+    @staticmethod
+    def _execute(task: _WorkflowTask) -> None:
+        if not task.future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except BaseException as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+
+    def _release(self, group: WorkflowTaskGroup) -> None:
+        group.running_count -= 1
+        group.submit_count -= 1
+        self._running_count -= 1
+        self._tenant_running_counts[group.tenant_id] -= 1
+        if not self._tenant_running_counts[group.tenant_id]:
+            del self._tenant_running_counts[group.tenant_id]
+        self._app_running_counts[group.app_id] -= 1
+        if not self._app_running_counts[group.app_id]:
+            del self._app_running_counts[group.app_id]
+
+    def _dispatch(self) -> None:
+        """
+        Start queued tasks while there are free workers, taking one task of each tenant in turn.
+        """
+        while self._running_count < self.max_workers and self._tenant_queues:
+            started = False
+            for tenant_id in list(self._tenant_queues):
+                tenant_queue = self._tenant_queues[tenant_id]
+                task = self._pop_startable_task(tenant_queue)
+                if not tenant_queue:
+                    del self._tenant_queues[tenant_id]
+                elif task:
+                    # give the other tenants the next turn
+                    self._tenant_queues.move_to_end(tenant_id)
+
+                if task:
+                    self._start(task)
+                    started = True
+                    break
+
+            if not started:
+                return
+
+    def _pop_startable_task(self, tenant_queue: deque[_WorkflowTask]) -> _WorkflowTask | None:
+        for task in list(tenant_queue):
+            if task.future.cancelled():
+                tenant_queue.remove(task)
+                task.group.submit_count -= 1
+                self._queued_count -= 1
+                continue
+
+            if self._can_start(task.group):
+                tenant_queue.remove(task)
+                self._queued_count -= 1
+                return task
+
+        return None
+
+
+workflow_thread_pool = WorkflowThreadPool(
+    max_workers=dify_config.WORKFLOW_THREAD_POOL_MAX_WORKERS,
+    max_workers_per_tenant=dify_config.WORKFLOW_THREAD_POOL_MAX_WORKERS_PER_TENANT,
+    max_workers_per_app=dify_config.WORKFLOW_THREAD_POOL_MAX_WORKERS_PER_APP,
+)
@@ -1,4 +1,5 @@
 import csv
+import hashlib
 import io
 import json
 import logging
@@ -10,7 +11,6 @@ from typing import Any, cast
 
 import docx
 import pandas as pd
-import pypdfium2  # type: ignore
 import yaml  # type: ignore
 from docx.table import Table
 from docx.text.paragraph import Paragraph
@@ -18,6 +18,9 @@ from docx.text.paragraph import Paragraph
 from configs import dify_config
 from core.file import File, FileTransferMethod, file_manager
 from core.helper import ssrf_proxy
+from core.helper.extraction_cache import ExtractionCache
+from core.rag.extractor.pdf_page_pool import extract_pdf_page_texts
+from core.rag.models.document import Document
 from core.variables import ArrayFileSegment
 from core.variables.segments import FileSegment
 from core.workflow.entities.node_entities import NodeRunResult
@@ -188,15 +191,7 @@ def _extract_text_from_yaml(file_content: bytes) -> str:
 
 def _extract_text_from_pdf(file_content: bytes) -> str:
     try:
-        pdf_file = io.BytesIO(file_content)
-        pdf_document = pypdfium2.PdfDocument(pdf_file, autoclose=True)
-        text = ""
-        for page in pdf_document:
-            text_page = page.get_textpage()
-            text += text_page.get_text_range()
-            text_page.close()
-            page.close()
-        return text
+        return "".join(extract_pdf_page_texts(file_content))
     except Exception as e:
         raise TextExtractionError(f"Failed to extract text from PDF: {str(e)}") from e
 
@@ -281,12 +276,28 @@ def _download_file_content(file: File) -> bytes:
 
 def _extract_text_from_file(file: File):
     file_content = _download_file_content(file)
+    if not file.extension and not file.mime_type:
+        raise UnsupportedFileTypeError("Unable to determine file type: MIME type or file extension is missing")
+
+    cache_key = None
+    if ExtractionCache.enabled():
+        cache_key = ExtractionCache.get_cache_key(
+            hashlib.sha3_256(file_content).hexdigest(),
+            "document_extractor_node",
+            {"file_extension": file.extension, "mime_type": None if file.extension else file.mime_type},
+        )
+        cached_documents = ExtractionCache.get(cache_key)
+        if cached_documents is not None:
+            return cached_documents[0].page_content
+
     if file.extension:
         extracted_text = _extract_text_by_file_extension(file_content=file_content, file_extension=file.extension)
-    elif file.mime_type:
-        extracted_text = _extract_text_by_mime_type(file_content=file_content, mime_type=file.mime_type)
     else:
-        raise UnsupportedFileTypeError("Unable to determine file type: MIME type or file extension is missing")
+        # files without extension and mime type were rejected above
+        extracted_text = _extract_text_by_mime_type(file_content=file_content, mime_type=cast(str, file.mime_type))
+
+    if cache_key is not None:
+        ExtractionCache.set(cache_key, [Document(page_content=extracted_text)])
     return extracted_text
 
 
@@ -167,7 +167,10 @@ class IterationNode(BaseNode[IterationNodeData]):
                 futures: list[Future] = []
                 q: Queue = Queue()
                 thread_pool = GraphEngineThreadPool(
-                    max_workers=self.node_data.parallel_nums, max_submit_count=dify_config.MAX_SUBMIT_COUNT
+                    tenant_id=self.tenant_id,
+                    app_id=self.app_id,
+                    max_workers=self.node_data.parallel_nums,
+                    max_submit_count=dify_config.MAX_SUBMIT_COUNT,
                 )
                 for index, item in enumerate(iterator_list_value):
                     future: Future = thread_pool.submit(
@@ -184,7 +187,6 @@ class IterationNode(BaseNode[IterationNodeData]):
                         item=item,
                         iter_run_map=iter_run_map,
                     )
-                    future.add_done_callback(thread_pool.task_done_callback)
                     futures.append(future)
                 succeeded_count = 0
                 while True:
@@ -31,6 +31,7 @@ from core.model_runtime.model_providers.__base.large_language_model import Large
 from core.model_runtime.utils.encoders import jsonable_encoder
 from core.prompt.entities.advanced_prompt_entities import CompletionModelPromptTemplate, MemoryConfig
 from core.prompt.utils.prompt_message_util import PromptMessageUtil
+from core.provider_manager import ProviderManager
 from core.variables import (
     ArrayAnySegment,
     ArrayFileSegment,
@@ -738,15 +739,23 @@ class LLMNode(BaseNode[LLMNodeData]):
                 used_quota = 1
 
         if used_quota is not None and system_configuration.current_quota_type is not None:
-            db.session.query(Provider).filter(
-                Provider.tenant_id == tenant_id,
-                Provider.provider_name == model_instance.provider,
-                Provider.provider_type == ProviderType.SYSTEM.value,
-                Provider.quota_type == system_configuration.current_quota_type.value,
-                Provider.quota_limit > Provider.quota_used,
-            ).update({"quota_used": Provider.quota_used + used_quota})
+            updated_rows = (
+                db.session.query(Provider)
+                .filter(
+                    Provider.tenant_id == tenant_id,
+                    Provider.provider_name == model_instance.provider,
+                    Provider.provider_type == ProviderType.SYSTEM.value,
+                    Provider.quota_type == system_configuration.current_quota_type.value,
+                    Provider.quota_limit > Provider.quota_used,
+                )
+                .update({"quota_used": Provider.quota_used + used_quota})
+            )
             db.session.commit()
 
+            # the quota was used up, drop the cached configurations that still consider it valid
+            if not updated_rows:
+                ProviderManager.invalidate_configurations_cache(tenant_id)
+
     @classmethod
     def _extract_variable_selector_to_variable_mapping(
         cls,
@@ -1,6 +1,7 @@
 from configs import dify_config
 from core.app.entities.app_invoke_entities import AgentChatAppGenerateEntity, ChatAppGenerateEntity
 from core.entities.provider_entities import QuotaUnit
+from core.provider_manager import ProviderManager
 from events.message_event import message_was_created
 from extensions.ext_database import db
 from models.provider import Provider, ProviderType
@@ -43,11 +44,19 @@ def handle(sender, **kwargs):
             used_quota = 1
 
     if used_quota is not None and system_configuration.current_quota_type is not None:
-        db.session.query(Provider).filter(
-            Provider.tenant_id == application_generate_entity.app_config.tenant_id,
-            Provider.provider_name == model_config.provider,
-            Provider.provider_type == ProviderType.SYSTEM.value,
-            Provider.quota_type == system_configuration.current_quota_type.value,
-            Provider.quota_limit > Provider.quota_used,
-        ).update({"quota_used": Provider.quota_used + used_quota})
+        updated_rows = (
+            db.session.query(Provider)
+            .filter(
+                Provider.tenant_id == application_generate_entity.app_config.tenant_id,
+                Provider.provider_name == model_config.provider,
+                Provider.provider_type == ProviderType.SYSTEM.value,
+                Provider.quota_type == system_configuration.current_quota_type.value,
+                Provider.quota_limit > Provider.quota_used,
+            )
+            .update({"quota_used": Provider.quota_used + used_quota})
+        )
         db.session.commit()
+
+        # the quota was used up, drop the cached configurations that still consider it valid
+        if not updated_rows:
+            ProviderManager.invalidate_configurations_cache(application_generate_entity.app_config.tenant_id)
@@ -70,6 +70,7 @@ def init_app(app: DifyApp) -> Celery:
         "schedule.update_tidb_serverless_status_task",
         "schedule.clean_messages",
         "schedule.mail_clean_document_notify_task",
+        "schedule.flush_buffered_writes_task",
     ]
     day = dify_config.CELERY_BEAT_SCHEDULER_TIME
     beat_schedule = {
@@ -99,6 +100,17 @@ def init_app(app: DifyApp) -> Celery:
             "schedule": crontab(minute="0", hour="10", day_of_week="1"),
         },
     }
+    # the buffered writes are only flushed when they are buffered
+    if dify_config.RETRIEVAL_LOG_BUFFER_ENABLED:
+        beat_schedule["flush_retrieval_log_task"] = {
+            "task": "schedule.flush_buffered_writes_task.flush_retrieval_log_task",
+            "schedule": timedelta(seconds=dify_config.RETRIEVAL_LOG_FLUSH_INTERVAL),
+        }
+    if dify_config.API_TOKEN_LAST_USED_BUFFER_ENABLED:
+        beat_schedule["update_api_token_last_used_task"] = {
+            "task": "schedule.flush_buffered_writes_task.update_api_token_last_used_task",
+            "schedule": timedelta(seconds=dify_config.API_TOKEN_LAST_USED_FLUSH_INTERVAL),
+        }
     celery_app.conf.update(beat_schedule=beat_schedule, imports=imports)
 
     return celery_app
@@ -6,7 +6,9 @@ def init_app(app: DifyApp):
         add_qdrant_doc_id_index,
         convert_to_agent_apps,
         create_tenant,
+        extraction_cache_stats,
         fix_app_site_missing,
+        keyword_store_migrate,
         reset_email,
         reset_encrypt_key_pair,
         reset_password,
@@ -19,11 +21,13 @@ def init_app(app: DifyApp):
         reset_email,
         reset_encrypt_key_pair,
         vdb_migrate,
+        keyword_store_migrate,
         convert_to_agent_apps,
         add_qdrant_doc_id_index,
         create_tenant,
         upgrade_db,
         fix_app_site_missing,
+        extraction_cache_stats,
     ]
     for cmd in cmds_to_register:
         app.cli.add_command(cmd)
@@ -48,7 +48,7 @@ class UnsupportedSegmentTypeError(Exception):
 
 
 # Define the constant
-SEGMENT_TO_VARIABLE_MAP = {
+SEGMENT_TO_VARIABLE_MAP: Mapping[type[Segment], type[Variable]] = {
     StringSegment: StringVariable,
     IntegerSegment: IntegerVariable,
     FloatSegment: FloatVariable,
@@ -166,13 +166,12 @@ def segment_to_variable(
         raise UnsupportedSegmentTypeError(f"not supported segment type {segment_type}")
 
     variable_class = SEGMENT_TO_VARIABLE_MAP[segment_type]
-    return cast(
-        Variable,
-        variable_class(
-            id=id,
-            name=name,
-            description=description,
-            value=segment.value,
-            selector=selector,
-        ),
+    # the value was validated when the segment was built, so it is not validated again
+    return variable_class.model_construct(
+        value_type=segment.value_type,
+        id=id,
+        name=name,
+        description=description,
+        value=segment.value,
+        selector=list(selector),
     )
@@ -1,9 +1,12 @@
 import hashlib
+import time
 
 from Crypto.Cipher import AES
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
 
+from configs import dify_config
+from core.helper.lru_cache import LRUCache
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
 from libs import gmpy2_pkcs10aep_cipher
@@ -19,10 +22,28 @@ def generate_key_pair(tenant_id):
     filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
 
     storage.save(filepath, pem_private)
+    redis_client.delete(_get_private_key_cache_key(filepath))
+    invalidate_decrypt_cache(tenant_id)
 
     return pem_public.decode()
 
 
+# imported private keys by tenant id, and decrypted tokens by private key and hash of the encrypted token,
+# each entry is stored with its expiry time
+_private_key_cache = LRUCache(capacity=dify_config.CREDENTIALS_DECRYPT_CACHE_MAX_SIZE)
+_decrypted_token_cache = LRUCache(capacity=dify_config.CREDENTIALS_DECRYPT_CACHE_MAX_SIZE)
+# moduli of the private keys by object id, the keys are kept referenced so that their ids are not reused
+_private_key_moduli = LRUCache(capacity=dify_config.CREDENTIALS_DECRYPT_CACHE_MAX_SIZE)
+
+
+def invalidate_decrypt_cache(tenant_id):
+    """
+    Drop the cached private key of the tenant, call it when the key pair of the tenant changes.
+    The decrypted tokens are cached by private key, so the ones of the old key are not used anymore.
+    """
+    _private_key_cache.delete(tenant_id)
+
+
 prefix_hybrid = b"HYBRID:"
 
 
@@ -45,10 +66,18 @@ def encrypt(text, public_key):
     return prefix_hybrid + encrypted_data
 
 
+def _get_private_key_cache_key(filepath):
+    return "tenant_privkey:{hash}".format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
+
+
 def get_decrypt_decoding(tenant_id):
+    cached_decoding = _private_key_cache.get(tenant_id)
+    if cached_decoding and cached_decoding[0] > time.monotonic():
+        return cached_decoding[1], cached_decoding[2]
+
     filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
 
-    cache_key = "tenant_privkey:{hash}".format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
+    cache_key = _get_private_key_cache_key(filepath)
     private_key = redis_client.get(cache_key)
     if not private_key:
         try:
@@ -61,10 +90,42 @@ def get_decrypt_decoding(tenant_id):
     rsa_key = RSA.import_key(private_key)
     cipher_rsa = gmpy2_pkcs10aep_cipher.new(rsa_key)
 
+    if dify_config.CREDENTIALS_DECRYPT_CACHE_TTL:
+        expires_at = time.monotonic() + dify_config.CREDENTIALS_DECRYPT_CACHE_TTL
+        _private_key_cache.put(tenant_id, (expires_at, rsa_key, cipher_rsa))
+
     return rsa_key, cipher_rsa
 
 
 def decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa):
+    if not dify_config.CREDENTIALS_DECRYPT_CACHE_TTL:
+        return _decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa)
+
+    # the same encrypted token always decrypts to the same text with the same private key
+    cache_key = (_get_private_key_modulus(rsa_key), hashlib.sha256(encrypted_text).digest())
+    cached_token = _decrypted_token_cache.get(cache_key)
+    if cached_token and cached_token[0] > time.monotonic():
+        return cached_token[1]
+
+    decrypted_text = _decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa)
+    expires_at = time.monotonic() + dify_config.CREDENTIALS_DECRYPT_CACHE_TTL
+    _decrypted_token_cache.put(cache_key, (expires_at, decrypted_text))
+
+    return decrypted_text
+
+
+def _get_private_key_modulus(rsa_key):
+    # converting the modulus of a key to an int is slower than decrypting a cached token
+    cached_modulus = _private_key_moduli.get(id(rsa_key))
+    if cached_modulus and cached_modulus[0] is rsa_key:
+        return cached_modulus[1]
+
+    modulus = rsa_key.n
+    _private_key_moduli.put(id(rsa_key), (rsa_key, modulus))
+    return modulus
+
+
+def _decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa):
     if encrypted_text.startswith(prefix_hybrid):
         encrypted_text = encrypted_text[len(prefix_hybrid) :]
 
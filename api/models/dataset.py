@@ -60,6 +60,8 @@ class Dataset(db.Model):  # type: ignore[name-defined]
     embedding_model_provider = db.Column(db.String(255), nullable=True)
     collection_binding_id = db.Column(StringUUID, nullable=True)
     retrieval_model = db.Column(JSONB, nullable=True)
+    # keyword store of the keyword index, datasets without one use the jieba keyword table
+    keyword_store = db.Column(db.String(255), nullable=True, default=lambda: dify_config.KEYWORD_STORE)
 
     @property
     def dataset_keyword_table(self):
@@ -749,6 +751,21 @@ class DatasetKeywordTable(db.Model):  # type: ignore[name-defined]
                 return None
 
 
+class DatasetKeywordPosting(db.Model):  # type: ignore[name-defined]
+    __tablename__ = "dataset_keyword_postings"
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id", name="dataset_keyword_posting_pkey"),
+        db.UniqueConstraint("dataset_id", "keyword", "index_node_id", name="dataset_keyword_posting_unique_idx"),
+        db.Index("dataset_keyword_posting_node_idx", "dataset_id", "index_node_id"),
+    )
+
+    id = db.Column(StringUUID, primary_key=True, server_default=db.text("uuid_generate_v4()"))
+    dataset_id = db.Column(StringUUID, nullable=False)
+    keyword = db.Column(db.String(255), nullable=False)
+    index_node_id = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+
 class Embedding(db.Model):  # type: ignore[name-defined]
     __tablename__ = "embeddings"
     __table_args__ = (
@@ -0,0 +1,44 @@
+import time
+from collections.abc import Callable
+from typing import Optional
+
+import click
+
+import app
+from core.helper.api_token_cache import ApiTokenCache
+from core.helper.retrieval_log_buffer import RetrievalLogBuffer
+
+
+@app.celery.task(queue="dataset")
+def flush_retrieval_log_task():
+    def flush() -> Optional[str]:
+        segment_hit_count, dataset_query_count = RetrievalLogBuffer.flush()
+        if not segment_hit_count and not dataset_query_count:
+            return None
+        return f"Flushed hit counts of {segment_hit_count} segments and {dataset_query_count} dataset queries"
+
+    _run_flush(flush)
+
+
+@app.celery.task(queue="dataset")
+def update_api_token_last_used_task():
+    def flush() -> Optional[str]:
+        api_token_count = ApiTokenCache.flush_usage()
+        if not api_token_count:
+            return None
+        return f"Updated last used time of {api_token_count} API tokens"
+
+    _run_flush(flush)
+
+
+def _run_flush(flush: Callable[[], Optional[str]]) -> None:
+    start_at = time.perf_counter()
+    try:
+        message = flush()
+    except Exception as e:
+        click.echo(click.style(f"Error: {e}", fg="red"))
+        return
+
+    end_at = time.perf_counter()
+    if message:
+        click.echo(click.style(f"{message}, latency: {end_at - start_at}", fg="green"))
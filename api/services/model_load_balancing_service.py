@@ -46,6 +46,7 @@ class ModelLoadBalancingService:
 
         # Enable model load balancing
         provider_configuration.enable_model_load_balancing(model=model, model_type=ModelType.value_of(model_type))
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def disable_model_load_balancing(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
@@ -67,6 +68,7 @@ class ModelLoadBalancingService:
 
         # disable model load balancing
         provider_configuration.disable_model_load_balancing(model=model, model_type=ModelType.value_of(model_type))
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def get_load_balancing_configs(
         self, tenant_id: str, provider: str, model: str, model_type: str
@@ -422,6 +424,8 @@ class ModelLoadBalancingService:
 
             self._clear_credentials_cache(tenant_id, config_id)
 
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
+
     def validate_load_balancing_credentials(
         self,
         tenant_id: str,
@@ -148,6 +148,7 @@ class ModelProviderService:
 
         # Add or update custom provider credentials.
         provider_configuration.add_or_update_custom_credentials(credentials)
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def remove_provider_credentials(self, tenant_id: str, provider: str) -> None:
         """
@@ -167,6 +168,7 @@ class ModelProviderService:
 
         # Remove custom provider credentials.
         provider_configuration.delete_custom_credentials()
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def get_model_credentials(self, tenant_id: str, provider: str, model_type: str, model: str):
         """
@@ -242,6 +244,7 @@ class ModelProviderService:
         provider_configuration.add_or_update_custom_model_credentials(
             model_type=ModelType.value_of(model_type), model=model, credentials=credentials
         )
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def remove_model_credentials(self, tenant_id: str, provider: str, model_type: str, model: str) -> None:
         """
@@ -263,6 +266,7 @@ class ModelProviderService:
 
         # Remove custom model credentials
         provider_configuration.delete_custom_model_credentials(model_type=ModelType.value_of(model_type), model=model)
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def get_models_by_model_type(self, tenant_id: str, model_type: str) -> list[ProviderWithModelsResponse]:
         """
@@ -474,6 +478,7 @@ class ModelProviderService:
 
         # Switch preferred provider type
         provider_configuration.switch_preferred_provider_type(preferred_provider_type_enum)
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def enable_model(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
@@ -495,6 +500,7 @@ class ModelProviderService:
 
         # Enable model
         provider_configuration.enable_model(model=model, model_type=ModelType.value_of(model_type))
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def disable_model(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
@@ -516,6 +522,7 @@ class ModelProviderService:
 
         # Enable model
         provider_configuration.disable_model(model=model, model_type=ModelType.value_of(model_type))
+        self.provider_manager.invalidate_configurations_cache(tenant_id)
 
     def free_quota_submit(self, tenant_id: str, provider: str):
         api_key = os.environ.get("FREE_QUOTA_APPLY_API_KEY")
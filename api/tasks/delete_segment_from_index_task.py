@@ -4,6 +4,7 @@ import time
 import click
 from celery import shared_task  # type: ignore
 
+from core.helper.segment_content_cache import SegmentContentCache
 from core.rag.index_processor.index_processor_factory import IndexProcessorFactory
 from extensions.ext_database import db
 from models.dataset import Dataset, Document
@@ -36,6 +37,7 @@ def delete_segment_from_index_task(index_node_ids: list, dataset_id: str, docume
         index_type = dataset_document.doc_form
         index_processor = IndexProcessorFactory(index_type).init_index_processor()
         index_processor.clean(dataset, index_node_ids, with_keywords=True, delete_child_chunks=True)
+        SegmentContentCache.delete(dataset.id, index_node_ids)
 
         end_at = time.perf_counter()
         logging.info(click.style("Segment deleted from index latency: {}".format(end_at - start_at), fg="green"))
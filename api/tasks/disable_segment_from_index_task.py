@@ -5,6 +5,7 @@ import click
 from celery import shared_task  # type: ignore
 from werkzeug.exceptions import NotFound
 
+from core.helper.segment_content_cache import SegmentContentCache
 from core.rag.index_processor.index_processor_factory import IndexProcessorFactory
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
@@ -51,6 +52,7 @@ def disable_segment_from_index_task(segment_id: str):
         index_type = dataset_document.doc_form
         index_processor = IndexProcessorFactory(index_type).init_index_processor()
         index_processor.clean(dataset, [segment.index_node_id])
+        SegmentContentCache.delete(dataset.id, [segment.index_node_id])
 
         end_at = time.perf_counter()
         logging.info(
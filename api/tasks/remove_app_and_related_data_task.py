@@ -7,6 +7,7 @@ from celery import shared_task  # type: ignore
 from sqlalchemy import delete
 from sqlalchemy.exc import SQLAlchemyError
 
+from core.helper.api_token_cache import ApiTokenCache
 from extensions.ext_database import db
 from models.dataset import AppDatasetJoin
 from models.model import (
@@ -91,7 +92,11 @@ def _delete_app_site(tenant_id: str, app_id: str):
 
 def _delete_app_api_tokens(tenant_id: str, app_id: str):
     def del_api_token(api_token_id: str):
-        db.session.query(ApiToken).filter(ApiToken.id == api_token_id).delete(synchronize_session=False)
+        api_token = db.session.query(ApiToken).filter(ApiToken.id == api_token_id).first()
+        if api_token is None:
+            return
+        db.session.delete(api_token)
+        ApiTokenCache.delete(api_token.token, api_token.type)
 
     _delete_records(
         """select id from api_tokens where app_id=:app_id limit 1000""", {"app_id": app_id}, del_api_token, "api token"
@@ -0,0 +1,63 @@
+import pytest
+
+from configs import dify_config
+from core.app.apps.base_app_queue_manager import PublishFrom
+from core.app.apps.workflow.app_queue_manager import WorkflowAppQueueManager
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.app.entities.queue_entities import QueueStopEvent, QueueTextChunkEvent
+
+EVENT_COUNT = 2000
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mock_redis = mocker.patch("core.app.apps.base_app_queue_manager.redis_client", new=mocker.MagicMock())
+    mock_redis.get.return_value = None
+    return mock_redis
+
+
+def _new_queue_manager() -> WorkflowAppQueueManager:
+    return WorkflowAppQueueManager(
+        task_id="task_id", user_id="user_id", invoke_from=InvokeFrom.SERVICE_API, app_mode="workflow"
+    )
+
+
+def _stream_events(queue_manager: WorkflowAppQueueManager) -> int:
+    for _ in range(EVENT_COUNT):
+        queue_manager.publish(QueueTextChunkEvent(text="chunk"), PublishFrom.APPLICATION_MANAGER)
+    queue_manager.stop_listen()
+
+    return sum(1 for _ in queue_manager.listen())
+
+
+def test_stop_flag_is_checked_at_most_once_per_interval(mock_redis):
+    queue_manager = _new_queue_manager()
+
+    assert _stream_events(queue_manager) == EVENT_COUNT
+    assert mock_redis.get.call_count == 1
+
+
+def test_stop_flag_is_remembered(mocker, mock_redis):
+    mocker.patch.object(dify_config, "APP_STOP_CHECK_INTERVAL", 0)
+    queue_manager = _new_queue_manager()
+    mock_redis.get.return_value = b"1"
+
+    assert queue_manager._is_stopped()
+    assert queue_manager._is_stopped()
+    assert mock_redis.get.call_count == 1
+
+    messages = list(queue_manager.listen())
+    assert isinstance(messages[0].event, QueueStopEvent)
+
+
+@pytest.mark.parametrize("per_event_checks", [True, False], ids=["per_event_checks", "rate_limited"])
+def test_benchmark_stream_events(benchmark, mocker, mock_redis, per_event_checks):
+    if per_event_checks:
+        # the previous behavior: a redis round trip and a model dump check for every event
+        mocker.patch.object(dify_config, "APP_STOP_CHECK_INTERVAL", 0)
+        mocker.patch.object(dify_config, "DEBUG", True)
+    benchmark.extra_info["events_per_round"] = EVENT_COUNT
+
+    received = benchmark(lambda: _stream_events(_new_queue_manager()))
+
+    assert received == EVENT_COUNT
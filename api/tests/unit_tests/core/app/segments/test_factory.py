@@ -163,3 +163,16 @@ def test_array_none_variable():
     var = variable_factory.build_segment([None, None, None, None])
     assert isinstance(var, ArrayAnySegment)
     assert var.value == [None, None, None, None]
+
+
+def test_segment_to_variable_copies_selector():
+    selector = ["node_id", "text"]
+    segment = variable_factory.build_segment("Hello, World!")
+
+    variable = variable_factory.segment_to_variable(segment=segment, selector=selector)
+    selector.append("changed")
+
+    assert isinstance(variable, StringVariable)
+    assert variable.value == "Hello, World!"
+    assert variable.name == "text"
+    assert list(variable.selector) == ["node_id", "text"]
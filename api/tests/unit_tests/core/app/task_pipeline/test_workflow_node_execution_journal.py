@@ -0,0 +1,52 @@
+from datetime import UTC, datetime
+
+from core.app.task_pipeline.workflow_node_execution_journal import WorkflowNodeExecutionJournal
+from models.workflow import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+
+
+def _new_workflow_node_execution(id: str) -> WorkflowNodeExecution:
+    workflow_node_execution = WorkflowNodeExecution()
+    workflow_node_execution.id = id
+    workflow_node_execution.status = WorkflowNodeExecutionStatus.RUNNING.value
+    workflow_node_execution.created_at = datetime.now(UTC).replace(tzinfo=None)
+    return workflow_node_execution
+
+
+def _new_journal(mocker, strict: bool) -> tuple[WorkflowNodeExecutionJournal, list[list[dict]]]:
+    journal = WorkflowNodeExecutionJournal(engine=mocker.MagicMock(), strict=strict, flush_interval=60, batch_size=100)
+    written: list[list[dict]] = []
+    mocker.patch.object(journal, "_write", side_effect=written.append)
+    return journal, written
+
+
+def test_node_executions_are_written_in_one_batch_with_latest_state(mocker):
+    journal, written = _new_journal(mocker, strict=False)
+
+    workflow_node_executions = [_new_workflow_node_execution(str(i)) for i in range(10)]
+    for workflow_node_execution in workflow_node_executions:
+        journal.record(workflow_node_execution)
+    for workflow_node_execution in workflow_node_executions:
+        workflow_node_execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+        journal.record(workflow_node_execution)
+    assert written == []
+
+    journal.close()
+
+    assert len(written) == 1
+    assert [row["status"] for row in written[0]] == [WorkflowNodeExecutionStatus.SUCCEEDED.value] * 10
+    # columns with server defaults are not written as None
+    assert "elapsed_time" not in written[0][0]
+
+
+def test_strict_mode_writes_every_change(mocker):
+    journal, written = _new_journal(mocker, strict=True)
+
+    workflow_node_execution = _new_workflow_node_execution("id")
+    journal.record(workflow_node_execution)
+    workflow_node_execution.status = WorkflowNodeExecutionStatus.SUCCEEDED.value
+    journal.record(workflow_node_execution)
+
+    assert [rows[0]["status"] for rows in written] == [
+        WorkflowNodeExecutionStatus.RUNNING.value,
+        WorkflowNodeExecutionStatus.SUCCEEDED.value,
+    ]
@@ -0,0 +1,120 @@
+import pytest
+from werkzeug.exceptions import Unauthorized
+
+from configs import dify_config
+from controllers.service_api.wraps import validate_and_get_api_token
+from core.helper import api_token_cache
+from core.helper.api_token_cache import ApiTokenCache
+from models.model import ApiToken
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mock_redis = mocker.patch("core.helper.api_token_cache.redis_client", new=mocker.MagicMock())
+    mocker.patch("core.helper.redis_hash_buffer.redis_client", new=mock_redis)
+    cache = {}
+    mock_redis.get.side_effect = cache.get
+    mock_redis.setex.side_effect = lambda key, ttl, value: cache.__setitem__(key, value.encode())
+    mock_redis.delete.side_effect = lambda key: cache.pop(key, None)
+    return mock_redis
+
+
+@pytest.fixture
+def mock_session(mocker):
+    mock_session_class = mocker.patch("controllers.service_api.wraps.Session")
+    mocker.patch("controllers.service_api.wraps.db", new=mocker.MagicMock())
+    return mock_session_class.return_value.__enter__.return_value
+
+
+@pytest.fixture
+def record_usage(mocker):
+    return mocker.patch.object(ApiTokenCache, "record_usage")
+
+
+def _validate(app, token: str = "app-token"):
+    with app.test_request_context(headers={"Authorization": f"Bearer {token}"}):
+        return validate_and_get_api_token("app")
+
+
+def test_tokens_are_loaded_from_the_database_once(app, mocker, mock_redis, mock_session, record_usage):
+    mocker.patch.object(dify_config, "API_TOKEN_CACHE_TTL", 60)
+    mock_session.scalar.return_value = ApiToken(
+        id="token_id", app_id="app_id", tenant_id="tenant_id", type="app", token="app-token"
+    )
+
+    api_tokens = [_validate(app) for _ in range(3)]
+
+    assert mock_session.scalar.call_count == 1
+    assert {(t.id, t.app_id, t.tenant_id, t.type) for t in api_tokens} == {("token_id", "app_id", "tenant_id", "app")}
+    assert record_usage.call_count == 3
+
+    # deleted tokens are not valid anymore
+    ApiTokenCache.delete("app-token", "app")
+    mock_session.scalar.return_value = None
+    with pytest.raises(Unauthorized):
+        _validate(app)
+
+
+def test_invalid_tokens_are_not_cached(app, mocker, mock_redis, mock_session, record_usage):
+    mocker.patch.object(dify_config, "API_TOKEN_CACHE_TTL", 60)
+    mock_session.scalar.return_value = None
+
+    for _ in range(2):
+        with pytest.raises(Unauthorized):
+            _validate(app, "invalid-token")
+
+    assert mock_session.scalar.call_count == 2
+    mock_redis.setex.assert_not_called()
+    record_usage.assert_not_called()
+
+
+def test_last_used_at_is_written_once_a_minute(mocker, mock_redis):
+    mocker.patch.object(dify_config, "API_TOKEN_LAST_USED_BUFFER_ENABLED", False)
+    api_token_cache._last_used_at_recorded.clear()
+    write_last_used_at = mocker.patch.object(ApiTokenCache, "_write_last_used_at")
+
+    for _ in range(10):
+        ApiTokenCache.record_usage("token_1")
+    ApiTokenCache.record_usage("token_2")
+
+    assert [list(call.args[0]) for call in write_last_used_at.call_args_list] == [["token_1"], ["token_2"]]
+
+
+def test_buffered_last_used_at_is_kept_when_flush_fails(mocker, mock_redis):
+    mocker.patch.object(dify_config, "API_TOKEN_LAST_USED_BUFFER_ENABLED", True)
+    api_token_cache._last_used_at_recorded.clear()
+    mocker.patch.object(ApiTokenCache, "_write_last_used_at", side_effect=Exception("database is down"))
+
+    ApiTokenCache.record_usage("token_id")
+    mock_redis.hset.assert_called_once()
+    mock_redis.exists.return_value = True
+    mock_redis.hgetall.return_value = {b"token_id": mock_redis.hset.call_args.args[2].encode()}
+
+    with pytest.raises(Exception, match="database is down"):
+        ApiTokenCache.flush_usage()
+
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    pipe.hsetnx.assert_called_once_with(
+        "api_token:last_used_at", b"token_id", mock_redis.hset.call_args.args[2].encode()
+    )
+
+
+def test_cache_failures_do_not_raise(mocker, mock_redis):
+    mocker.patch.object(dify_config, "API_TOKEN_CACHE_TTL", 60)
+    mock_redis.get.side_effect = Exception("redis is down")
+    mock_redis.setex.side_effect = Exception("redis is down")
+    mock_redis.delete.side_effect = Exception("redis is down")
+
+    assert ApiTokenCache.get("app-token", "app") is None
+    ApiTokenCache.set(ApiToken(id="token_id", app_id="app_id", tenant_id="tenant_id", type="app", token="app-token"))
+    ApiTokenCache.delete("app-token", "app")
+
+
+def test_buffered_last_used_at_does_not_fail_without_redis(mocker, mock_redis):
+    mocker.patch.object(dify_config, "API_TOKEN_LAST_USED_BUFFER_ENABLED", True)
+    api_token_cache._last_used_at_recorded.clear()
+    mock_redis.hset.side_effect = Exception("redis is down")
+
+    ApiTokenCache.record_usage("token_id")
+
+    mock_redis.hset.assert_called_once()
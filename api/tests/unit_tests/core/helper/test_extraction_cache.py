@@ -0,0 +1,189 @@
+import itertools
+import json
+
+import pytest
+
+from configs import dify_config
+from core.helper.extraction_cache import ExtractionCache
+from core.rag.models.document import Document
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values: dict[str, int] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.hashes: dict[str, dict[str, bytes]] = {}
+
+    def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    def zadd(self, key, mapping, xx=False):
+        zset = self.zsets.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            if xx and member not in zset:
+                continue
+            added += member not in zset
+            zset[member] = score
+        return added
+
+    def zrem(self, key, member):
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+
+    def zpopmin(self, key):
+        zset = self.zsets.get(key)
+        if not zset:
+            return []
+        member = min(zset, key=zset.__getitem__)
+        return [(member.encode(), zset.pop(member))]
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = str(value).encode()
+
+    def hdel(self, key, field):
+        return int(self.hashes.get(key, {}).pop(field, None) is not None)
+
+    def incr(self, key):
+        return self.incrby(key, 1)
+
+    def incrby(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    def decrby(self, key, amount):
+        return self.incrby(key, -amount)
+
+    def mget(self, keys):
+        return [str(self.values[key]).encode() if key in self.values else None for key in keys]
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis: _FakeRedis):
+        self._redis = redis
+        self._results: list = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self._results.append(getattr(self._redis, name)(*args, **kwargs))
+
+        return command
+
+    def execute(self):
+        results, self._results = self._results, []
+        return results
+
+
+class _FakeStorage:
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+
+    def save(self, filename, data):
+        self.files[filename] = data
+
+    def load_once(self, filename):
+        if filename not in self.files:
+            raise FileNotFoundError(filename)
+        return self.files[filename]
+
+    def delete(self, filename):
+        self.files.pop(filename, None)
+
+
+@pytest.fixture
+def fake_redis(mocker):
+    fake_redis = _FakeRedis()
+    mocker.patch("core.helper.extraction_cache.redis_client", new=fake_redis)
+    # every access is more recent than the one before
+    mocker.patch("core.helper.extraction_cache.time").time.side_effect = itertools.count()
+    mocker.patch.object(dify_config, "EXTRACTION_CACHE_MAX_SIZE_MB", 1)
+    return fake_redis
+
+
+@pytest.fixture
+def fake_storage(mocker):
+    fake_storage = _FakeStorage()
+    mocker.patch("core.helper.extraction_cache.storage", new=fake_storage)
+    return fake_storage
+
+
+def _documents(text: str, size_kb: int = 1) -> list[Document]:
+    return [Document(page_content=text * (size_kb * 1024 // len(text)), metadata={"source": text})]
+
+
+def _entry_size(documents: list[Document]) -> int:
+    return len(json.dumps([document.model_dump() for document in documents]).encode("utf-8"))
+
+
+def test_cached_documents_are_returned_and_counted(fake_redis, fake_storage):
+    documents = _documents("a")
+
+    assert ExtractionCache.get("key_a") is None
+    ExtractionCache.set("key_a", documents)
+
+    assert ExtractionCache.get("key_a") == documents
+    assert ExtractionCache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "size": _entry_size(documents)}
+
+
+def test_least_recently_used_entries_are_evicted(fake_redis, fake_storage):
+    documents = {key: _documents(key, size_kb=400) for key in ["a", "b", "c"]}
+    ExtractionCache.set("a", documents["a"])
+    ExtractionCache.set("b", documents["b"])
+    # a is used again, so b is the least recently used one
+    assert ExtractionCache.get("a") is not None
+
+    ExtractionCache.set("c", documents["c"])
+
+    assert ExtractionCache.get("b") is None
+    assert ExtractionCache.get("a") == documents["a"]
+    assert ExtractionCache.get("c") == documents["c"]
+    assert sorted(fake_storage.files) == ["extraction_cache/a.json", "extraction_cache/c.json"]
+    assert set(fake_redis.hashes[ExtractionCache._SIZES_KEY]) == {"a", "c"}
+    assert ExtractionCache.stats()["size"] == _entry_size(documents["a"]) + _entry_size(documents["c"])
+
+
+def test_replaced_entries_are_counted_once(fake_redis, fake_storage):
+    ExtractionCache.set("a", _documents("a", size_kb=2))
+    ExtractionCache.set("a", _documents("a"))
+
+    assert ExtractionCache.stats()["size"] == _entry_size(_documents("a"))
+
+
+def test_entries_missing_in_the_storage_are_forgotten(fake_redis, fake_storage):
+    ExtractionCache.set("a", _documents("a"))
+    ExtractionCache.set("b", _documents("b"))
+    fake_storage.files.pop("extraction_cache/a.json")
+
+    assert ExtractionCache.get("a") is None
+
+    assert fake_redis.zscore(ExtractionCache._LRU_KEY, "a") is None
+    assert "a" not in fake_redis.hashes[ExtractionCache._SIZES_KEY]
+    assert ExtractionCache.stats()["size"] == _entry_size(_documents("b"))
+
+
+def test_entries_larger_than_the_cache_are_not_stored(fake_redis, fake_storage):
+    ExtractionCache.set("a", _documents("a", size_kb=1100))
+
+    assert not fake_storage.files
+    assert ExtractionCache.get("a") is None
+
+
+def test_disabled_cache_does_not_use_redis(mocker, fake_redis, fake_storage):
+    mocker.patch.object(dify_config, "EXTRACTION_CACHE_MAX_SIZE_MB", 0)
+
+    ExtractionCache.set("a", _documents("a"))
+
+    assert ExtractionCache.get("a") is None
+    assert not fake_storage.files
+    assert not fake_redis.values
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from configs import dify_config
+from core.helper.retrieval_log_buffer import RetrievalLogBuffer
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mock_redis = mocker.patch("core.helper.retrieval_log_buffer.redis_client", new=mocker.MagicMock())
+    mocker.patch("core.helper.redis_hash_buffer.redis_client", new=mock_redis)
+    return mock_redis
+
+
+@pytest.fixture
+def mock_db(mocker):
+    return mocker.patch("core.helper.retrieval_log_buffer.db", new=mocker.MagicMock())
+
+
+def test_buffered_retrieval_does_not_write_to_database(mocker, mock_redis, mock_db):
+    mocker.patch.object(dify_config, "RETRIEVAL_LOG_BUFFER_ENABLED", True)
+
+    RetrievalLogBuffer.add_segment_hits([("dataset_id", "node_1"), ("dataset_id", "node_1"), (None, "node_2")])
+    RetrievalLogBuffer.add_dataset_queries(
+        query="query", dataset_ids=["dataset_id"], app_id="app_id", created_by_role="account", created_by="user_id"
+    )
+
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    assert pipe.hincrby.call_count == 3
+    mock_redis.rpush.assert_called_once()
+    assert json.loads(mock_redis.rpush.call_args.args[1])["content"] == "query"
+    assert not mock_db.session.method_calls
+
+
+def test_unbuffered_hits_are_written_in_one_statement(mocker, mock_redis, mock_db):
+    mocker.patch.object(dify_config, "RETRIEVAL_LOG_BUFFER_ENABLED", False)
+
+    RetrievalLogBuffer.add_segment_hits([("dataset_id", f"node_{i}") for i in range(10)])
+
+    mock_db.session.execute.assert_called_once()
+    mock_db.session.commit.assert_called_once()
+    assert not mock_redis.method_calls
+
+
+def test_segment_hits_are_kept_when_flush_fails(mock_redis, mock_db):
+    mock_redis.exists.return_value = True
+    mock_redis.hgetall.return_value = {json.dumps(["dataset_id", "node_1"]).encode(): b"3"}
+    mock_db.session.execute.side_effect = Exception("database is down")
+
+    with pytest.raises(Exception, match="database is down"):
+        RetrievalLogBuffer._flush_segment_hits()
+
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    pipe.hincrby.assert_called_once_with("retrieval_log:segment_hits", json.dumps(["dataset_id", "node_1"]).encode(), 3)
+    pipe.delete.assert_called_once_with(mock_redis.rename.call_args.args[1])
+
+
+def test_segment_hits_are_flushed_in_one_statement(mock_redis, mock_db):
+    mock_redis.exists.return_value = True
+    mock_redis.hgetall.return_value = {json.dumps(["dataset_id", f"node_{i}"]).encode(): b"2" for i in range(10)}
+
+    assert RetrievalLogBuffer._flush_segment_hits() == 10
+
+    mock_db.session.execute.assert_called_once()
+    flushing_key = mock_redis.rename.call_args.args[1]
+    assert flushing_key.startswith("retrieval_log:segment_hits:flushing:")
+    mock_redis.hgetall.assert_called_once_with(flushing_key)
+    mock_redis.delete.assert_called_once_with(flushing_key)
@@ -1,9 +1,11 @@
 import random
 from unittest.mock import MagicMock, patch
 
+import httpx
 import pytest
 
-from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, make_request
+from core.helper import ssrf_proxy
+from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, get_client, make_request
 
 
 @patch("httpx.Client.request")
@@ -50,3 +52,37 @@ def test_retry_logic_success(mock_request):
     assert response.status_code == 200
     assert mock_request.call_count == SSRF_DEFAULT_MAX_RETRIES + 1
     assert mock_request.call_args_list[0][1].get("method") == "GET"
+
+
+@patch("httpx.Client.request")
+def test_client_is_reused_across_requests(mock_request):
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_request.return_value = mock_response
+
+    make_request("GET", "http://example.com")
+    make_request("POST", "http://example.com")
+
+    assert mock_request.call_count == 2
+    assert get_client() is get_client()
+    assert "trace" in mock_request.call_args_list[0][1].get("extensions")
+
+
+def test_cookies_are_not_shared_between_requests(monkeypatch):
+    sent_cookies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent_cookies.append(request.headers.get("Cookie"))
+        return httpx.Response(200, headers={"Set-Cookie": "session=secret; Path=/"})
+
+    client = ssrf_proxy._build_client((None, None, None))
+    client._transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(ssrf_proxy, "get_client", lambda: client)
+
+    make_request("GET", "http://example.com/login")
+    make_request("GET", "http://example.com/profile")
+    # cookies passed with a request are still sent
+    make_request("GET", "http://example.com/profile", cookies={"token": "value"})
+
+    assert sent_cookies == [None, None, "token=value"]
+    assert not client.cookies
@@ -0,0 +1,148 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.memory.token_buffer_memory import TokenBufferMemory
+from core.model_runtime.entities import (
+    AssistantPromptMessage,
+    PromptMessage,
+    TextPromptMessageContent,
+    UserPromptMessage,
+)
+from models.model import AppMode, Message, MessageFile
+from models.workflow import Workflow, WorkflowRun
+
+
+def _count_tokens(prompt_messages: list[PromptMessage]) -> int:
+    # like OpenAI: the tokens of each message, 3 tokens per message and 3 tokens priming the reply
+    return sum(len(str(message.content).split()) + 3 for message in prompt_messages) + 3
+
+
+def _baseline_prune(prompt_messages: list[PromptMessage], max_token_limit: int) -> list[PromptMessage]:
+    prompt_messages = list(prompt_messages)
+    while _count_tokens(prompt_messages) > max_token_limit and len(prompt_messages) > 1:
+        prompt_messages.pop(0)
+    return prompt_messages
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    cache: dict[str, int] = {}
+    mock_redis = mocker.patch("core.memory.token_buffer_memory.redis_client", new=mocker.MagicMock())
+    mock_redis.mget.side_effect = lambda keys: [cache.get(key) for key in keys]
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    pipe.setex.side_effect = lambda key, ttl, value: cache.__setitem__(key, value)
+    mock_redis.cache = cache
+    return mock_redis
+
+
+@pytest.fixture
+def memory():
+    model_instance = MagicMock(provider="openai", model="gpt-4o")
+    model_instance.get_llm_num_tokens.side_effect = _count_tokens
+    return TokenBufferMemory(conversation=MagicMock(), model_instance=model_instance)
+
+
+def _history(count: int) -> tuple[list[PromptMessage], list[str]]:
+    prompt_messages: list[PromptMessage] = []
+    keys = []
+    for i in range(count):
+        prompt_messages.append(UserPromptMessage(content=" ".join(["question"] * (i % 7 + 1))))
+        prompt_messages.append(AssistantPromptMessage(content=" ".join(["answer"] * (i % 5 + 10))))
+        keys.extend([f"message_{i}:user", f"message_{i}:assistant"])
+    return prompt_messages, keys
+
+
+@pytest.mark.parametrize("cached", [False, True], ids=["cold_cache", "warm_cache"])
+def test_pruned_messages_match_baseline(memory, mock_redis, cached):
+    prompt_messages, keys = _history(20)
+    for max_token_limit in [1, 50, 100, 137, 200, 333, 500, 1000]:
+        if not cached:
+            mock_redis.cache.clear()
+
+        pruned_messages = memory._prune_prompt_messages(list(prompt_messages), keys, max_token_limit)
+
+        assert pruned_messages == _baseline_prune(prompt_messages, max_token_limit), max_token_limit
+
+
+def test_history_which_fits_is_counted_once(memory, mock_redis):
+    prompt_messages, keys = _history(20)
+
+    assert memory._prune_prompt_messages(list(prompt_messages), keys, 10000) == prompt_messages
+    assert memory.model_instance.get_llm_num_tokens.call_count == 1
+    assert not mock_redis.cache
+
+
+def test_message_tokens_are_cached_per_message(memory, mock_redis):
+    prompt_messages, keys = _history(20)
+    memory._prune_prompt_messages(list(prompt_messages), keys, 100)
+    assert set(mock_redis.cache) == {f"message_tokens:openai:gpt-4o:{key}" for key in keys}
+
+    # the next turn only counts its new messages and the pruned prompt
+    memory.model_instance.get_llm_num_tokens.reset_mock()
+    new_messages, new_keys = _history(21)
+    memory._prune_prompt_messages(list(new_messages), new_keys, 100)
+
+    counted = [call.args[0] for call in memory.model_instance.get_llm_num_tokens.call_args_list]
+    assert [messages for messages in counted if len(messages) == 1] == [[new_messages[-2]], [new_messages[-1]]]
+    assert len(counted) == 4
+
+
+def _mock_conversation_db(mocker, count: int):
+    """Mock the messages of a conversation, each with one file and its own workflow run of two workflows."""
+    messages = [
+        SimpleNamespace(
+            id=f"message_{i}",
+            query=f"question {i}",
+            answer=f"answer {i}",
+            workflow_run_id=f"run_{i}",
+            parent_message_id=f"message_{i - 1}" if i else None,
+        )
+        for i in reversed(range(count))
+    ]
+    message_files = [SimpleNamespace(id=f"file_{i}", message_id=f"message_{i}") for i in range(count)]
+    workflow_runs = [SimpleNamespace(id=f"run_{i}", workflow_id=f"workflow_{i % 2}") for i in range(count)]
+    workflows = [SimpleNamespace(id=f"workflow_{i}", features_dict={"workflow_id": f"workflow_{i}"}) for i in range(2)]
+    results = {Message.id: messages, MessageFile: message_files, WorkflowRun.id: workflow_runs, Workflow: workflows}
+
+    def query(entity, *args):
+        query = MagicMock()
+        query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = results[entity]
+        query.filter.return_value.all.return_value = results[entity]
+        return query
+
+    mock_db = mocker.patch("core.memory.token_buffer_memory.db", new=mocker.MagicMock())
+    mock_db.session.query.side_effect = query
+    return mock_db
+
+
+@pytest.mark.parametrize("count", [2, 20])
+def test_message_files_are_prefetched(mocker, memory, mock_redis, count):
+    mock_db = _mock_conversation_db(mocker, count)
+    memory.conversation.mode = AppMode.ADVANCED_CHAT
+    convert = mocker.patch(
+        "core.memory.token_buffer_memory.FileUploadConfigManager.convert",
+        side_effect=lambda features_dict, is_vision: SimpleNamespace(image_config=None, **features_dict),
+    )
+    build_from_message_files = mocker.patch(
+        "core.memory.token_buffer_memory.file_factory.build_from_message_files",
+        side_effect=lambda message_files, tenant_id, config: message_files,
+    )
+    mocker.patch(
+        "core.memory.token_buffer_memory.file_manager.to_prompt_message_content",
+        side_effect=lambda file, image_detail_config: TextPromptMessageContent(data=file.id),
+    )
+
+    prompt_messages = memory.get_history_prompt_messages(max_token_limit=100000)
+
+    # the messages, their files, the workflow runs and the workflows
+    assert mock_db.session.query.call_count == 4
+    assert convert.call_count == 2
+    assert [[content.data for content in m.content] for m in prompt_messages[::2]] == [
+        [f"question {i}", f"file_{i}"] for i in range(count)
+    ]
+    assert [
+        (call.kwargs["message_files"][0].id, call.kwargs["config"].workflow_id)
+        for call in build_from_message_files.call_args_list
+    ] == [(f"file_{i}", f"workflow_{i % 2}") for i in range(count)]
@@ -0,0 +1,21 @@
+from core.model_runtime.model_providers.openai.text_embedding.text_embedding import OpenAITextEmbeddingModel
+
+
+class _WhitespaceEncoding:
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+    def encode_batch(self, texts: list[str]) -> list[list[str]]:
+        return [self.encode(text) for text in texts]
+
+
+def test_num_tokens_list_matches_num_tokens(mocker):
+    mocker.patch("tiktoken.encoding_for_model", return_value=_WhitespaceEncoding())
+    embedding_model = OpenAITextEmbeddingModel()
+    texts = ["", "knowledge", "keyword search of the knowledge dataset", "vector weight"]
+
+    num_tokens_list = embedding_model.get_num_tokens_list("text-embedding-3-small", {}, texts)
+
+    assert num_tokens_list == [embedding_model.get_num_tokens("text-embedding-3-small", {}, [text]) for text in texts]
+    assert num_tokens_list == [0, 1, 6, 2]
+    assert embedding_model.get_num_tokens_list("text-embedding-3-small", {}, []) == []
@@ -0,0 +1,58 @@
+import random
+import string
+
+import pytest
+
+from core.moderation.keywords.keywords import KeywordsModeration
+from core.moderation.keywords.keywords_matcher import KeywordsMatcher
+
+TEXT_SIZE = 100 * 1024
+KEYWORD_COUNT = 10000
+
+
+def _check_keywords_by_substring(keywords_list: list[str], value: str) -> bool:
+    # the previous implementation
+    return any(keyword.lower() in str(value).lower() for keyword in keywords_list)
+
+
+def _random_text(rng: random.Random, size: int, alphabet: str) -> str:
+    return "".join(rng.choices(alphabet, k=size))
+
+
+def test_matcher_finds_the_same_keywords_as_substring_search():
+    rng = random.Random(0)
+    alphabet = "abcAB é你"
+    for _ in range(300):
+        keywords_list = [_random_text(rng, rng.randint(1, 4), alphabet) for _ in range(rng.randint(1, 5))]
+        text = _random_text(rng, rng.randint(0, 30), alphabet)
+
+        assert KeywordsMatcher(keywords_list).search(text) == _check_keywords_by_substring(keywords_list, text)
+
+
+def test_keywords_moderation_flags_outputs():
+    config = {
+        "keywords": "Forbidden\n\n禁止词",
+        "inputs_config": {"enabled": True, "preset_response": "inputs"},
+        "outputs_config": {"enabled": True, "preset_response": "outputs"},
+    }
+    moderation = KeywordsModeration(app_id="app_id", tenant_id="tenant_id", config=config)
+
+    assert moderation.moderation_for_outputs("this is FORBIDDEN.").flagged
+    assert moderation.moderation_for_outputs("这是禁止词").flagged
+    assert not moderation.moderation_for_outputs("this is allowed").flagged
+    assert moderation.moderation_for_inputs({"field": "allowed"}, query="forbidden").flagged
+
+
+@pytest.mark.parametrize("compiled", [False, True], ids=["substring_search", "compiled_matcher"])
+def test_benchmark_check_keywords(benchmark, compiled):
+    rng = random.Random(0)
+    keywords_list = [_random_text(rng, rng.randint(6, 12), string.ascii_lowercase) for _ in range(KEYWORD_COUNT)]
+    # a text without keywords is the worst case for both
+    text = _random_text(rng, TEXT_SIZE, "ABCDEFGH abcdefgh")
+    moderation = KeywordsModeration(app_id="app_id", tenant_id="tenant_id", config={})
+    check_keywords = moderation._check_keywords_in_value if compiled else _check_keywords_by_substring
+    benchmark.extra_info.update({"keywords": KEYWORD_COUNT, "text_size": TEXT_SIZE})
+
+    flagged = benchmark.pedantic(check_keywords, args=(keywords_list, text), rounds=3, iterations=1)
+
+    assert not flagged
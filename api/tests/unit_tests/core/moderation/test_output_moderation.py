@@ -0,0 +1,60 @@
+import pytest
+from flask import Flask
+
+from configs import dify_config
+from core.app.apps.base_app_queue_manager import AppQueueManager
+from core.moderation.keywords.keywords import KeywordsModeration
+from core.moderation.output_moderation import ModerationRule, OutputModeration
+
+PRESET_RESPONSE = "I can not answer that."
+
+
+@pytest.fixture
+def output_moderation(mocker):
+    mocker.patch.object(dify_config, "MODERATION_BUFFER_SIZE", 100)
+    mocker.patch.object(dify_config, "MODERATION_INCREMENTAL_ENABLED", True)
+    mocker.patch.object(dify_config, "MODERATION_OVERLAP_SIZE", 20)
+    mocker.patch(
+        "core.moderation.output_moderation.ModerationFactory",
+        side_effect=lambda name, app_id, tenant_id, config: KeywordsModeration(app_id, tenant_id, config),
+    )
+    rule = ModerationRule(
+        type="keywords",
+        config={
+            "keywords": "forbidden word",
+            "inputs_config": {"enabled": False},
+            "outputs_config": {"enabled": True, "preset_response": PRESET_RESPONSE},
+        },
+    )
+    output_moderation = OutputModeration(
+        tenant_id="tenant_id", app_id="app_id", rule=rule, queue_manager=mocker.MagicMock(spec=AppQueueManager)
+    )
+
+    with Flask(__name__).app_context():
+        yield output_moderation
+
+    output_moderation.stop_thread()
+    if output_moderation.thread:
+        output_moderation.thread.join()
+
+
+def _moderate_stream(output_moderation: OutputModeration, text: str) -> str:
+    for i in range(0, len(text), 10):
+        output_moderation.append_new_token(text[i : i + 10])
+    output_moderation.stop_thread()
+    return output_moderation.moderation_completion(text)
+
+
+def test_incremental_moderation_checks_each_part_once(output_moderation):
+    text = "".join(f"sentence {i:04d}. " for i in range(200))
+
+    assert _moderate_stream(output_moderation, text) == text
+    metrics = output_moderation.metrics
+    assert metrics.checked_bytes <= len(text) + dify_config.MODERATION_OVERLAP_SIZE * metrics.check_count
+
+
+@pytest.mark.parametrize("position", [0, 95, 190, 1500, 2990])
+def test_incremental_moderation_flags_text_across_windows(output_moderation, position):
+    text = "x" * position + "forbidden word" + "y" * (3000 - position)
+
+    assert _moderate_stream(output_moderation, text) == PRESET_RESPONSE
@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from core.rag.datasource.keyword.jieba.jieba_inverted_index import JiebaInvertedIndex
+from core.rag.datasource.keyword.keyword_factory import Keyword
+from core.rag.models.document import Document
+from models.dataset import Dataset
+
+
+@pytest.fixture
+def mock_db(mocker):
+    return mocker.patch("core.rag.datasource.keyword.jieba.jieba_inverted_index.db", new=mocker.MagicMock())
+
+
+@pytest.fixture
+def keyword_index():
+    return JiebaInvertedIndex(Dataset(id="dataset_id", tenant_id="tenant_id"))
+
+
+def _executed_postings(mock_db) -> list[tuple[str, str, str]]:
+    postings = []
+    for call in mock_db.session.execute.call_args_list:
+        compiled = call.args[0].compile(dialect=postgresql.dialect())
+        assert "ON CONFLICT (dataset_id, keyword, index_node_id) DO NOTHING" in str(compiled)
+        params = compiled.params
+        for i in range(len([key for key in params if key.startswith("dataset_id")])):
+            postings.append((params[f"dataset_id_m{i}"], params[f"keyword_m{i}"], params[f"index_node_id_m{i}"]))
+    return postings
+
+
+def test_keyword_store_is_chosen_per_dataset():
+    # datasets indexed before the keyword store was recorded keep using the jieba keyword table
+    assert isinstance(Keyword(Dataset(id="dataset_id"))._keyword_processor, Jieba)
+    assert isinstance(
+        Keyword(Dataset(id="dataset_id", keyword_store="jieba_inverted_index"))._keyword_processor, JiebaInvertedIndex
+    )
+
+
+def test_add_texts_upserts_postings(mock_db, keyword_index):
+    documents = [
+        Document(page_content="unused", metadata={"doc_id": "node_1"}),
+        Document(page_content="knowledge retrieval", metadata={"doc_id": "node_2"}),
+    ]
+
+    keyword_index.add_texts(documents, keywords_list=[["stored", "keyword", "keyword"], None])
+
+    postings = _executed_postings(mock_db)
+    assert sorted(p for p in postings if p[2] == "node_1") == [
+        ("dataset_id", "keyword", "node_1"),
+        ("dataset_id", "stored", "node_1"),
+    ]
+    assert {p[1] for p in postings if p[2] == "node_2"} >= {"knowledge", "retrieval"}
+
+
+def test_postings_are_inserted_in_batches(mock_db, keyword_index):
+    keyword_index.update_segment_keywords_index("node_1", [f"keyword_{i}" for i in range(2500)])
+
+    assert mock_db.session.execute.call_count == 3
+    assert len(set(_executed_postings(mock_db))) == 2500
+    mock_db.session.commit.assert_called_once()
+
+
+def test_search_returns_documents_in_match_order(mocker, mock_db, keyword_index):
+    query = mock_db.session.query.return_value.filter.return_value.group_by.return_value.order_by.return_value
+    query.limit.return_value.all.return_value = [
+        mocker.MagicMock(index_node_id="node_2"),
+        mocker.MagicMock(index_node_id="node_1"),
+    ]
+    get_documents = mocker.patch.object(
+        JiebaInvertedIndex, "_get_documents_by_index_node_ids", side_effect=lambda ids: ids
+    )
+
+    assert keyword_index.search("knowledge retrieval", top_k=2) == ["node_2", "node_1"]
+    query.limit.assert_called_once_with(2)
+    get_documents.assert_called_once_with(["node_2", "node_1"])
+
+
+def test_search_without_keywords_does_not_query(mock_db, keyword_index):
+    assert keyword_index.search("   ") == []
+    mock_db.session.query.assert_not_called()
+
+
+def test_delete_by_ids_only_deletes_the_postings_of_the_nodes(mock_db, keyword_index):
+    keyword_index.delete_by_ids([])
+    mock_db.session.query.assert_not_called()
+
+    keyword_index.delete_by_ids(["node_1", "node_2"])
+
+    filter_call = mock_db.session.query.return_value.filter
+    criteria = [str(c.compile(dialect=postgresql.dialect())) for c in filter_call.call_args.args]
+    assert criteria == [
+        "dataset_keyword_postings.dataset_id = %(dataset_id_1)s::UUID",
+        "dataset_keyword_postings.index_node_id IN (__[POSTCOMPILE_index_node_id_1])",
+    ]
+    filter_call.return_value.delete.assert_called_once_with(synchronize_session=False)
+    mock_db.session.commit.assert_called_once()
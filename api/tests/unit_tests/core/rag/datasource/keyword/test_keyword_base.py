@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from configs import dify_config
+from core.helper.segment_content_cache import SegmentContentCache
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from models.dataset import Dataset, DocumentSegment
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mocker.patch.object(dify_config, "SEGMENT_CONTENT_CACHE_TTL", 60)
+    cache: dict[str, str] = {}
+    mock_redis = mocker.patch("core.helper.segment_content_cache.redis_client", new=mocker.MagicMock())
+    mock_redis.mget.side_effect = lambda keys: [cache.get(key) for key in keys]
+    mock_redis.delete.side_effect = lambda *keys: [cache.pop(key, None) for key in keys]
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    pipe.setex.side_effect = lambda key, ttl, value: cache.__setitem__(key, value)
+    mock_redis.cache = cache
+    return mock_redis
+
+
+@pytest.fixture
+def mock_db(mocker):
+    return mocker.patch("core.rag.datasource.keyword.keyword_base.db", new=mocker.MagicMock())
+
+
+def _segment(index_node_id: str) -> DocumentSegment:
+    return DocumentSegment(
+        dataset_id="dataset_id",
+        document_id="document_id",
+        index_node_id=index_node_id,
+        index_node_hash=f"hash_{index_node_id}",
+        content=f"content of {index_node_id}",
+    )
+
+
+def test_documents_keep_the_order_of_the_ids(mock_redis, mock_db):
+    SegmentContentCache.set_many(
+        "dataset_id",
+        {
+            "node_2": {
+                "content": "cached content",
+                "doc_hash": "hash_node_2",
+                "document_id": "document_id",
+                "dataset_id": "dataset_id",
+            }
+        },
+    )
+    # the database returns the segments in any order
+    mock_filter = mock_db.session.query.return_value.filter.return_value
+    mock_filter.all.return_value = [_segment("node_3"), _segment("node_1")]
+
+    documents = Jieba(Dataset(id="dataset_id"))._get_documents_by_index_node_ids(
+        ["node_1", "node_2", "missing", "node_3"]
+    )
+
+    assert [d.metadata["doc_id"] for d in documents] == ["node_1", "node_2", "node_3"]
+    assert [d.page_content for d in documents] == ["content of node_1", "cached content", "content of node_3"]
+    # only the segments which are not cached are loaded, in one query
+    mock_db.session.query.assert_called_once()
+    in_clause = mock_db.session.query.return_value.filter.call_args.args[1]
+    assert in_clause.right.value == ["node_1", "missing", "node_3"]
+    # and cached for the next search
+    cached = json.loads(mock_redis.cache["segment_content:dataset_id:dataset_id:index_node_id:node_1"])
+    assert cached["content"] == "content of node_1"
+
+
+def test_cached_documents_need_no_query(mock_redis, mock_db):
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [_segment("node_1")]
+    keyword = Jieba(Dataset(id="dataset_id"))
+    keyword._get_documents_by_index_node_ids(["node_1"])
+    mock_db.session.query.reset_mock()
+
+    documents = keyword._get_documents_by_index_node_ids(["node_1"])
+
+    assert [d.page_content for d in documents] == ["content of node_1"]
+    mock_db.session.query.assert_not_called()
+
+
+def test_deleted_contents_are_loaded_again(mock_redis):
+    SegmentContentCache.set_many("dataset_id", {"node_1": {"content": "old"}, "node_2": {"content": "other"}})
+
+    SegmentContentCache.delete("dataset_id", ["node_1", None])
+
+    assert SegmentContentCache.get_many("dataset_id", ["node_1", "node_2"]) == {"node_2": {"content": "other"}}
+
+
+def test_delete_does_not_raise_when_redis_fails(mock_redis):
+    mock_redis.delete.side_effect = Exception("redis is down")
+
+    SegmentContentCache.delete("dataset_id", ["node_1"])
@@ -0,0 +1,134 @@
+import pytest
+
+from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.entities.retrieval_entities import DatasetRetrievalSetting
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from core.rag.retrieval.retrieval_methods import RetrievalMethod
+from models.dataset import ChildChunk, Dataset, DocumentSegment
+from models.dataset import Document as DatasetDocument
+
+
+def _new_dataset_documents(count: int) -> list[DatasetDocument]:
+    dataset_documents = []
+    for i in range(count):
+        doc_form = IndexType.PARENT_CHILD_INDEX if i % 2 else IndexType.PARAGRAPH_INDEX
+        dataset_documents.append(DatasetDocument(id=f"document_{i}", dataset_id=f"dataset_{i % 5}", doc_form=doc_form))
+    return dataset_documents
+
+
+@pytest.fixture
+def mock_db(mocker):
+    mock_db = mocker.patch("core.rag.datasource.retrieval_service.db", new=mocker.MagicMock())
+    results = {}
+
+    def query(*entities):
+        mock_query = mocker.MagicMock()
+        mock_query.join.return_value = mock_query
+        mock_query.filter.return_value = mock_query
+        mock_query.all.return_value = results[entities]
+        return mock_query
+
+    mock_db.session.query.side_effect = query
+    return mock_db, results
+
+
+def _retrieve(mock_db, document_count: int) -> list:
+    mock_db, results = mock_db
+    dataset_documents = _new_dataset_documents(document_count)
+    documents = []
+    segments = []
+    child_chunks = []
+    for i, dataset_document in enumerate(dataset_documents):
+        segment = DocumentSegment(
+            id=f"segment_{i}", dataset_id=dataset_document.dataset_id, index_node_id=f"node_{i}", position=i
+        )
+        segments.append(segment)
+        if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+            # two retrieved child chunks of the same parent segment
+            for j in range(2):
+                child_chunk = ChildChunk(
+                    id=f"child_{i}_{j}",
+                    segment_id=segment.id,
+                    index_node_id=f"child_node_{i}_{j}",
+                    content="",
+                    position=j,
+                )
+                child_chunks.append((child_chunk, segment))
+                documents.append(
+                    Document(
+                        page_content="",
+                        metadata={"document_id": dataset_document.id, "doc_id": child_chunk.index_node_id, "score": j},
+                    )
+                )
+        else:
+            documents.append(
+                Document(
+                    page_content="",
+                    metadata={"document_id": dataset_document.id, "doc_id": segment.index_node_id, "score": 0.5},
+                )
+            )
+
+    results[(DatasetDocument,)] = dataset_documents
+    results[(DocumentSegment,)] = segments
+    results[(ChildChunk, DocumentSegment)] = child_chunks
+    return RetrievalService.format_retrieval_documents(documents)
+
+
+@pytest.mark.parametrize("document_count", [2, 50])
+def test_segments_are_loaded_with_constant_query_count(mock_db, document_count):
+    records = _retrieve(mock_db, document_count)
+
+    assert mock_db[0].session.query.call_count == 3
+    assert [record.segment.id for record in records] == [f"segment_{i}" for i in range(document_count)]
+    for i, record in enumerate(records):
+        if i % 2:
+            assert [child_chunk.id for child_chunk in record.child_chunks] == [f"child_{i}_0", f"child_{i}_1"]
+            assert record.score == 1
+        else:
+            assert record.child_chunks is None
+            assert record.score == 0.5
+
+
+def test_query_is_embedded_once_per_embedding_model(mocker):
+    embed_query = mocker.patch.object(RetrievalService, "embed_query", return_value=[0.1, 0.2])
+    mock_vector = mocker.patch("core.rag.datasource.retrieval_service.Vector")
+    mock_vector.return_value.search_by_vector.side_effect = lambda query, **kwargs: [
+        Document(page_content=query, metadata={"dataset_id": kwargs["filter"]["group_id"][0]})
+    ]
+    mock_db = mocker.patch("core.rag.datasource.retrieval_service.db", new=mocker.MagicMock())
+    mock_db.session.merge.side_effect = lambda dataset, load: dataset
+
+    datasets = [
+        Dataset(id=f"dataset_{i}", tenant_id="tenant_id", embedding_model_provider="openai", embedding_model=model)
+        for i, model in enumerate(["model_a", "model_a", "model_b"])
+    ]
+    settings = [
+        DatasetRetrievalSetting(dataset=dataset, retrieval_method=RetrievalMethod.SEMANTIC_SEARCH.value, top_k=2)
+        for dataset in datasets
+    ]
+    results = RetrievalService.retrieve_datasets("query", settings)
+
+    assert embed_query.call_count == 2
+    assert mock_vector.return_value.search_by_vector.call_count == 3
+    for query_call in mock_vector.return_value.search_by_vector.call_args_list:
+        assert query_call.kwargs["query_vector"] == [0.1, 0.2]
+    assert [[document.metadata["dataset_id"] for document in documents] for documents in results] == [
+        ["dataset_0"],
+        ["dataset_1"],
+        ["dataset_2"],
+    ]
+
+
+def test_failed_datasets_are_skipped_when_ignoring_errors(mocker):
+    mock_db = mocker.patch("core.rag.datasource.retrieval_service.db", new=mocker.MagicMock())
+    mock_db.session.merge.side_effect = lambda dataset, load: dataset
+    mock_keyword = mocker.patch("core.rag.datasource.retrieval_service.Keyword")
+    mock_keyword.return_value.search.side_effect = [Exception("keyword table is broken")]
+
+    settings = [DatasetRetrievalSetting(dataset=Dataset(id="dataset_id"), retrieval_method="keyword_search", top_k=2)]
+
+    assert RetrievalService.retrieve_datasets("query", settings, ignore_errors=True) == [[]]
+    mock_keyword.return_value.search.side_effect = [Exception("keyword table is broken")]
+    with pytest.raises(ValueError, match="keyword table is broken"):
+        RetrievalService.retrieve_datasets("query", settings)
@@ -0,0 +1,145 @@
+import pytest
+
+from configs import dify_config
+from core.rag.docstore.dataset_docstore import DatasetDocumentStore
+from core.rag.models.document import ChildDocument, Document
+from models.dataset import ChildChunk, Dataset, DocumentSegment
+
+
+@pytest.fixture
+def mock_db(mocker):
+    mock_db = mocker.patch("core.rag.docstore.dataset_docstore.db", new=mocker.MagicMock())
+    query = mock_db.session.query.return_value.filter.return_value
+    query.scalar.return_value = 3
+    query.all.return_value = []
+    return mock_db
+
+
+@pytest.fixture
+def embedding_model(mocker):
+    model_manager = mocker.patch("core.rag.docstore.dataset_docstore.ModelManager")
+    embedding_model = model_manager.return_value.get_model_instance.return_value
+    embedding_model.get_text_embedding_num_tokens_list.side_effect = lambda texts: [len(t.split()) for t in texts]
+    return embedding_model
+
+
+@pytest.fixture
+def docstore():
+    dataset = Dataset(
+        id="dataset_id",
+        tenant_id="tenant_id",
+        indexing_technique="high_quality",
+        embedding_model_provider="openai",
+        embedding_model="text-embedding-3-small",
+    )
+    return DatasetDocumentStore(dataset, user_id="user_id", document_id="document_id")
+
+
+def _new_documents(count: int) -> list[Document]:
+    return [
+        Document(
+            page_content=" ".join(["word"] * (i + 1)),
+            metadata={"doc_id": f"node_{i}", "doc_hash": f"hash_{i}"},
+        )
+        for i in range(count)
+    ]
+
+
+def _inserted_mappings(mock_db, mapper) -> list[list[dict]]:
+    return [call.args[1] for call in mock_db.session.bulk_insert_mappings.call_args_list if call.args[0] is mapper]
+
+
+def test_new_segments_are_inserted_in_batches(mocker, mock_db, embedding_model, docstore):
+    mocker.patch.object(dify_config, "INDEXING_SEGMENT_BATCH_SIZE", 2)
+    documents = _new_documents(5)
+    documents[1].metadata["answer"] = "answer"
+
+    docstore.add_documents(documents)
+
+    # the tokens of all documents are counted in one call
+    embedding_model.get_text_embedding_num_tokens_list.assert_called_once_with(
+        texts=[d.page_content for d in documents]
+    )
+    batches = _inserted_mappings(mock_db, DocumentSegment)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert mock_db.session.commit.call_count == 3
+    segments = [segment for batch in batches for segment in batch]
+    # the same rows as the per document path: positions after the existing segments, word counts and tokens
+    assert [(s["index_node_id"], s["position"], s["word_count"], s["tokens"]) for s in segments] == [
+        (f"node_{i}", 4 + i, len(documents[i].page_content), i + 1) for i in range(5)
+    ]
+    assert all(
+        (s["tenant_id"], s["dataset_id"], s["document_id"], s["created_by"], s["enabled"])
+        == ("tenant_id", "dataset_id", "document_id", "user_id", False)
+        for s in segments
+    )
+    assert [s["answer"] for s in segments] == [None, "answer", None, None, None]
+    assert len({s["id"] for s in segments}) == 5
+    mock_db.session.add.assert_not_called()
+    mock_db.session.flush.assert_not_called()
+
+
+def test_child_chunks_reference_their_segment(mock_db, embedding_model, docstore):
+    documents = _new_documents(2)
+    documents[0].children = [
+        ChildDocument(page_content="child one", metadata={"doc_id": "child_1", "doc_hash": "child_hash_1"}),
+        ChildDocument(page_content="child two", metadata={"doc_id": "child_2", "doc_hash": "child_hash_2"}),
+    ]
+
+    docstore.add_documents(documents, save_child=True)
+
+    (segments,) = _inserted_mappings(mock_db, DocumentSegment)
+    (child_chunks,) = _inserted_mappings(mock_db, ChildChunk)
+    assert [(c["segment_id"], c["position"], c["index_node_id"], c["word_count"]) for c in child_chunks] == [
+        (segments[0]["id"], 1, "child_1", 9),
+        (segments[0]["id"], 2, "child_2", 9),
+    ]
+
+
+def test_existing_segments_are_updated(mock_db, embedding_model, docstore):
+    existing_segment = DocumentSegment(
+        id="segment_id", index_node_id="node_0", index_node_hash="old_hash", content="old", word_count=3, tokens=1
+    )
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [existing_segment]
+    documents = _new_documents(2)
+    documents[0].metadata["answer"] = "new answer"
+
+    docstore.add_documents(documents)
+
+    assert (
+        existing_segment.content,
+        existing_segment.answer,
+        existing_segment.index_node_hash,
+        existing_segment.word_count,
+        existing_segment.tokens,
+    ) == (documents[0].page_content, "new answer", "hash_0", len(documents[0].page_content), 1)
+    (segments,) = _inserted_mappings(mock_db, DocumentSegment)
+    assert [(s["index_node_id"], s["position"]) for s in segments] == [("node_1", 4)]
+    mock_db.session.commit.assert_called_once()
+
+
+def test_existing_segments_are_not_overwritten_without_allow_update(mock_db, embedding_model, docstore):
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [
+        DocumentSegment(id="segment_id", index_node_id="node_0")
+    ]
+
+    with pytest.raises(ValueError, match="doc_id node_0 already exists"):
+        docstore.add_documents(_new_documents(2), allow_update=False)
+
+    mock_db.session.bulk_insert_mappings.assert_not_called()
+    mock_db.session.commit.assert_not_called()
+
+
+def test_duplicate_doc_ids_are_written_once(mock_db, embedding_model, docstore):
+    documents = _new_documents(3)
+    duplicate = Document(page_content="updated content", metadata={"doc_id": "node_0", "doc_hash": "new_hash"})
+
+    docstore.add_documents([*documents, duplicate])
+
+    (segments,) = _inserted_mappings(mock_db, DocumentSegment)
+    assert [(s["index_node_id"], s["position"], s["content"], s["index_node_hash"]) for s in segments] == [
+        ("node_0", 4, "updated content", "new_hash"),
+        ("node_1", 5, documents[1].page_content, "hash_1"),
+        ("node_2", 6, documents[2].page_content, "hash_2"),
+    ]
+    assert segments[0]["tokens"] == 2
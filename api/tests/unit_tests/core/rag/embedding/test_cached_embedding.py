@@ -0,0 +1,103 @@
+import base64
+
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from configs import dify_config
+from core.rag.embedding import cached_embedding
+from core.rag.embedding.cached_embedding import CacheEmbedding, embedding_cache_stats
+from libs import helper
+from models.dataset import Embedding
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache(mocker):
+    mocker.patch.object(dify_config, "EMBEDDING_CACHE_REDIS_TTL", 600)
+    mocker.patch.object(dify_config, "EMBEDDING_CACHE_LOCAL_MAX_SIZE", 100)
+    cached_embedding._local_document_embedding_cache.clear()
+    embedding_cache_stats.reset()
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mock_redis = mocker.patch("core.rag.embedding.cached_embedding.redis_client", new=mocker.MagicMock())
+    mock_redis.mget.side_effect = lambda keys: [None] * len(keys)
+    return mock_redis
+
+
+@pytest.fixture
+def mock_db(mocker):
+    mock_db = mocker.patch("core.rag.embedding.cached_embedding.db", new=mocker.MagicMock())
+    mock_db.session.query.return_value.filter.return_value.all.return_value = []
+    return mock_db
+
+
+@pytest.fixture
+def embedding(mocker):
+    model_instance = mocker.MagicMock(provider="openai", model="text-embedding-3-small")
+    model_instance.model_type_instance.get_model_schema.return_value = None
+    model_instance.invoke_text_embedding.side_effect = lambda texts, **kwargs: mocker.MagicMock(
+        embeddings=[[float(len(text)), 1.0] for text in texts]
+    )
+    return CacheEmbedding(model_instance)
+
+
+def test_cache_tiers_are_looked_up_in_order(embedding, mock_redis, mock_db):
+    local_hash, redis_hash, db_hash, missing_hash = (helper.generate_text_hash(t) for t in ["a", "b", "c", "d"])
+    embedding._put_local_embedding(local_hash, np.array([1.0, 0.0]))
+    redis_key = embedding._document_embedding_cache_key(redis_hash)
+    redis_value = base64.b64encode(np.array([0.0, 1.0]).tobytes())
+    mock_redis.mget.side_effect = lambda keys: [redis_value if key == redis_key else None for key in keys]
+    db_embedding = Embedding(model_name="text-embedding-3-small", hash=db_hash, provider_name="openai")
+    db_embedding.set_embedding([0.5, 0.5])
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [db_embedding]
+
+    result = embedding._get_cached_document_embeddings({local_hash, redis_hash, db_hash, missing_hash})
+
+    assert result == {local_hash: [1.0, 0.0], redis_hash: [0.0, 1.0], db_hash: [0.5, 0.5]}
+    # redis is asked for everything not cached locally in one mget, the database for the rest in one query
+    mock_redis.mget.assert_called_once()
+    assert set(mock_redis.mget.call_args.args[0]) == {
+        embedding._document_embedding_cache_key(h) for h in [redis_hash, db_hash, missing_hash]
+    }
+    mock_db.session.query.assert_called_once()
+    in_clause = mock_db.session.query.return_value.filter.call_args.args[2]
+    assert set(in_clause.right.value) == {db_hash, missing_hash}
+    # the embeddings of the database are cached in the faster tiers
+    pipe = mock_redis.pipeline.return_value.__enter__.return_value
+    assert [call.args[0] for call in pipe.setex.call_args_list] == [embedding._document_embedding_cache_key(db_hash)]
+    assert (
+        cached_embedding._local_document_embedding_cache.get(embedding._document_embedding_cache_key(db_hash))
+        is not None
+    )
+    stats = embedding_cache_stats.to_dict()
+    assert (stats["local_hits"], stats["redis_hits"], stats["db_hits"]) == (1, 1, 1)
+
+
+def test_hits_and_misses_are_counted_per_unique_text(embedding, mock_redis, mock_db):
+    texts = ["same", "same", "other"]
+
+    first = embedding.embed_documents(texts)
+    second = embedding.embed_documents(texts)
+
+    assert first == second
+    assert first[0] == first[1]
+    stats = embedding_cache_stats.to_dict()
+    assert (stats["misses"], stats["local_hits"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_new_embeddings_are_upserted_in_batches(mocker, embedding, mock_redis, mock_db):
+    mocker.patch.object(dify_config, "EMBEDDING_CACHE_LOOKUP_BATCH_SIZE", 2)
+
+    embedding._save_document_embeddings({f"hash_{i}": [float(i), 1.0] for i in range(3)})
+
+    statements = [call.args[0] for call in mock_db.session.execute.call_args_list]
+    assert len(statements) == 2
+    for statement in statements:
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (model_name, hash, provider_name) DO NOTHING" in sql
+    params = [statement.compile(dialect=postgresql.dialect()).params for statement in statements]
+    assert [p["hash_m0"] for p in params] == ["hash_0", "hash_2"]
+    mock_db.session.commit.assert_called_once()
@@ -0,0 +1,64 @@
+from configs import dify_config
+from core.helper.extraction_cache import ExtractionCache
+from core.rag.extractor.entity.extract_setting import ExtractSetting
+from core.rag.extractor.extract_processor import ExtractProcessor
+from core.rag.extractor.text_extractor import TextExtractor
+
+
+def test_extracted_documents_are_cached_by_file_content(mocker, tmp_path):
+    cache: dict[str, list] = {}
+    mocker.patch.object(ExtractionCache, "enabled", return_value=True)
+    mocker.patch.object(ExtractionCache, "get", side_effect=cache.get)
+    mocker.patch.object(ExtractionCache, "set", side_effect=cache.__setitem__)
+    lazy_extract = mocker.spy(TextExtractor, "lazy_extract")
+
+    extract_setting = ExtractSetting(datasource_type="upload_file", document_model="text_model")
+    for name in ("a.txt", "b.txt"):
+        (tmp_path / name).write_text("same content")
+    (tmp_path / "c.txt").write_text("other content")
+
+    documents = ExtractProcessor.extract(extract_setting, file_path=str(tmp_path / "a.txt"))
+    # the caller may change the extracted documents, the cached ones are not affected
+    documents[0].metadata["document_id"] = "document_id"
+    cached_documents = ExtractProcessor.extract(extract_setting, file_path=str(tmp_path / "b.txt"))
+    other_documents = ExtractProcessor.extract(extract_setting, file_path=str(tmp_path / "c.txt"))
+
+    assert lazy_extract.call_count == 2
+    assert [document.page_content for document in cached_documents] == ["same content"]
+    assert "document_id" not in cached_documents[0].metadata
+    assert [document.page_content for document in other_documents] == ["other content"]
+    assert len(cache) == 2
+
+
+def test_cache_key_depends_on_content_and_settings():
+    key = ExtractionCache.get_cache_key("hash", "extractor", {"file_extension": ".pdf"})
+
+    assert key == ExtractionCache.get_cache_key("hash", "extractor", {"file_extension": ".pdf"})
+    assert key != ExtractionCache.get_cache_key("other_hash", "extractor", {"file_extension": ".pdf"})
+    assert key != ExtractionCache.get_cache_key("hash", "other_extractor", {"file_extension": ".pdf"})
+    assert key != ExtractionCache.get_cache_key("hash", "extractor", {"file_extension": ".txt"})
+
+
+def test_docx_extractions_are_not_cached(mocker):
+    mocker.patch.object(ExtractionCache, "enabled", return_value=True)
+
+    # the images of .docx files are saved as upload files of the document during the extraction
+    assert not ExtractProcessor._is_extraction_cacheable(".docx")
+    assert ExtractProcessor._is_extraction_cacheable(".pdf")
+
+
+def test_large_extractions_are_not_cached(mocker, tmp_path):
+    mocker.patch.object(ExtractionCache, "enabled", return_value=True)
+    mocker.patch.object(ExtractionCache, "get", return_value=None)
+    cache_set = mocker.patch.object(ExtractionCache, "set")
+    mocker.patch.object(dify_config, "EXTRACTION_CACHE_MAX_ENTRY_SIZE_MB", 1)
+
+    extract_setting = ExtractSetting(datasource_type="upload_file", document_model="text_model")
+    (tmp_path / "small.txt").write_text("small content")
+    (tmp_path / "large.txt").write_text("x" * (1024 * 1024 + 1))
+
+    ExtractProcessor.extract(extract_setting, file_path=str(tmp_path / "small.txt"))
+    documents = ExtractProcessor.extract(extract_setting, file_path=str(tmp_path / "large.txt"))
+
+    assert len(documents[0].page_content) == 1024 * 1024 + 1
+    assert cache_set.call_count == 1
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from configs import dify_config
+from core.rag.extractor import pdf_page_pool
+from core.rag.extractor.pdf_page_pool import extract_pdf_page_texts
+
+PAGE_COUNT = 12
+
+
+def _new_pdf(page_count: int) -> bytes:
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    page_ids = [4 + 2 * i for i in range(page_count)]
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for i, page_id in enumerate(page_ids):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] /Contents {page_id + 1} 0 R"
+            " /Resources << /Font << /F1 3 0 R >> >> >>".encode()
+        )
+        stream = f"BT /F1 12 Tf 10 100 Td (page {i}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref_offset = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return pdf
+
+
+@pytest.fixture
+def process_pool(mocker):
+    mocker.patch.object(dify_config, "PDF_EXTRACT_PROCESS_POOL_SIZE", 2)
+    mocker.patch.object(dify_config, "PDF_EXTRACT_PARALLEL_MIN_PAGES", PAGE_COUNT)
+    yield
+    if pdf_page_pool._pool is not None:
+        pdf_page_pool._reset_pool(pdf_page_pool._pool)
+
+
+def test_pages_are_extracted_in_order_by_process_pool(process_pool, tmp_path):
+    pdf = _new_pdf(PAGE_COUNT)
+    file_path = tmp_path / "test.pdf"
+    file_path.write_bytes(pdf)
+
+    expected = [f"page {i}" for i in range(PAGE_COUNT)]
+    assert [text.strip() for text in extract_pdf_page_texts(pdf)] == expected
+    assert [text.strip() for text in extract_pdf_page_texts(str(file_path))] == expected
+    assert pdf_page_pool._pool is not None
+
+
+def test_small_pdf_is_extracted_in_process(process_pool):
+    pdf = _new_pdf(PAGE_COUNT - 1)
+
+    assert [text.strip() for text in extract_pdf_page_texts(pdf)] == [f"page {i}" for i in range(PAGE_COUNT - 1)]
+    assert pdf_page_pool._pool is None
+
+
+def test_page_ranges_in_flight_are_bounded(process_pool, mocker, tmp_path):
+    page_count = 40
+    file_path = tmp_path / "test.pdf"
+    file_path.write_bytes(_new_pdf(page_count))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        submit = mocker.spy(pool, "submit")
+
+        page_texts = pdf_page_pool._extract_in_pool(pool, str(file_path), page_count)
+
+        # 8 page ranges of 5 pages, twice the pool size is submitted before the first result is taken
+        assert next(page_texts).strip() == "page 0"
+        assert submit.call_count == 5
+        assert [text.strip() for text in page_texts] == [f"page {i}" for i in range(1, page_count)]
+        assert submit.call_count == 8
+
+
+def test_remaining_pages_are_extracted_in_process_when_a_worker_dies(process_pool, tmp_path, caplog):
+    page_count = 40
+    file_path = tmp_path / "test.pdf"
+    file_path.write_bytes(_new_pdf(page_count))
+
+    page_texts = extract_pdf_page_texts(str(file_path))
+    first_page = next(page_texts)
+    pool = pdf_page_pool._pool
+    assert pool is not None
+    for process in list(pool._processes.values()):
+        process.kill()
+
+    assert [first_page.strip()] + [text.strip() for text in page_texts] == [f"page {i}" for i in range(page_count)]
+    assert "PDF extraction process pool is not available" in caplog.text
+    # the broken pool is replaced on the next extraction
+    assert pdf_page_pool._pool is None
+
+
+def test_other_extractions_are_not_cancelled_when_the_pool_is_reset(process_pool, tmp_path):
+    page_count = 40
+    file_path = tmp_path / "test.pdf"
+    file_path.write_bytes(_new_pdf(page_count))
+
+    page_texts = extract_pdf_page_texts(str(file_path))
+    first_page = next(page_texts)
+    # another extraction found the pool broken
+    pdf_page_pool._reset_pool(pdf_page_pool._pool)
+
+    assert [first_page.strip()] + [text.strip() for text in page_texts] == [f"page {i}" for i in range(page_count)]
@@ -0,0 +1,143 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from core.rag.rerank import weight_rerank
+from core.rag.rerank.entity.weight import KeywordSetting, VectorSetting, Weights
+from core.rag.rerank.weight_rerank import WeightRerankRunner
+
+WORDS = [
+    "retrieval",
+    "knowledge",
+    "embedding",
+    "keyword",
+    "segment",
+    "document",
+    "vector",
+    "rerank",
+    "database",
+    "index",
+    "query",
+    "score",
+    "model",
+    "dataset",
+    "search",
+    "weight",
+]
+QUERY = "keyword search of the knowledge dataset with vector weight"
+QUERY_VECTOR = [1.0, 0.5, 0.25, 0.0]
+
+
+def _new_documents(count: int) -> list[Document]:
+    rng = random.Random(0)
+    documents = []
+    for i in range(count):
+        metadata = {"doc_id": f"node_{i}", "doc_hash": f"hash_{i}", "dataset_id": "dataset_id"}
+        if i % 2:
+            # documents from the vector search have a score, the others are compared with the query vector
+            metadata["score"] = rng.random()
+        documents.append(
+            Document(
+                page_content=" ".join(rng.choices(WORDS, k=100)),
+                vector=[rng.random() for _ in QUERY_VECTOR],
+                metadata=metadata,
+            )
+        )
+    return documents
+
+
+def _reference_scores(documents: list[Document]) -> dict[str, float]:
+    """Scores of the documents as calculated with plain python."""
+    keyword_table_handler = JiebaKeywordTableHandler()
+    query_keywords = keyword_table_handler.extract_keywords(QUERY, None)
+    documents_keywords = [keyword_table_handler.extract_keywords(d.page_content, None) for d in documents]
+    all_keywords = set().union(*documents_keywords)
+    keyword_idf = {
+        keyword: math.log((1 + len(documents)) / (1 + sum(1 for k in documents_keywords if keyword in k))) + 1
+        for keyword in all_keywords
+    }
+    query_tfidf = {k: c * keyword_idf.get(k, 0) for k, c in Counter(query_keywords).items()}
+    query_norm = math.sqrt(sum(v**2 for v in query_tfidf.values()))
+
+    scores = {}
+    for document, document_keywords in zip(documents, documents_keywords):
+        document_tfidf = {k: c * keyword_idf[k] for k, c in Counter(document_keywords).items()}
+        numerator = sum(query_tfidf[k] * document_tfidf[k] for k in set(query_tfidf) & set(document_tfidf))
+        denominator = query_norm * math.sqrt(sum(v**2 for v in document_tfidf.values()))
+        keyword_score = numerator / denominator if denominator else 0.0
+
+        if "score" in document.metadata:
+            vector_score = document.metadata["score"]
+        else:
+            dot_product = sum(a * b for a, b in zip(QUERY_VECTOR, document.vector))
+            norms = math.sqrt(sum(a**2 for a in QUERY_VECTOR)) * math.sqrt(sum(b**2 for b in document.vector))
+            vector_score = dot_product / norms
+        scores[document.metadata["doc_id"]] = 0.7 * vector_score + 0.3 * keyword_score
+    return scores
+
+
+@pytest.fixture
+def runner(mocker):
+    mocker.patch("core.rag.rerank.weight_rerank.ModelManager")
+    mocker.patch("core.rag.rerank.weight_rerank.CacheEmbedding").return_value.embed_query.return_value = QUERY_VECTOR
+    weight_rerank._document_keywords_cache.clear()
+    weights = Weights(
+        vector_setting=VectorSetting(vector_weight=0.7, embedding_provider_name="openai", embedding_model_name="model"),
+        keyword_setting=KeywordSetting(keyword_weight=0.3),
+    )
+    return WeightRerankRunner("tenant_id", weights)
+
+
+@pytest.fixture
+def mock_db(mocker):
+    mock_db = mocker.patch("core.rag.rerank.weight_rerank.db", new=mocker.MagicMock())
+    mock_db.session.query.return_value.filter.return_value = []
+    return mock_db
+
+
+def test_scores_match_reference(runner, mock_db):
+    documents = _new_documents(20)
+    expected_scores = _reference_scores(documents)
+
+    reranked_documents = runner.run(QUERY, documents)
+
+    assert len(reranked_documents) == 20
+    for document in reranked_documents:
+        assert document.metadata["score"] == pytest.approx(expected_scores[document.metadata["doc_id"]])
+    scores = [document.metadata["score"] for document in reranked_documents]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_stored_and_cached_keywords_are_reused(runner, mock_db, mocker):
+    documents = _new_documents(4)
+    mock_db.session.query.return_value.filter.return_value = [("dataset_id", "node_0", ["keyword", "search"])]
+    extract_keywords = mocker.spy(JiebaKeywordTableHandler, "extract_keywords")
+
+    runner.run(QUERY, documents)
+    runner.run(QUERY, _new_documents(4))
+
+    # the query of both runs and the documents without stored keywords once
+    assert extract_keywords.call_count == 2 + 3
+    assert documents[0].metadata["keywords"] == {"keyword", "search"}
+
+
+@pytest.mark.parametrize("keywords", ["extracted", "stored"])
+def test_benchmark_weight_rerank(benchmark, runner, mock_db, keywords):
+    documents = _new_documents(200)
+    if keywords == "stored":
+        keyword_table_handler = JiebaKeywordTableHandler()
+        mock_db.session.query.return_value.filter.return_value = [
+            ("dataset_id", d.metadata["doc_id"], list(keyword_table_handler.extract_keywords(d.page_content, None)))
+            for d in documents
+        ]
+
+    def rerank():
+        # extract the keywords in every round
+        weight_rerank._document_keywords_cache.clear()
+        return runner.run(QUERY, documents, top_n=10)
+
+    assert len(benchmark(rerank)) == 10
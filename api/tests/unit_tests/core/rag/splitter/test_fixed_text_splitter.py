@@ -0,0 +1,94 @@
+import random
+import string
+
+import pytest
+
+from core.model_runtime.model_providers.__base.tokenizers.gpt2_tokenzier import GPT2Tokenizer
+from core.rag.splitter.fixed_text_splitter import FixedRecursiveCharacterTextSplitter
+
+# large enough to show the difference, small enough to run with the unit tests
+CORPUS_SIZE = 100 * 1024
+
+
+def _new_corpus(size: int) -> str:
+    rng = random.Random(0)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 10))) for _ in range(2000)]
+    paragraphs = []
+    length = 0
+    while length < size:
+        lines = [" ".join(rng.choices(words, k=rng.randint(5, 40))) + "." for _ in range(rng.randint(1, 20))]
+        paragraph = "\n".join(lines)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def _new_splitter(embedding_model_instance=None) -> FixedRecursiveCharacterTextSplitter:
+    return FixedRecursiveCharacterTextSplitter.from_encoder(
+        embedding_model_instance=embedding_model_instance,
+        chunk_size=500,
+        chunk_overlap=50,
+        fixed_separator="\n\n",
+        separators=["\n\n", "。", ". ", " ", ""],
+    )
+
+
+def _new_per_text_splitter() -> FixedRecursiveCharacterTextSplitter:
+    # the previous behavior: one tokenizer call for every split
+    return FixedRecursiveCharacterTextSplitter(
+        length_function=lambda text: GPT2Tokenizer.get_num_tokens(text) if text else 0,
+        chunk_size=500,
+        chunk_overlap=50,
+        fixed_separator="\n\n",
+        separators=["\n\n", "。", ". ", " ", ""],
+    )
+
+
+def _new_embedding_model_instance(mocker, count_text):
+    embedding_model_instance = mocker.MagicMock()
+    embedding_model_instance.get_text_embedding_num_tokens_list.side_effect = lambda texts: [
+        count_text(text) for text in texts
+    ]
+    return embedding_model_instance
+
+
+def test_chunks_are_the_same_as_with_per_text_counting():
+    text = _new_corpus(200 * 1024)
+
+    assert _new_splitter().split_text(text) == _new_per_text_splitter().split_text(text)
+
+
+def test_model_tokens_are_counted_in_batches(mocker):
+    embedding_model_instance = _new_embedding_model_instance(mocker, lambda text: len(text.split()) * 2)
+    text = _new_corpus(20 * 1024)
+
+    chunks = _new_splitter(embedding_model_instance).split_text(text)
+
+    assert chunks
+    assert all(len(chunk.split()) * 2 <= 500 for chunk in chunks)
+    embedding_model_instance.get_text_embedding_num_tokens.assert_not_called()
+    # one call for the probe, one for the paragraphs, and one for the lines of each paragraph too long for a chunk
+    paragraph_count = len(text.split("\n\n"))
+    assert embedding_model_instance.get_text_embedding_num_tokens_list.call_count < paragraph_count
+
+
+def test_model_counting_like_gpt2_uses_local_tokenizer(mocker):
+    embedding_model_instance = _new_embedding_model_instance(mocker, GPT2Tokenizer.get_num_tokens)
+    text = _new_corpus(20 * 1024)
+
+    chunks = _new_splitter(embedding_model_instance).split_text(text)
+
+    assert chunks == _new_splitter().split_text(text)
+    # only the probe is counted by the model
+    assert embedding_model_instance.get_text_embedding_num_tokens_list.call_count == 1
+
+
+@pytest.mark.parametrize("batched", [False, True], ids=["per_text", "batched"])
+def test_benchmark_split_corpus(benchmark, batched):
+    text = _new_corpus(CORPUS_SIZE)
+    splitter = _new_splitter() if batched else _new_per_text_splitter()
+    benchmark.extra_info["corpus_size"] = len(text)
+
+    chunks = benchmark.pedantic(splitter.split_text, args=(text,), rounds=1, iterations=1)
+
+    assert chunks
@@ -0,0 +1,34 @@
+from collections.abc import Iterator
+
+from configs import dify_config
+from core.indexing_runner import IndexingRunner
+from core.rag.models.document import Document
+
+
+def test_documents_are_extracted_in_batches(mocker):
+    mocker.patch.object(dify_config, "INDEXING_EXTRACT_BATCH_SIZE", 2)
+    mocker.patch.object(IndexingRunner, "_get_extract_setting", return_value=mocker.MagicMock())
+    dataset_document = mocker.MagicMock(id="document_id", dataset_id="dataset_id")
+
+    extracted_pages = []
+
+    def lazy_extract(extract_setting, **kwargs) -> Iterator[Document]:
+        for page in range(5):
+            extracted_pages.append(page)
+            yield Document(page_content=f"page {page}", metadata={"page": page})
+
+    index_processor = mocker.MagicMock()
+    index_processor.lazy_extract.side_effect = lazy_extract
+
+    batches = IndexingRunner.__new__(IndexingRunner)._extract_in_batches(
+        index_processor, dataset_document, {"mode": "custom"}
+    )
+
+    # pages are only extracted when the previous batch was consumed
+    first_batch = next(batches)
+    assert [doc.metadata["page"] for doc in first_batch] == [0, 1]
+    assert extracted_pages == [0, 1]
+
+    remaining_batches = list(batches)
+    assert [[doc.metadata["page"] for doc in batch] for batch in remaining_batches] == [[2, 3], [4]]
+    assert all(doc.metadata["document_id"] == "document_id" for doc in first_batch)
@@ -1,3 +1,4 @@
+from core.entities.provider_configuration import ProviderConfigurations
 from core.entities.provider_entities import ModelSettings
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.model_providers import model_provider_factory
@@ -181,3 +182,34 @@ def test__to_model_settings_lb_disabled(mocker):
     assert result[0].model_type == ModelType.LLM
     assert result[0].enabled is True
     assert len(result[0].load_balancing_configs) == 0
+
+
+def test_get_configurations_cached_until_invalidated(mocker):
+    versions = {}
+    mock_redis = mocker.patch("core.provider_manager.redis_client", new=mocker.MagicMock())
+    mock_redis.get.side_effect = lambda key: versions.get(key)
+    mock_redis.incr.side_effect = lambda key: versions.__setitem__(key, str(int(versions.get(key, 0)) + 1).encode())
+    mock_build = mocker.patch.object(
+        ProviderManager,
+        "_build_configurations",
+        side_effect=lambda tenant_id: ProviderConfigurations(tenant_id=tenant_id),
+    )
+    ProviderManager._configurations_cache.clear()
+
+    provider_manager = ProviderManager()
+    provider_manager.get_configurations("tenant_id")
+    provider_manager.get_configurations("tenant_id")
+    ProviderManager().get_configurations("tenant_id")
+    assert mock_build.call_count == 1
+
+    ProviderManager.invalidate_configurations_cache("tenant_id")
+    provider_manager.get_configurations("tenant_id")
+    provider_manager.get_configurations("tenant_id")
+    assert mock_build.call_count == 2
+
+    # another process bumps the version
+    mock_redis.incr("provider_configurations_version:tenant_id:tenant_id")
+    provider_manager.get_configurations("tenant_id")
+    assert mock_build.call_count == 3
+
+    ProviderManager._configurations_cache.clear()
@@ -0,0 +1,60 @@
+import threading
+import time
+from concurrent.futures import wait
+
+from core.workflow.graph_engine.graph_engine import GraphEngineThreadPool
+from core.workflow.graph_engine.workflow_thread_pool import WorkflowThreadPool
+
+
+def _track_concurrency():
+    lock = threading.Lock()
+    state = {"running": 0, "max_running": 0}
+
+    def task():
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+
+    return task, state
+
+
+def test_tenant_quota_limits_running_tasks():
+    pool = WorkflowThreadPool(max_workers=8, max_workers_per_tenant=2, max_workers_per_app=8)
+    group = GraphEngineThreadPool(tenant_id="tenant", app_id="app", max_workers=10, max_submit_count=100)
+    task, state = _track_concurrency()
+
+    futures = [pool.submit(group, task) for _ in range(6)]
+    wait(futures)
+
+    assert state["max_running"] == 2
+    assert group.submit_count == 0
+    assert pool.stats()["running"] == 0
+    assert pool.stats()["max_queued"] > 0
+
+
+def test_submit_blocks_instead_of_failing_when_group_is_full():
+    pool = WorkflowThreadPool(max_workers=1, max_workers_per_tenant=1, max_workers_per_app=1)
+    group = GraphEngineThreadPool(tenant_id="tenant", app_id="app", max_workers=1, max_submit_count=2)
+    task, _ = _track_concurrency()
+
+    futures = [pool.submit(group, task) for _ in range(5)]
+    wait(futures)
+
+    assert all(future.exception() is None for future in futures)
+
+
+def test_nested_task_runs_in_worker_when_pool_is_busy():
+    pool = WorkflowThreadPool(max_workers=1, max_workers_per_tenant=1, max_workers_per_app=1)
+    group = GraphEngineThreadPool(tenant_id="tenant", app_id="app", max_workers=1, max_submit_count=10)
+
+    def parent():
+        child = pool.submit(group, threading.get_ident)
+        return threading.get_ident(), child.result(timeout=5)
+
+    parent_thread, child_thread = pool.submit(group, parent).result(timeout=5)
+
+    assert parent_thread == child_thread
+    assert pool.stats()["inline_runs"] == 1
@@ -1,7 +1,9 @@
+from copy import deepcopy
+
 import pytest
 
 from core.file import File, FileTransferMethod, FileType
-from core.variables import FileSegment, StringSegment
+from core.variables import ArrayStringSegment, FileSegment, StringSegment
 from core.workflow.entities.variable_pool import VariablePool
 
 
@@ -44,3 +46,102 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_child_pool_shares_parent_variables(pool, file):
+    pool.add(("node_1", "file_var"), FileSegment(value=file))
+    pool.add(("node_1", "str_var"), StringSegment(value="parent"))
+    pool.add(("node_2", "str_var"), StringSegment(value="parent"))
+
+    child = pool.create_child()
+    assert child.get(("node_1", "file_var")) is pool.get(("node_1", "file_var"))
+    assert child.get(("node_1", "file_var", "name")).value == file.filename
+
+    child.add(("node_1", "str_var"), StringSegment(value="child"))
+    child.remove(("node_1", "file_var"))
+    child.remove(("node_2",))
+    grandchild = child.create_child()
+
+    for scope in (child, grandchild):
+        assert scope.get(("node_1", "str_var")).value == "child"
+        assert scope.get(("node_1", "file_var")) is None
+        assert scope.get(("node_2", "str_var")) is None
+    # the parent is not changed by its children
+    assert pool.get(("node_1", "str_var")).value == "parent"
+    assert pool.get(("node_1", "file_var")) is not None
+    assert pool.get(("node_2", "str_var")).value == "parent"
+
+
+ITERATION_COUNT = 100
+ARRAY_SIZE = 100
+
+
+@pytest.mark.parametrize("copy_on_write", [False, True], ids=["deepcopy", "copy_on_write"])
+def test_benchmark_parallel_iteration_pools(benchmark, copy_on_write):
+    pool = VariablePool(system_variables={}, user_inputs={})
+    for i in range(10):
+        pool.add(("node_1", f"array_{i}"), ArrayStringSegment(value=[f"item {j}" for j in range(ARRAY_SIZE)]))
+
+    def create_iteration_pools():
+        # one pool per item of a parallel iteration, as created by GraphEngine.create_copy
+        iteration_pools = []
+        for index in range(ITERATION_COUNT):
+            iteration_pool = pool.create_child() if copy_on_write else deepcopy(pool)
+            iteration_pool.add(("iteration", "index"), index)
+            iteration_pools.append(iteration_pool)
+        return iteration_pools
+
+    iteration_pools = benchmark.pedantic(create_iteration_pools, rounds=3, iterations=1)
+
+    assert iteration_pools[-1].get(("iteration", "index")).value == ITERATION_COUNT - 1
+    assert iteration_pools[-1].get(("node_1", "array_0")).value[-1] == f"item {ARRAY_SIZE - 1}"
+
+
+def test_convert_template(pool):
+    pool.add(("node_1", "name"), "world")
+
+    result = pool.convert_template("Hello {{#node_1.name#}}, {{#node_1.missing#}} and 1.5 {{#sys.query#}}!")
+
+    assert result.text == "Hello world, node_1.missing and 1.5 sys.query!"
+    assert pool.convert_template("").text == ""
+
+
+def _pool_operations(pool, file):
+    template = "".join(f"Line {i}: {{{{#node_1.var_{i}#}}}} of {{{{#node_1.file.name#}}}}\n" for i in range(20))
+    segments = [ArrayStringSegment(value=[f"value {j}" for j in range(100)]) for _ in range(20)]
+
+    def add_segments():
+        for i, segment in enumerate(segments):
+            pool.add(("node_1", f"var_{i}"), segment)
+
+    def add_values():
+        for i in range(20):
+            pool.add(("node_1", f"var_{i}"), f"value {i}")
+
+    def get_variables():
+        for i in range(20):
+            pool.get(("node_1", f"var_{i}"))
+
+    def get_file_attributes():
+        for _ in range(20):
+            pool.get(("node_1", "file", "name"))
+
+    def convert_template():
+        return pool.convert_template(template).text
+
+    pool.add(("node_1", "file"), FileSegment(value=file))
+    add_values()
+    return {
+        "add_segments": add_segments,
+        "add_values": add_values,
+        "get_variables": get_variables,
+        "get_file_attributes": get_file_attributes,
+        "convert_template": convert_template,
+    }
+
+
+@pytest.mark.parametrize(
+    "operation", ["add_segments", "add_values", "get_variables", "get_file_attributes", "convert_template"]
+)
+def test_benchmark_pool_operations(benchmark, pool, file, operation):
+    benchmark(_pool_operations(pool, file)[operation])
@@ -0,0 +1,18 @@
+import pytest
+
+from configs import dify_config
+from dify_app import DifyApp
+from extensions import ext_celery
+
+
+@pytest.mark.parametrize("enabled", [False, True], ids=["buffer_disabled", "buffer_enabled"])
+def test_flush_tasks_are_only_scheduled_when_buffering(mocker, enabled):
+    mocker.patch.object(dify_config, "RETRIEVAL_LOG_BUFFER_ENABLED", enabled)
+    mocker.patch.object(dify_config, "API_TOKEN_LAST_USED_BUFFER_ENABLED", enabled)
+    mocker.patch.object(ext_celery.Celery, "set_default")
+
+    beat_schedule = ext_celery.init_app(DifyApp(__name__)).conf.beat_schedule
+
+    assert ("flush_retrieval_log_task" in beat_schedule) is enabled
+    assert ("update_api_token_last_used_task" in beat_schedule) is enabled
+    assert "clean_messages" in beat_schedule
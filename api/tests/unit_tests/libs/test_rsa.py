@@ -1,7 +1,11 @@
+import pytest
 import rsa as pyrsa
 from Crypto.PublicKey import RSA
 
-from libs import gmpy2_pkcs10aep_cipher
+from configs import dify_config
+from core.helper import encrypter
+from libs import gmpy2_pkcs10aep_cipher, rsa
+from models.account import Tenant
 
 
 def test_gmpy2_pkcs10aep_cipher() -> None:
@@ -27,3 +31,71 @@ def test_gmpy2_pkcs10aep_cipher() -> None:
     encrypted_by_private_key = private_cipher_rsa.encrypt(message=raw_text_bytes)
     decrypted_by_private_key = private_cipher_rsa.decrypt(encrypted_by_private_key)
     assert decrypted_by_private_key == raw_text_bytes
+
+
+CREDENTIAL_COUNT = 10
+
+
+@pytest.fixture
+def tenant_key_pair(mocker):
+    saved_keys = {}
+    storage = mocker.patch("libs.rsa.storage", new=mocker.MagicMock())
+    storage.save.side_effect = saved_keys.__setitem__
+    storage.load.side_effect = saved_keys.__getitem__
+    redis_client = mocker.patch("libs.rsa.redis_client", new=mocker.MagicMock())
+    redis_client.get.return_value = None
+    rsa.invalidate_decrypt_cache("tenant_id")
+    rsa._decrypted_token_cache.clear()
+
+    public_key = rsa.generate_key_pair("tenant_id")
+    yield public_key, storage
+
+    rsa.invalidate_decrypt_cache("tenant_id")
+    rsa._decrypted_token_cache.clear()
+
+
+def _decrypt_credentials(encrypted_credentials: list[bytes]) -> list[str]:
+    # what a request does to get the credentials of a provider or a tool
+    rsa_key, cipher_rsa = rsa.get_decrypt_decoding("tenant_id")
+    return [rsa.decrypt_token_with_decoding(token, rsa_key, cipher_rsa) for token in encrypted_credentials]
+
+
+def test_decrypted_credentials_are_cached_until_the_key_pair_changes(tenant_key_pair):
+    public_key, storage = tenant_key_pair
+    encrypted_credentials = [rsa.encrypt(f"credential_{i}", public_key) for i in range(CREDENTIAL_COUNT)]
+
+    for _ in range(3):
+        assert _decrypt_credentials(encrypted_credentials) == [f"credential_{i}" for i in range(CREDENTIAL_COUNT)]
+    assert storage.load.call_count == 1
+
+    new_public_key = rsa.generate_key_pair("tenant_id")
+
+    assert _decrypt_credentials([rsa.encrypt("new_credential", new_public_key)]) == ["new_credential"]
+    assert storage.load.call_count == 2
+
+
+def test_encrypting_credentials_keeps_decrypted_credentials_cached(mocker, tenant_key_pair):
+    public_key, storage = tenant_key_pair
+    encrypted_credentials = [rsa.encrypt("credential", public_key)]
+    _decrypt_credentials(encrypted_credentials)
+    mock_db = mocker.patch("models.engine.db", new=mocker.MagicMock())
+    mock_db.session.query.return_value.filter.return_value.first.return_value = Tenant(encrypt_public_key=public_key)
+    decrypt = mocker.spy(rsa, "_decrypt_token_with_decoding")
+
+    encrypter.encrypt_token("tenant_id", "other_credential")
+
+    assert _decrypt_credentials(encrypted_credentials) == ["credential"]
+    decrypt.assert_not_called()
+    assert storage.load.call_count == 1
+
+
+@pytest.mark.parametrize("cache_ttl", [0, 120], ids=["uncached", "cached"])
+def test_benchmark_decrypt_credentials(benchmark, mocker, tenant_key_pair, cache_ttl):
+    mocker.patch.object(dify_config, "CREDENTIALS_DECRYPT_CACHE_TTL", cache_ttl)
+    public_key, _ = tenant_key_pair
+    encrypted_credentials = [rsa.encrypt(f"credential_{i}", public_key) for i in range(CREDENTIAL_COUNT)]
+    benchmark.extra_info["credentials_per_request"] = CREDENTIAL_COUNT
+
+    decrypted_credentials = benchmark(_decrypt_credentials, encrypted_credentials)
+
+    assert decrypted_credentials == [f"credential_{i}" for i in range(CREDENTIAL_COUNT)]